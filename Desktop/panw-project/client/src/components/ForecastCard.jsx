@@ -3,7 +3,8 @@ import { useOutletContext } from "react-router-dom";
 import { api } from "../lib/api.js";
 import { Card } from "./UI.jsx";
 
-export default function ForecastCard({ income: incomeProp, goal: goalProp, months: monthsProp }) {
+// `data` (optional): a /forecast payload the parent already fetched, e.g. from /api/dashboard (null = still loading)
+export default function ForecastCard({ income: incomeProp, goal: goalProp, months: monthsProp, data: dataProp }) {
   const { version, income: incomeCtx, goal: goalCtx, months: monthsCtx } = useOutletContext();
   const income = incomeProp ?? incomeCtx ?? 1800;
   const goal   = goalProp   ?? goalCtx   ?? 3000;
@@ -14,11 +15,12 @@ export default function ForecastCard({ income: incomeProp, goal: goalProp, month
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
+    if (dataProp !== undefined) return;
     let live = true;
     setLoading(true); setErr("");
     (async () => {
       try {
-        const d = await api.forecast({ income, goal, months });
+        const d = await api.forecast({ income, goal, months, mode: "monte_carlo", seed: 1 });
         if (live) setData(d);
       } catch (e) {
         if (live) { setErr(String(e?.message || "Failed to load forecast")); setData(null); }
@@ -27,7 +29,14 @@ export default function ForecastCard({ income: incomeProp, goal: goalProp, month
       }
     })();
     return () => { live = false; };
-  }, [income, goal, months, version]);
+  }, [income, goal, months, version, dataProp]);
+
+  const shown = dataProp !== undefined ? dataProp : data;
+  const busy = dataProp !== undefined ? dataProp === null : loading;
+
+  // Probability from sampled futures when available, so one volatile month doesn't flip the pill
+  const mc = shown?.monte_carlo;
+  const onTrack = mc ? mc.p_on_track >= 0.5 : !!shown?.on_track;
 
   const Pill = ({ ok }) => (
     <span style={{
@@ -41,21 +50,29 @@ export default function ForecastCard({ income: incomeProp, goal: goalProp, month
 
   return (
     <Card title="Forecast to Goal">
-      {loading && <p>Loading…</p>}
+      {busy && <p>Loading…</p>}
       {err && <p style={{ color: "crimson" }}>{err}</p>}
-      {!loading && !err && data && (
+      {!busy && !err && shown && (
         <div style={{ display: "grid", gap: 8 }}>
           <div style={{ display: "flex", gap: 8, alignItems: "center", marginBottom: 8 }}>
-            <Pill ok={!!data.on_track} />
+            <Pill ok={onTrack} />
             <span style={{ fontSize: 12, color: "#6b7280" }}>
               Target: ${goal.toLocaleString()} in {months} mo
+              {mc && <> &nbsp;·&nbsp; {Math.round(mc.p_on_track * 100)}% chance</>}
             </span>
           </div>
-          <div style={{ fontSize: 14 }}>{data.message}</div>
+          <div style={{ fontSize: 14 }}>{shown.message}</div>
+          {mc && (
+            <div style={{ fontSize: 12, color: "#6b7280" }}>
+              Likely saved by {mc.bands.months[mc.bands.months.length - 1]}:{" "}
+              ${Math.round(mc.bands.p10[mc.bands.p10.length - 1]).toLocaleString()}–${Math.round(mc.bands.p90[mc.bands.p90.length - 1]).toLocaleString()}
+              {" "}(10th–90th percentile of {mc.paths.toLocaleString()} simulated paths)
+            </div>
+          )}
           <div style={{ display: "grid", gridTemplateColumns: "repeat(3,minmax(0,1fr))", gap: 8, marginTop: 6 }}>
-            <Stat label="Monthly Surplus" value={`$${Number(data.surplus || 0).toLocaleString()}`} />
-            <Stat label="Gap" value={`$${Number(data.gap || 0).toLocaleString()}`} />
-            <Stat label="Need / mo" value={`$${Number(data.need_per_month || 0).toLocaleString()}`} />
+            <Stat label="Monthly Surplus" value={`$${Number(shown.surplus || 0).toLocaleString()}`} />
+            <Stat label="Gap" value={`$${Number(shown.gap || 0).toLocaleString()}`} />
+            <Stat label="Need / mo" value={`$${Number(shown.need_per_month || 0).toLocaleString()}`} />
           </div>
         </div>
       )}
@@ -3,7 +3,8 @@ import { useOutletContext } from "react-router-dom";
 import { api } from "../lib/api.js";
 import { Card } from "./UI.jsx";
 
-export default function HealthScore({ income: incomeProp }) {
+// `data` (optional): a /score payload the parent already fetched, e.g. from /api/dashboard (null = still loading)
+export default function HealthScore({ income: incomeProp, data: dataProp }) {
   const { version, income: incomeCtx } = useOutletContext();
   const income = incomeProp ?? incomeCtx ?? 1800;
 
@@ -12,6 +13,7 @@ export default function HealthScore({ income: incomeProp }) {
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
+    if (dataProp !== undefined) return;
     let live = true;
     setLoading(true);
     setErr("");
@@ -29,7 +31,10 @@ export default function HealthScore({ income: incomeProp }) {
       }
     })();
     return () => { live = false; };
-  }, [income, version]);
+  }, [income, version, dataProp]);
+
+  const shown = dataProp !== undefined ? dataProp : data;
+  const busy = dataProp !== undefined ? dataProp === null : loading;
 
   const bar = (val) => (
     <div style={{ background: "#e5e7eb", height: 8, borderRadius: 4 }}>
@@ -39,16 +44,16 @@ export default function HealthScore({ income: incomeProp }) {
 
   return (
     <Card title="Financial Health">
-      {loading && <p>Loading…</p>}
+      {busy && <p>Loading…</p>}
       {err && <p style={{ color: "crimson" }}>{err}</p>}
-      {!loading && !err && data && (
+      {!busy && !err && shown && (
         <div style={{ display: "grid", gap: 10 }}>
           <div style={{ fontSize: 42, fontWeight: 700, lineHeight: 1 }}>
-            {data.score ?? "—"}<span style={{ fontSize: 16, color: "#6b7280", marginLeft: 6 }}>/100</span>
+            {shown.score ?? "—"}<span style={{ fontSize: 16, color: "#6b7280", marginLeft: 6 }}>/100</span>
           </div>
-          <div style={{ fontSize: 12, color: "#6b7280" }}>Period: {data.period || "—"}</div>
+          <div style={{ fontSize: 12, color: "#6b7280" }}>Period: {shown.period || "—"}</div>
           <div style={{ display: "grid", gap: 10 }}>
-            {(data.signals || []).map((s, i) => (
+            {(shown.signals || []).map((s, i) => (
               <div key={i}>
                 <div style={{ display: "flex", justifyContent: "space-between", fontSize: 12, marginBottom: 4 }}>
                   <span>{s.name}</span>
@@ -12,6 +12,7 @@ export default function WhatIfPlanner({ income: incomeProp, goal: goalProp, mont
   const [cats, setCats] = useState([]);        // [{name, current}]
   const [cuts, setCuts] = useState({});        // { category: number }
   const [res, setRes] = useState(null);        // what-if result
+  const [plan, setPlan] = useState(null);      // cheapest cuts that close the gap, keeping the user's cuts
   const [err, setErr] = useState("");
 
   const debounce = useRef(0);
@@ -37,14 +38,15 @@ export default function WhatIfPlanner({ income: incomeProp, goal: goalProp, mont
     return () => { live = false; };
   }, [version, privacy]);
 
-  // Fire /api/whatif whenever cuts or inputs change (debounced)
+  // Evaluate the cuts and re-solve the cheapest plan whenever cuts or inputs change (debounced, one request)
   useEffect(() => {
     window.clearTimeout(debounce.current);
     debounce.current = window.setTimeout(async () => {
       try {
         const payload = Object.fromEntries(Object.entries(cuts).filter(([, v]) => Number(v) > 0));
-        const w = await api.whatIf(payload, { income, goal, months });
-        setRes(w);
+        const w = await api.whatIfBatch({ scenarios: [payload], optimize: { fixed: payload } }, { income, goal, months });
+        setRes({ current_expense: w.current_expense, ...w.results[0] });
+        setPlan(w.optimal || null);
       } catch (e) {
         setErr(String(e?.message || "What-if failed"));
       }
@@ -58,6 +60,12 @@ export default function WhatIfPlanner({ income: incomeProp, goal: goalProp, mont
     setCuts((prev) => ({ ...prev, [name]: Number(value) }));
   };
 
+  const applyPlan = () => {
+    if (!plan) return;
+    // sliders move in $5 steps; round up so the applied plan still closes the gap
+    setCuts((prev) => ({ ...prev, ...Object.fromEntries(Object.entries(plan.cuts).map(([k, v]) => [k, Math.ceil(v / 5) * 5])) }));
+  };
+
   return (
     <Card title="What-If Planner">
       {err && <div style={{ color: "crimson", marginBottom: 8 }}>{err}</div>}
@@ -101,6 +109,16 @@ export default function WhatIfPlanner({ income: incomeProp, goal: goalProp, mont
               <Stat label="Need / mo" value={`$${Number(res.forecast?.need_per_month || 0).toLocaleString()}`} />
             </div>
           )}
+
+          {res && !res.forecast?.on_track && plan && Object.keys(plan.added).length > 0 && (
+            <div style={{ display: "flex", gap: 10, alignItems: "center", fontSize: 13 }}>
+              <span>
+                {plan.feasible ? "Cheapest way to close the gap" : "Closest you can get"}: {" "}
+                {Object.entries(plan.added).map(([k, v]) => `${k} −$${Math.round(v)}`).join(", ")}
+              </span>
+              <button onClick={applyPlan}>Apply</button>
+            </div>
+          )}
         </div>
       )}
     </Card>
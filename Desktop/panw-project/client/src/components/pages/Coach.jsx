@@ -39,19 +39,19 @@ export default function CoachPage() {
   // CSV-backed transactions for CoffeeCoach
   const [tx, setTx] = useState([]);
 
-  // Fetch coach summary
+  // Stream coach summary: rule-based nudges arrive first, then the LLM note token by token
   useEffect(() => {
-    let m = true;
+    const ctrl = new AbortController();
+    let note = "";
     setErr("");
-    (async () => {
-      try {
-        const res = await api.coach({ income, goal, months, privacy });
-        if (m) setCoach(res);
-      } catch (e) {
-        if (m) { setErr(String(e.message || e)); setCoach(null); }
-      }
-    })();
-    return () => { m = false; };
+    api.coachStream({ income, goal, months, privacy }, (event, data) => {
+      if (event === "nudges") setCoach({ nudges: data.nudges, llm_note: null });
+      else if (event === "token") { note += data.text; setCoach((c) => ({ ...c, llm_note: note })); }
+      else if (event === "done") setCoach((c) => ({ ...c, llm_note: data.llm_note }));
+    }, ctrl.signal).catch((e) => {
+      if (!ctrl.signal.aborted) { setErr(String(e.message || e)); setCoach(null); }
+    });
+    return () => ctrl.abort();
   }, [privacy, income, goal, months, version]);
 
   // Fetch transactions whenever Uploader bumps `version`
@@ -80,18 +80,19 @@ export default function CoachPage() {
     const question = q.trim();
     if (!question) return;
     setBusyAsk(true);
+    const ts = Date.now();
+    const update = (patch) => setQA((prev) => prev.map((it) => (it.ts === ts ? { ...it, ...patch } : it)));
+    setQA((prev) => [...prev, { q: question, a: "…", source: "", ts }]);
+    let text = "";
     try {
-      const res = await api.ask({ question, privacy, income, goal, months });
-      setQA((prev) => [
-        ...prev,
-        { q: question, a: res?.answer || "No answer.", source: res?.source, ts: Date.now() },
-      ]);
+      await api.askStream({ question, privacy, income, goal, months }, (event, data) => {
+        if (event === "answer") update({ a: data.answer, source: data.source });
+        else if (event === "token") { text += data.text; update({ a: text, source: "llm" }); }
+        else if (event === "done") update({ a: data.answer || "No answer.", source: data.source });
+      });
       setQ("");
     } catch (e) {
-      setQA((prev) => [
-        ...prev,
-        { q: question, a: `Error: ${String(e.message || e)}`, source: "error", ts: Date.now() },
-      ]);
+      update({ a: `Error: ${String(e.message || e)}`, source: "error" });
     } finally {
       setBusyAsk(false);
     }
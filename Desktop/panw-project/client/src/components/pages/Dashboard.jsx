@@ -11,20 +11,25 @@ import WhatIfPlanner from "../WhatIfPlanner.jsx";
 export default function Dashboard() {
   const { privacy, setPrivacy, income, setIncome, goal, setGoal, months, setMonths, version } = useOutletContext(); // NEW version
   const [summary, setSummary] = useState(null);
+  const [dash, setDash] = useState(null);      // /api/dashboard payload; false = failed, cards fetch their own
   const [err, setErr] = useState("");
 
+  // One request for the summary, health score and forecast cards
   useEffect(() => {
     let m = true;
+    setDash(null);
     (async () => {
       try {
-        const s = await api.summary(privacy);
-        if (m) { setSummary(s); setErr(""); }
+        const d = await api.dashboard({ fields: "summary,score,forecast", privacy, income, goal, months, mode: "monte_carlo", seed: 1 });
+        if (m) { setDash(d); setSummary(d.summary); setErr(""); }
       } catch (e) {
-        if (m) { setErr(String(e.message || e)); setSummary({}); }
+        if (m) { setErr(String(e.message || e)); setSummary({}); setDash(false); }
       }
     })();
     return () => { m = false; };
-  }, [privacy, version]); // <-- refetch whenever data changes
+  }, [privacy, income, goal, months, version]); // <-- refetch whenever data changes
+
+  const card = (k) => (dash === false ? undefined : dash ? dash[k] : null);
 
   const byCatTop = summary ? Object.entries(summary.by_category || {}).slice(0, 3) : [];
   const topMerchTop = summary ? Object.entries(summary.top_merchants || {}).slice(0, 3) : [];
@@ -44,8 +49,8 @@ export default function Dashboard() {
       </div>
 
       <div style={{ display: "grid", gridTemplateColumns: "2fr 1fr", gap: 16 }}>
-        <HealthScore income={income} />
-        <ForecastCard income={income} goal={goal} months={months} />
+        <HealthScore income={income} data={card("score")} />
+        <ForecastCard income={income} goal={goal} months={months} data={card("forecast")} />
       </div>
 
       <Card title="Quick Glance: Top Categories">
@@ -1,49 +1,113 @@
 // Centralized, tiny API client
 const API = import.meta.env.VITE_API_URL || "http://localhost:8000/api";
 
+// Per-browser session ID so each user gets their own dataset on the server
+const SESSION = (() => {
+  try {
+    let id = localStorage.getItem("sfc_session");
+    if (!id) { id = crypto.randomUUID(); localStorage.setItem("sfc_session", id); }
+    return id;
+  } catch { return "default"; }
+})();
+
+const call = (url, init = {}) =>
+  fetch(url, { ...init, headers: { ...(init.headers || {}), "X-Session-ID": SESSION } });
+
 async function j(res) {
   const data = await res.json().catch(() => ({}));
   if (!res.ok) throw new Error(data?.detail || res.statusText);
   return data;
 }
 
+// Reads a text/event-stream response, calling onEvent(event, data) per message
+async function sse(res, onEvent) {
+  if (!res.ok) await j(res);
+  const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buf = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buf += value;
+    let i;
+    while ((i = buf.indexOf("\n\n")) >= 0) {
+      const msg = buf.slice(0, i); buf = buf.slice(i + 2);
+      const event = /^event: (.*)$/m.exec(msg)?.[1] || "message";
+      const data = /^data: (.*)$/m.exec(msg)?.[1];
+      if (data) onEvent(event, JSON.parse(data));
+    }
+  }
+}
+
 export const api = {
   // NEW
-  health: () => fetch(`${API}/health`).then(j),
+  health: () => call(`${API}/health`).then(j),
 
   // reads
-  summary: (privacy=false) => fetch(`${API}/summary?privacy=${privacy ? "1":"0"}`).then(j),
-  subscriptions: (privacy=false) => fetch(`${API}/subscriptions?privacy=${privacy ? "1":"0"}`).then(j),
-  anomalies: (privacy=false) => fetch(`${API}/anomalies?privacy=${privacy ? "1":"0"}`).then(j),
-  trends: (months=6) => fetch(`${API}/trends?months=${months}`).then(j),
+  // Several cards in one request; `fields` is a comma-separated list (summary,trends,subscriptions,anomalies,score,compare,forecast,coach)
+  dashboard: ({fields, privacy = false, income, goal, months, mode = "flat", seed}) => {
+    const qs = new URLSearchParams({ privacy: privacy ? "1" : "0", income_monthly: income, goal_amount: goal, months_to_goal: months, mode });
+    if (fields) qs.set("fields", fields);
+    if (seed != null) qs.set("seed", seed);
+    return call(`${API}/dashboard?${qs}`).then(j);
+  },
+  summary: (privacy=false) => call(`${API}/summary?privacy=${privacy ? "1":"0"}`).then(j),
+  subscriptions: (privacy=false) => call(`${API}/subscriptions?privacy=${privacy ? "1":"0"}`).then(j),
+  anomalies: (privacy=false) => call(`${API}/anomalies?privacy=${privacy ? "1":"0"}`).then(j),
+  trends: (months=6) => call(`${API}/trends?months=${months}`).then(j),
   compare: ({income, goal, months}) =>
-    fetch(`${API}/compare?income_monthly=${income}&goal_amount=${goal}&months_to_goal=${months}`).then(j),
-  transactions: ({limit = 10000} = {}) =>
-    fetch(`${API}/transactions?limit=${limit}`).then(j),
-  forecast: ({income, goal, months}) =>
-    fetch(`${API}/forecast?income_monthly=${income}&goal_amount=${goal}&months_to_goal=${months}`).then(j),
-  score: (income) => fetch(`${API}/score?income_monthly=${income}`).then(j),
+    call(`${API}/compare?income_monthly=${income}&goal_amount=${goal}&months_to_goal=${months}`).then(j),
+  // Pages through every row (`limit` is the page size); filters are passed through as query params
+  transactions: async ({limit = 10000, ...filters} = {}) => {
+    const rows = [];
+    let cursor = null;
+    do {
+      const qs = new URLSearchParams({ limit, ...filters, ...(cursor ? { cursor } : {}) });
+      const page = await call(`${API}/transactions?${qs}`).then(j);
+      rows.push(...page.rows);
+      cursor = page.next_cursor;
+    } while (cursor);
+    return rows;
+  },
+  // mode: "flat" | "monte_carlo" (a fixed `seed` gives stable, cached numbers)
+  forecast: ({income, goal, months, mode = "flat", seed}) =>
+    call(`${API}/forecast?income_monthly=${income}&goal_amount=${goal}&months_to_goal=${months}&mode=${mode}${seed != null ? `&seed=${seed}` : ""}`).then(j),
+  score: (income) => call(`${API}/score?income_monthly=${income}`).then(j),
 
   // writes
   uploadCSV: async (file) => {
     const fd = new FormData(); fd.append("file", file);
-    return j(await fetch(`${API}/upload`, { method: "POST", body: fd }));
+    return j(await call(`${API}/upload`, { method: "POST", body: fd }));
   },
-  resetSample: () => fetch(`${API}/reset`, { method: "POST" }).then(j),
-  clearData:  () => fetch(`${API}/clear`, { method: "POST" }).then(j),
+  resetSample: () => call(`${API}/reset`, { method: "POST" }).then(j),
+  clearData:  () => call(`${API}/clear`, { method: "POST" }).then(j),
   whatIf: (cuts, {income, goal, months}) =>
-    fetch(`${API}/whatif?income_monthly=${income}&goal_amount=${goal}&months_to_goal=${months}`, {
+    call(`${API}/whatif?income_monthly=${income}&goal_amount=${goal}&months_to_goal=${months}`, {
       method: "POST", headers: { "Content-Type": "application/json" }, body: JSON.stringify(cuts)
     }).then(j),
+  // Many cut scenarios in one call; `optimize` (true or {fixed, weights, max_pct, limits}) adds the cheapest plan
+  whatIfBatch: ({scenarios = [], optimize}, {income, goal, months}) =>
+    call(`${API}/whatif/batch?income_monthly=${income}&goal_amount=${goal}&months_to_goal=${months}`, {
+      method: "POST", headers: { "Content-Type": "application/json" }, body: JSON.stringify({ scenarios, optimize })
+    }).then(j),
 
   coach: ({income, goal, months, privacy}) =>
-    fetch(`${API}/coach?income_monthly=${income}&goal_amount=${goal}&months_to_goal=${months}&privacy=${privacy ? "1":"0"}`).then(j),
+    call(`${API}/coach?income_monthly=${income}&goal_amount=${goal}&months_to_goal=${months}&privacy=${privacy ? "1":"0"}`).then(j),
 
   ask: ({question, privacy, income, goal, months}) =>
-    fetch(`${API}/ask?privacy=${privacy ? "1":"0"}&income_monthly=${income}&goal_amount=${goal}&months_to_goal=${months}`, {
+    call(`${API}/ask?privacy=${privacy ? "1":"0"}&income_monthly=${income}&goal_amount=${goal}&months_to_goal=${months}`, {
       method: "POST", headers: {"Content-Type": "application/json"}, body: JSON.stringify({ question })
     }).then(j),
+
+  // Streaming variants (SSE): rule-based content first, then LLM `token` events, then `done`
+  coachStream: ({income, goal, months, privacy}, onEvent, signal) =>
+    call(`${API}/coach/stream?income_monthly=${income}&goal_amount=${goal}&months_to_goal=${months}&privacy=${privacy ? "1":"0"}`, { signal })
+      .then((res) => sse(res, onEvent)),
+
+  askStream: ({question, privacy, income, goal, months}, onEvent, signal) =>
+    call(`${API}/ask/stream?privacy=${privacy ? "1":"0"}&income_monthly=${income}&goal_amount=${goal}&months_to_goal=${months}`, {
+      method: "POST", headers: {"Content-Type": "application/json"}, body: JSON.stringify({ question }), signal
+    }).then((res) => sse(res, onEvent)),
     
 };
 
-export { API };
+export { API, SESSION };
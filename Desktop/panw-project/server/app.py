@@ -2,17 +2,75 @@ from __future__ import annotations
 
 import io
 import os
+import asyncio
+import json
+import base64
 import re
+import sys
+import bisect
+import contextlib
+import contextvars
+import copy
+import functools
 import hashlib
+import shutil
 import logging
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-import numpy as np
-import pandas as pd
-from fastapi import Body, FastAPI, File, HTTPException, Query, UploadFile
+_IMPORT_T0 = time.perf_counter()
+
+# SFC_LAZY_STARTUP=1: don't import numpy/pandas or build the default tenant's sample data at import time.
+# `np` and `pd` start as stand-ins that import the real module on first use (or from the startup prewarm)
+# and then replace themselves in this module's globals.
+LAZY_STARTUP = os.getenv("SFC_LAZY_STARTUP", "0") == "1"
+STARTUP: Dict[str, Any] = {"lazy": LAZY_STARTUP, "imports_s": {}}
+_LAZY_IMPORT_LOCK = threading.Lock()
+
+
+def _import_timed(name: str, alias: Optional[str] = None):
+    """Import `name` (recording how long it took) and bind it to `alias` in this module."""
+    import importlib
+
+    with _LAZY_IMPORT_LOCK:
+        mod = sys.modules.get(name)
+        if mod is None:
+            t0 = time.perf_counter()
+            mod = importlib.import_module(name)
+            STARTUP["imports_s"][name] = round(time.perf_counter() - t0, 4)
+        if alias:
+            globals()[alias] = mod
+    return mod
+
+
+class _LazyModule:
+    def __init__(self, name: str, alias: str):
+        self._name, self._alias = name, alias
+
+    def __getattr__(self, attr: str):
+        return getattr(_import_timed(self._name, self._alias), attr)
+
+
+if LAZY_STARTUP:
+    np = _LazyModule("numpy", "np")
+    pd = _LazyModule("pandas", "pd")
+else:
+    _t = time.perf_counter()
+    import numpy as np
+    import pandas as pd
+    STARTUP["imports_s"]["numpy+pandas"] = round(time.perf_counter() - _t, 4)
+
+_t = time.perf_counter()
+from fastapi import Body, Depends, FastAPI, File, Header, HTTPException, Query, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+STARTUP["imports_s"]["fastapi"] = round(time.perf_counter() - _t, 4)
 
 # -----------------------------------------------------------------------------
 # App & CORS
@@ -22,13 +80,8 @@ app = FastAPI(title="Smart Financial Coach API", version="0.1.0")
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger("smart-fin-coach")
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5173", "http://127.0.0.1:5173"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# CORSMiddleware is added after the conditional-GET middleware (see below) so it stays outermost
+# and early 304s carry the CORS headers too.
 
 # -----------------------------------------------------------------------------
 # Mock data & constants
@@ -46,22 +99,982 @@ CATEGORY_KEYWORDS = {
 }
 
 # -----------------------------------------------------------------------------
-# Data versioning for client refresh
+# Data versioning for client refresh (one Dataset per tenant/session)
 # -----------------------------------------------------------------------------
-DATAFRAME: Optional[pd.DataFrame] = None
-DATA_VERSION = 1
-LAST_UPDATED = datetime.now(timezone.utc).isoformat()
+DEFAULT_TENANT = "default"
+MEMORY_BUDGET_BYTES = int(float(os.getenv("SFC_MEMORY_BUDGET_MB", "1024")) * 1024 * 1024)
+SPILL_DIR = os.getenv("SFC_SPILL_DIR") or None
+SNAPSHOT_DIR = os.getenv("SFC_SNAPSHOT_DIR") or None
+# Multi-worker mode: every worker serves the datasets in this directory (ideally on /dev/shm).
+SHARED_DIR = os.getenv("SFC_SHARED_DIR") or None
+SHARED_SLOTS = int(os.getenv("SFC_SHARED_SLOTS", "4096"))
+
+
+class DatasetSnapshot:
+    """
+    One version of a tenant's data: frame, version and (built on first use) derived caches.
+    Writers never change a published snapshot, they publish a new one, so a request that
+    takes `ds.snapshot` once sees a single version however many steps it reads in.
+    """
+
+    __slots__ = ("df", "version", "last_updated", "derived", "lock")
+
+    def __init__(self, df: Optional[pd.DataFrame], version: int, last_updated: str,
+                 derived: Optional[Dict[str, Any]] = None):
+        self.df = df
+        self.version = version
+        self.last_updated = last_updated
+        self.derived = derived
+        self.lock = threading.Lock()  # one derived build per snapshot
 
+    @property
+    def empty(self) -> bool:
+        return self.df is None or self.df.empty
 
-def _bump_version():
-    global DATA_VERSION, LAST_UPDATED
-    DATA_VERSION += 1
-    LAST_UPDATED = datetime.now(timezone.utc).isoformat()
+    @property
+    def records(self) -> int:
+        return 0 if self.df is None else int(len(self.df))
+
+
+class Dataset:
+    """
+    One tenant's transactions as a current DatasetSnapshot plus per-tenant caches.
+    `lock` serializes writers for this tenant only; readers never take it.
+    """
+
+    def __init__(self, tenant: str):
+        self.tenant = tenant
+        self.snapshot = DatasetSnapshot(None, 1, datetime.now(timezone.utc).isoformat())
+        self.frame_bytes = 0
+        self.object_bytes = 0
+        self.derived_bytes = 0
+        self.ml_models: Dict[str, Tuple[str, Any]] = {}  # merchant -> (data fingerprint, fit result)
+        self.ml_pending: Dict[str, Tuple[str, Future]] = {}
+        self.forecast_cache: Dict[str, Any] = {"version": None}
+        self.lock = threading.RLock()
+        self.shared_version: Optional[int] = None  # SFC_SHARED_DIR copy this one mirrors
+        self.shared_generation: Optional[int] = None
+        self._writing = False
+        self.owner = self  # the store's Dataset; pinned() views keep pointing at it
+        self.store: Optional["DatasetStore"] = None  # set by the store that created it
+
+    # Convenience reads of the current snapshot; a handler reading more than one of these
+    # should take `ds.snapshot` once instead.
+    @property
+    def df(self) -> Optional[pd.DataFrame]:
+        return self.snapshot.df
+
+    @property
+    def version(self) -> int:
+        return self.snapshot.version
+
+    @property
+    def last_updated(self) -> str:
+        return self.snapshot.last_updated
+
+    @property
+    def empty(self) -> bool:
+        return self.snapshot.empty
+
+    @property
+    def records(self) -> int:
+        return self.snapshot.records
+
+    @property
+    def resident_bytes(self) -> int:
+        return self.frame_bytes + self.derived_bytes
+
+    def pinned(self, snap: Optional[DatasetSnapshot] = None) -> "Dataset":
+        """
+        A view of this tenant held at one snapshot (sharing its caches), for multi-part reads.
+        Attributes assigned on a view stay on the view; cache updates go through `owner`.
+        """
+        view = copy.copy(self)
+        view.snapshot = snap or self.snapshot
+        return view
+
+    @contextlib.contextmanager
+    def writing(self):
+        """
+        A writer's critical section: holds `lock`. If the store evicted this Dataset after the caller
+        got it, it is put back first (see DatasetStore.reinstate) so the write isn't lost. With
+        SFC_SHARED_DIR it also holds the tenant's lock across worker processes, first adopts any
+        newer version another worker wrote, and shares whatever it publishes before letting go.
+        """
+        with self.lock:
+            if self.store is not None:
+                self.store.reinstate(self.owner)
+            if SHARED is None or self._writing:
+                yield
+                return
+            self._writing = True
+            try:
+                with SHARED.locked(self.tenant):
+                    SHARED.sync(self)
+                    before = self.snapshot
+                    yield
+                    if self.snapshot is not before:
+                        SHARED.save(self)
+            finally:
+                self._writing = False
+
+    def publish(self, df: Optional[pd.DataFrame], derived: Optional[Dict[str, Any]] = None,
+                version: Optional[int] = None, last_updated: Optional[str] = None) -> DatasetSnapshot:
+        """Swap in a new snapshot (the next version unless one is given). Call inside `writing()`."""
+        snap = DatasetSnapshot(
+            df, self.version + 1 if version is None else version,
+            last_updated or datetime.now(timezone.utc).isoformat(), derived,
+        )
+        if derived is not None:
+            derived["version"] = snap.version
+        self.derived_bytes = 0 if derived is None else _derived_bytes(derived)
+        self.snapshot = snap
+        return snap
+
+
+def _frame_bytes(df: Optional[pd.DataFrame]) -> int:
+    return 0 if df is None else int(df.memory_usage(index=True, deep=True).sum())
+
+
+def _object_bytes(df: Optional[pd.DataFrame]) -> int:
+    """
+    What `df` would take with plain object-string columns and float amounts (the layout
+    before compaction), estimated per distinct value so it stays O(categories).
+    """
+    if df is None:
+        return 0
+    total = int(df.index.memory_usage())
+    for col in df.columns:
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            sizes = np.array([sys.getsizeof(v) for v in s.cat.categories], dtype=np.int64)
+            codes = s.cat.codes.to_numpy()
+            counts = np.bincount(codes[codes >= 0], minlength=len(sizes))
+            total += 8 * len(s) + int(sizes @ counts)
+        else:
+            total += int(s.memory_usage(index=False, deep=True))
+    return total
+
+
+# -----------------------------------------------------------------------------
+# Columnar snapshots (one .npy file per column, reopened memory-mapped)
+# -----------------------------------------------------------------------------
+def _tenant_key(tenant: str) -> str:
+    return hashlib.sha1(tenant.encode()).hexdigest()
+
+
+def _write_column(path: str, stem: str, s: pd.Series) -> Dict[str, Any]:
+    """
+    Save one column as <stem>.npy. Categoricals store their codes (and categories as JSON
+    in <stem>.cats.json), dates their int64 nanoseconds, text columns are dictionary-encoded.
+    """
+    entry: Dict[str, Any] = {"name": None if s.name is None else str(s.name), "file": f"{stem}.npy"}
+    if pd.api.types.is_datetime64_ns_dtype(s.dtype):
+        entry["kind"] = "datetime"
+        data = s.to_numpy().view(np.int64)
+    elif s.dtype.kind in "biuf":
+        entry["kind"] = "numeric"
+        data = s.to_numpy()
+    else:
+        entry["kind"] = "category" if isinstance(s.dtype, pd.CategoricalDtype) else "object"
+        cat = s if entry["kind"] == "category" else s.astype("category")
+        if cat.cat.ordered:
+            entry["ordered"] = True
+        data = cat.cat.codes.to_numpy()
+        with open(os.path.join(path, f"{stem}.cats.json"), "w") as fh:
+            json.dump([v.item() if hasattr(v, "item") else v for v in cat.cat.categories], fh)
+    np.save(os.path.join(path, entry["file"]), data)
+    return entry
+
+
+def _read_column(path: str, stem: str, entry: Dict[str, Any], objects: bool = False):
+    """
+    Reopen a column saved by _write_column, memory-mapped where the layout allows. Text columns
+    come back dictionary-encoded unless `objects` (rebuilding objects per row costs O(rows)).
+    """
+    arr = np.load(os.path.join(path, entry["file"]), mmap_mode="r")
+    if entry["kind"] == "datetime":
+        return arr.view("datetime64[ns]")
+    if entry["kind"] == "numeric":
+        return arr
+    with open(os.path.join(path, f"{stem}.cats.json")) as fh:
+        cats = json.load(fh)
+    if objects and entry["kind"] == "object":
+        return np.asarray(cats + [None], dtype=object)[np.asarray(arr)]  # code -1 (missing) picks the trailing None
+    return pd.Categorical.from_codes(np.asarray(arr), categories=cats, ordered=entry.get("ordered", False))
+
+
+def _write_frame(path: str, df: pd.DataFrame) -> Dict[str, Any]:
+    """Save `df`'s index and columns into `path`; returns their meta entries."""
+    index = _write_column(path, "index", df.index.to_series())
+    columns = [_write_column(path, str(i), df[col]) for i, col in enumerate(df.columns)]
+    return {"rows": len(df), "index": index, "columns": columns}
+
+
+def _read_frame(path: str, meta: Dict[str, Any], objects: bool = False) -> pd.DataFrame:
+    # snapshots written before the index had a meta entry hold a plain int64 index.npy
+    index = meta.get("index", {"name": None, "kind": "numeric", "file": "index.npy"})
+    data = {entry["name"]: _read_column(path, str(i), entry, objects) for i, entry in enumerate(meta["columns"])}
+    return pd.DataFrame(data, index=pd.Index(_read_column(path, "index", index, objects), name=index["name"]), copy=False)
+
+
+def write_snapshot(root: str, tenant: str, df: pd.DataFrame, version: int, last_updated: str) -> str:
+    """
+    Write `df` as <root>/<tenant hash>/v<version>/ with one .npy per column plus meta.json,
+    then point CURRENT at it and drop older versions (see _write_column for the encoding).
+    The version directory is renamed into place, so readers never see a partial snapshot.
+    """
+    base = os.path.join(root, _tenant_key(tenant))
+    os.makedirs(base, exist_ok=True)
+    name = f"v{version}"
+    tmp = os.path.join(base, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    frame = _write_frame(tmp, df)
+    with open(os.path.join(tmp, "meta.json"), "w") as fh:
+        json.dump({"version": version, "last_updated": last_updated, **frame}, fh)
+
+    final = os.path.join(base, name)
+    shutil.rmtree(final, ignore_errors=True)
+    os.replace(tmp, final)
+    with open(os.path.join(base, "CURRENT.tmp"), "w") as fh:
+        fh.write(name)
+    os.replace(os.path.join(base, "CURRENT.tmp"), os.path.join(base, "CURRENT"))
+    for old in os.listdir(base):
+        if old.startswith("v") and old != name:
+            shutil.rmtree(os.path.join(base, old), ignore_errors=True)
+    return final
+
+
+def read_snapshot(root: str, tenant: str) -> Optional[Tuple[pd.DataFrame, int, str]]:
+    """Reopen a tenant's CURRENT snapshot with its numeric columns memory-mapped (read-only)."""
+    base = os.path.join(root, _tenant_key(tenant))
+    try:
+        with open(os.path.join(base, "CURRENT")) as fh:
+            path = os.path.join(base, fh.read().strip())
+        with open(os.path.join(path, "meta.json")) as fh:
+            meta = json.load(fh)
+    except FileNotFoundError:
+        return None
+    return _read_frame(path, meta), int(meta["version"]), meta["last_updated"]
+
+
+def remove_snapshot(root: str, tenant: str):
+    shutil.rmtree(os.path.join(root, _tenant_key(tenant)), ignore_errors=True)
+
+
+class SnapshotWriter:
+    """
+    Background writer for SNAPSHOT_DIR. Scheduling a tenant coalesces with any write already
+    queued for it, and the job reads the dataset when it runs, so only the newest version is
+    written; a tenant whose data was cleared has its snapshot deleted instead. remove() leaves
+    a floor so a write of the cleared (or any older) version that was already underway is dropped.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._pending: "OrderedDict[str, Dataset]" = OrderedDict()
+        self._busy = False
+        self._cv = threading.Condition()
+        self._io = threading.Lock()
+        self._floor: Dict[str, int] = {}  # tenant -> highest removed version, under _io
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, ds: Dataset):
+        with self._cv:
+            self._pending[ds.tenant] = ds
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+                self._thread.start()
+            self._cv.notify()
+
+    def _run(self):
+        while True:
+            with self._cv:
+                while not self._pending:
+                    self._cv.wait()
+                _, ds = self._pending.popitem(last=False)
+                self._busy = True
+            try:
+                with self._io:
+                    snap = ds.snapshot  # read under _io, so a remove() can't slip in before the write
+                    if snap.version > self._floor.get(ds.tenant, -1):
+                        if snap.empty:
+                            remove_snapshot(self.root, ds.tenant)
+                        else:
+                            write_snapshot(self.root, ds.tenant, snap.df, snap.version, snap.last_updated)
+                            self._floor.pop(ds.tenant, None)
+            except Exception as e:
+                log.warning("snapshot write failed: %s", e)
+            finally:
+                with self._cv:
+                    self._busy = False
+                    self._cv.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait for queued writes to finish (shutdown, tests)."""
+        with self._cv:
+            return self._cv.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def remove(self, tenant: str, version: Optional[int] = None):
+        """Delete the tenant's snapshot; with `version`, also skip any later write of that version or older."""
+        with self._cv:
+            self._pending.pop(tenant, None)
+        with self._io:
+            remove_snapshot(self.root, tenant)
+            if version is not None:
+                self._floor[tenant] = max(version, self._floor.get(tenant, version))
+
+
+SNAPSHOTS = SnapshotWriter(SNAPSHOT_DIR) if SNAPSHOT_DIR else None
+
+
+# -----------------------------------------------------------------------------
+# Shared datasets for multi-worker deployments (SFC_SHARED_DIR)
+# -----------------------------------------------------------------------------
+DERIVED_FRAMES = ("df", "income", "expense", "merchant_stats", "anomalies", "subscriptions")
+DERIVED_CUBES = ("cat_cube", "merch_cube")
+
+
+def write_derived(root: str, tenant: str, version: int, d: Dict[str, Any]) -> bool:
+    """
+    Save a derived dict next to snapshot v<version> as derived/ (frames in the snapshot column
+    layout, cubes as .npy). False if that version is gone or another worker saved it first.
+    """
+    vdir = os.path.join(root, _tenant_key(tenant), f"v{version}")
+    final = os.path.join(vdir, "derived")
+    if not os.path.isdir(vdir) or os.path.exists(final):
+        return False
+    tmp = os.path.join(vdir, f".derived.{os.getpid()}.{threading.get_ident()}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    try:
+        meta: Dict[str, Any] = {"frames": {}, "cubes": {}}
+        for name in DERIVED_FRAMES:
+            if d[name] is None:
+                meta["frames"][name] = None
+                continue
+            os.makedirs(os.path.join(tmp, name))
+            meta["frames"][name] = _write_frame(os.path.join(tmp, name), d[name])
+        for name in DERIVED_CUBES:
+            cube = d[name]
+            os.makedirs(os.path.join(tmp, name))
+            for part in ("count", "total", "median"):
+                np.save(os.path.join(tmp, name, f"{part}.npy"), getattr(cube, part))
+            last = None if cube.last_date is None else cube.last_date.isoformat()
+            meta["cubes"][name] = {"months": cube.months, "keys": cube.keys, "last_date": last}
+        with open(os.path.join(tmp, "meta.json"), "w") as fh:
+            json.dump(meta, fh)
+        os.replace(tmp, final)
+        return True
+    except FileNotFoundError:  # the version was replaced meanwhile
+        return False
+    except OSError:
+        if os.path.isdir(final):  # another worker saved it first
+            return False
+        raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def read_derived(root: str, tenant: str, version: int) -> Optional[Dict[str, Any]]:
+    """Reopen the derived dict saved for v<version> (memory-mapped), or None if there isn't one."""
+    path = os.path.join(root, _tenant_key(tenant), f"v{version}", "derived")
+    try:
+        with open(os.path.join(path, "meta.json")) as fh:
+            meta = json.load(fh)
+        frames = {
+            name: None if m is None else _read_frame(os.path.join(path, name), m, objects=True)
+            for name, m in meta["frames"].items()
+        }
+        cubes = {}
+        for name, m in meta["cubes"].items():
+            parts = [np.load(os.path.join(path, name, f"{p}.npy"), mmap_mode="r") for p in ("count", "total", "median")]
+            last = None if m["last_date"] is None else pd.Timestamp(m["last_date"])
+            cubes[name] = AggregateCube(m["months"], m["keys"], *parts, last_date=last)
+    except FileNotFoundError:  # not saved yet, or a newer version replaced it
+        return None
+    return _derived_dict(
+        frames["df"], frames["income"], frames["expense"], cubes["cat_cube"], cubes["merch_cube"],
+        frames["merchant_stats"], frames["anomalies"], frames["subscriptions"],
+    )
+
+
+class SharedDatasets:
+    """
+    Datasets shared by every worker process through SFC_SHARED_DIR. Each version is a snapshot
+    (plus its derived caches once one worker has built them) that workers reopen memory-mapped,
+    so N workers hold one copy in the page cache. Writers hold a per-tenant file lock, write the
+    new version and bump the tenant's slot in generations.bin, a small memory-mapped array of
+    counters; readers compare that slot with what they last saw (one memory read per request)
+    and reload only when it moved.
+    """
+
+    def __init__(self, root: str, slots: int = SHARED_SLOTS):
+        self.root = root
+        self.slots = slots
+        self.stats = {"writes": 0, "reloads": 0, "derived_loads": 0, "derived_builds": 0}
+        self._generations = None
+        self._open_lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @contextlib.contextmanager
+    def _flock(self, path: str, shared: bool = False):
+        import fcntl
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)  # releases the lock
+
+    def locked(self, tenant: str, shared: bool = False, name: str = "LOCK"):
+        """The tenant's cross-process lock: exclusive for writers, `shared` for reloads."""
+        base = os.path.join(self.root, _tenant_key(tenant))
+        os.makedirs(base, exist_ok=True)
+        return self._flock(os.path.join(base, name), shared)
+
+    def _slot_array(self) -> np.ndarray:
+        if self._generations is not None:
+            return self._generations
+        with self._open_lock:
+            if self._generations is None:
+                path = os.path.join(self.root, "generations.bin")
+                with self._flock(path + ".lock"):
+                    with open(path, "ab") as fh:
+                        if fh.tell() < self.slots * 8:
+                            fh.truncate(self.slots * 8)
+                size = os.path.getsize(path) // 8  # the first worker's slot count wins
+                self._generations = np.memmap(path, dtype=np.int64, mode="r+", shape=(size,))
+            return self._generations
+
+    def _slot(self, tenant: str) -> int:
+        return int(_tenant_key(tenant)[:12], 16) % len(self._slot_array())
+
+    def generation(self, tenant: str) -> int:
+        return int(self._slot_array()[self._slot(tenant)])
+
+    def _signal(self, tenant: str) -> int:
+        # tenants can share a slot, so increments are serialized or one could be lost
+        slots, i = self._slot_array(), self._slot(tenant)
+        with self._flock(os.path.join(self.root, "generations.bin.lock")):
+            slots[i] += 1
+            return int(slots[i])
+
+    def _current_version(self, tenant: str) -> Optional[int]:
+        base = os.path.join(self.root, _tenant_key(tenant))
+        try:
+            with open(os.path.join(base, "CURRENT")) as fh:
+                name = fh.read().strip()
+            with open(os.path.join(base, name, "meta.json")) as fh:
+                return int(json.load(fh)["version"])
+        except FileNotFoundError:
+            return None
+
+    def sync(self, ds: Dataset) -> bool:
+        """Adopt the shared copy if it is a different version than `ds` mirrors. Hold `locked()` and `ds.lock`."""
+        generation = self.generation(ds.tenant)  # read before the data, so a later bump is never missed
+        version = self._current_version(ds.tenant)
+        changed = version is not None and version != ds.shared_version
+        if changed:
+            saved = read_snapshot(self.root, ds.tenant)
+            if saved is None:
+                return False
+            df, version, updated = saved
+            if df.empty:
+                df = pd.DataFrame(columns=["date", "merchant", "amount"])
+            ds.publish(df, version=version, last_updated=updated)
+            ds.frame_bytes, ds.object_bytes = _frame_bytes(df), _object_bytes(df)
+            ds.shared_version = version
+            self.stats["reloads"] += 1
+        ds.shared_generation = generation
+        return changed
+
+    def refresh(self, ds: Dataset):
+        """Per request: reload `ds` if a writer signaled its slot since this worker last looked."""
+        if self.generation(ds.tenant) == ds.shared_generation:
+            return
+        with ds.lock, self.locked(ds.tenant, shared=True):
+            self.sync(ds)
+
+    def save(self, ds: Dataset):
+        """Share what a writer just published (inside `ds.writing()`), then signal the other workers."""
+        snap = ds.snapshot
+        df = snap.df if snap.df is not None else pd.DataFrame(columns=["date", "merchant", "amount"])
+        write_snapshot(self.root, ds.tenant, df, snap.version, snap.last_updated)
+        if snap.derived is not None:
+            self._save_derived(ds.tenant, snap.version, snap.derived)
+        ds.shared_version = snap.version
+        ds.shared_generation = self._signal(ds.tenant)
+        self.stats["writes"] += 1
+
+    def derived(self, tenant: str, version: int, build) -> Dict[str, Any]:
+        """The derived dict for `version`: loaded if a worker already saved it, else built here and saved."""
+        with self.locked(tenant, name="DERIVED.lock"):  # other workers wait for this build, then load it
+            d = read_derived(self.root, tenant, version)
+            if d is not None:
+                self.stats["derived_loads"] += 1
+                return d
+            d = build()
+            self._save_derived(tenant, version, d)
+            self.stats["derived_builds"] += 1
+            return d
+
+    def _save_derived(self, tenant: str, version: int, d: Dict[str, Any]):
+        # optional: a worker that can't load them just builds its own
+        try:
+            write_derived(self.root, tenant, version, d)
+        except Exception as e:
+            log.warning("could not share derived caches: %s", e)
+
+    def report(self) -> Dict[str, Any]:
+        return {"enabled": True, "dir": self.root, "pid": os.getpid(), **self.stats}
+
+
+SHARED = SharedDatasets(SHARED_DIR) if SHARED_DIR else None
+
+
+def shared_report() -> Dict[str, Any]:
+    return SHARED.report() if SHARED is not None else {"enabled": False}
+
+
+class DatasetStore:
+    """
+    Datasets keyed by tenant/session ID under one global memory budget.
+    Least-recently-used tenants are evicted when the budget is exceeded; with a
+    spill directory they are written to disk and reloaded on their next request,
+    otherwise they start over from the sample data.
+    """
+
+    def __init__(self, budget_bytes: int, spill_dir: Optional[str] = None):
+        self.budget_bytes = budget_bytes
+        self.spill_dir = spill_dir
+        self._entries: "OrderedDict[str, Dataset]" = OrderedDict()
+        self._spilling: Dict[str, Dataset] = {}  # evicted, still being written out
+        self._lock = threading.Lock()
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def get(self, tenant: str) -> Dataset:
+        with self._lock:
+            ds = self._entries.get(tenant)
+            if ds is None and tenant in self._spilling:
+                ds = self._entries[tenant] = self._spilling[tenant]  # still in memory: take it back
+            fresh = ds is None
+            if fresh:
+                ds = Dataset(tenant)
+                ds.store = self
+                ds.lock.acquire()  # held until loaded, so concurrent getters wait on it
+                self._entries[tenant] = ds
+            else:
+                self._entries.move_to_end(tenant)
+        if fresh:
+            t0 = time.perf_counter()
+            try:
+                with ds.writing():  # with SFC_SHARED_DIR, picks up the shared copy if there is one
+                    if ds.shared_version is None and not self._restore(ds):
+                        set_dataframe(generate_sample_transactions(), ds, persist=False)
+            finally:
+                ds.lock.release()
+            STARTUP.setdefault("first_dataset_s", round(time.perf_counter() - t0, 4))
+            self.enforce_budget(keep=ds)
+        elif ds.df is None:
+            with ds.lock:
+                pass
+        if SHARED is not None:
+            SHARED.refresh(ds)
+        return ds
+
+    def reinstate(self, ds: Dataset):
+        """
+        Put `ds` (whose lock the caller holds) back if it was evicted after a request got it. If
+        another Dataset was built for the tenant meanwhile, `ds` replaces it, first taking over
+        its snapshot when that one is newer, so what `ds` publishes next is what the tenant sees.
+        """
+        with self._lock:
+            live = self._entries.get(ds.tenant)
+            if live is None:
+                self._entries[ds.tenant] = ds
+            if live is None or live is ds:
+                return
+        with live.lock:
+            if live.last_updated > ds.last_updated:
+                ds.snapshot = live.snapshot
+                ds.frame_bytes, ds.object_bytes, ds.derived_bytes = live.frame_bytes, live.object_bytes, live.derived_bytes
+                ds.shared_version, ds.shared_generation = live.shared_version, live.shared_generation
+                ds.forecast_cache = {"version": None}
+            with self._lock:
+                self._entries[ds.tenant] = ds
+        log.info("reinstated an evicted tenant dataset before writing")
+
+    def _restore(self, ds: Dataset) -> bool:
+        """Load the newest on-disk copy (durable snapshot or eviction spill), if any."""
+        best = None
+        for root in (SNAPSHOT_DIR, self.spill_dir):
+            if not root:
+                continue
+            try:
+                saved = read_snapshot(root, ds.tenant)
+            except Exception as e:
+                log.warning("could not reopen dataset snapshot: %s", e)
+                continue
+            if saved is not None and (best is None or saved[1] > best[1]):
+                best = saved
+        if best is None:
+            return False
+        df, version, updated = best
+        ds.publish(df, version=version, last_updated=updated)
+        ds.frame_bytes, ds.object_bytes = _frame_bytes(df), _object_bytes(df)
+        return True
+
+    def _spill(self, ds: Dataset):
+        snap = ds.snapshot
+        write_snapshot(self.spill_dir, ds.tenant, snap.df, snap.version, snap.last_updated)
+
+    def forget(self, tenant: str, version: Optional[int] = None):
+        """Delete every on-disk copy of a tenant (used by /api/clear, with the cleared version)."""
+        if self.spill_dir:
+            remove_snapshot(self.spill_dir, tenant)
+        if SNAPSHOTS is not None:
+            SNAPSHOTS.remove(tenant, version)
+
+    def enforce_budget(self, keep: Optional[Dataset] = None):
+        """
+        Evict LRU tenants (never `keep`, never one mid-write) until under budget. Victims are
+        picked under the store lock but spilled after it is released, holding only their own
+        lock; a tenant requested meanwhile is taken back, and one whose spill fails is restored.
+        """
+        victims = []
+        with self._lock:
+            total = sum(d.resident_bytes for d in self._entries.values())
+            for tenant in list(self._entries):
+                if total <= self.budget_bytes:
+                    break
+                ds = self._entries[tenant]
+                if ds is keep or not ds.lock.acquire(blocking=False):
+                    continue
+                del self._entries[tenant]
+                self._spilling[tenant] = ds
+                total -= ds.resident_bytes
+                victims.append(ds)
+
+        for ds in victims:
+            spilled = False
+            try:
+                if self.spill_dir and ds.df is not None:
+                    self._spill(ds)
+                    spilled = True
+            except Exception as e:
+                log.warning("could not spill tenant dataset, keeping it in memory: %s", e)
+                with self._lock:
+                    if self._entries.setdefault(ds.tenant, ds) is ds:
+                        self._entries.move_to_end(ds.tenant, last=False)
+                continue
+            finally:
+                with self._lock:
+                    self._spilling.pop(ds.tenant, None)
+                ds.lock.release()
+            log.info("evicted tenant dataset (%d bytes, spilled=%s)", ds.resident_bytes, spilled)
+
+    def memory_report(self) -> Dict[str, Any]:
+        with self._lock:
+            tenants = [
+                {
+                    "tenant": hashlib.sha1(t.encode()).hexdigest()[:10],
+                    "records": d.records,
+                    "version": d.version,
+                    "resident_bytes": d.resident_bytes,
+                    "frame_bytes": d.frame_bytes,
+                    "object_frame_bytes": d.object_bytes,
+                    "derived_bytes": d.derived_bytes,
+                }
+                for t, d in self._entries.items()
+            ]
+        frame = sum(t["frame_bytes"] for t in tenants)
+        plain = sum(t["object_frame_bytes"] for t in tenants)
+        return {
+            "budget_bytes": self.budget_bytes,
+            "total_resident_bytes": sum(t["resident_bytes"] for t in tenants),
+            "total_derived_bytes": sum(t["derived_bytes"] for t in tenants),
+            "compact_savings_bytes": max(0, plain - frame),  # stored frames only; derived copies aren't compacted
+            "tenants": tenants,
+        }
+
+
+STORE = DatasetStore(MEMORY_BUDGET_BYTES, SPILL_DIR)
+
+
+def get_dataset(
+    x_session_id: Optional[str] = Header(None),
+    session: Optional[str] = Query(None),
+) -> Dataset:
+    """FastAPI dependency: the caller's dataset, from the X-Session-ID header or ?session=."""
+    tenant = (x_session_id or session or DEFAULT_TENANT).strip() or DEFAULT_TENANT
+    if len(tenant) > 128:
+        raise HTTPException(status_code=400, detail="Session ID too long.")
+    return STORE.get(tenant)
+
+
+# -----------------------------------------------------------------------------
+# Conditional GETs (ETag / 304 keyed on the dataset version)
+# -----------------------------------------------------------------------------
+# Read endpoints whose body is a pure function of (tenant data version, query string). /coach is
+# left out (the LLM may fail one call and answer the next), as are anomalies_ml (the model fits in
+# the background) and the SSE streams.
+CONDITIONAL_GETS = {
+    "/api/transactions", "/api/summary", "/api/subscriptions", "/api/anomalies", "/api/forecast",
+    "/api/trends", "/api/compare", "/api/score", "/api/dashboard",
+}
+CONDITIONAL_CACHE_CONTROL = "private, no-cache"
+
+_CONDITIONAL_STATS = {"hits": 0, "misses": 0}
+
+
+def _conditional_etag(request, ds: Dataset) -> str:
+    """Weak ETag over tenant, version, last_updated (differs across restarts without a snapshot), path and params."""
+    params = sorted((k, v) for k, v in request.query_params.multi_items() if k != "session")
+    snap = ds.snapshot
+    raw = json.dumps([ds.tenant, int(snap.version), snap.last_updated, request.url.path, params])
+    return f'W/"{hashlib.sha1(raw.encode()).hexdigest()[:24]}"'
+
+
+def _conditional_applies(request) -> bool:
+    if request.method != "GET" or request.url.path not in CONDITIONAL_GETS:
+        return False
+    q = request.query_params
+    if q.get("mode") == "monte_carlo" and q.get("seed") is None:
+        return False  # fresh random paths on every call
+    if request.url.path == "/api/dashboard" and "coach" in (q.get("fields") or "coach").split(","):
+        return False
+    return True
+
+
+def _if_none_match(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags or etag[2:] in tags
+
+
+def conditional_report() -> Dict[str, Any]:
+    hits, misses = _CONDITIONAL_STATS["hits"], _CONDITIONAL_STATS["misses"]
+    return {"hits": hits, "misses": misses, "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None}
+
+
+class ConditionalGetMiddleware:
+    """
+    Plain ASGI middleware: answers If-None-Match with 304 before the endpoint (and any pandas work)
+    runs. Anything but a GET to CONDITIONAL_GETS (uploads, SSE streams) passes through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        request = Request(scope)
+        if not _conditional_applies(request):
+            return await self.app(scope, receive, send)
+        tenant = (request.headers.get("x-session-id") or request.query_params.get("session") or DEFAULT_TENANT).strip() or DEFAULT_TENANT
+        if len(tenant) > 128:
+            return await self.app(scope, receive, send)  # get_dataset answers 400
+        ds = await run_in_threadpool(STORE.get, tenant)  # may restore a spilled snapshot from disk
+        etag = _conditional_etag(request, ds)
+        headers = {"ETag": etag, "Cache-Control": CONDITIONAL_CACHE_CONTROL, "Vary": "X-Session-ID"}
+        if _if_none_match(request.headers.get("if-none-match"), etag):
+            _CONDITIONAL_STATS["hits"] += 1
+            return await Response(status_code=304, headers=headers)(scope, receive, send)
+        _CONDITIONAL_STATS["misses"] += 1
+        raw = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()]
+
+        async def send_tagged(message):
+            # computed before the handler ran: if data changed meanwhile, the next poll simply misses
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                message = {**message, "headers": list(message.get("headers", [])) + raw}
+            await send(message)
+
+        await self.app(scope, receive, send_tagged)
+
+
+app.add_middleware(ConditionalGetMiddleware)
+
+
+# -----------------------------------------------------------------------------
+# Instrumentation (Server-Timing headers, latency histograms for /api/metrics)
+# -----------------------------------------------------------------------------
+# SFC_METRICS=0 turns it all off: `timed` then returns the function itself and no middleware is added.
+METRICS_ENABLED = os.getenv("SFC_METRICS", "1") == "1"
+METRICS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_REQUEST_STAGES: "contextvars.ContextVar[Optional[List[Tuple[str, float]]]]" = contextvars.ContextVar("stages", default=None)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram per label set (thread-safe)."""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...], buckets=METRICS_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help_text, labels, buckets
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(label_values)
+            if s is None:
+                s = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            if i < len(self.buckets):
+                s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    def render(self) -> List[str]:
+        def fmt(values, le=None):
+            pairs = list(zip(self.labels, values)) + ([("le", le)] if le is not None else [])
+            esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}" if pairs else ""
+
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((k, list(v)) for k, v in self._series.items())
+        for values, s in series:
+            total = 0
+            for bound, n in zip(self.buckets, s):
+                total += n
+                lines.append(f"{self.name}_bucket{fmt(values, repr(bound))} {total}")
+            lines.append(f"{self.name}_bucket{fmt(values, '+Inf')} {s[-1]}")
+            lines.append(f"{self.name}_sum{fmt(values)} {s[-2]:.6f}")
+            lines.append(f"{self.name}_count{fmt(values)} {s[-1]}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram("sfc_request_duration_seconds", "Request latency until response headers, by route.",
+                            ("method", "route", "status"))
+STAGE_SECONDS = Histogram("sfc_stage_duration_seconds", "Time spent in pipeline stages (helpers, JSON, LLM).", ("stage",))
+
+
+def record_stage(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage)
+    stages = _REQUEST_STAGES.get()
+    if stages is not None:
+        stages.append((stage, seconds))
+
+
+def timed(stage: str):
+    """Decorator: time each call as `stage` (also in the current request's Server-Timing header)."""
+    def deco(fn):
+        if not METRICS_ENABLED:
+            return fn
+        if asyncio.iscoroutinefunction(fn):
+            async def wrapper(*args, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    record_stage(stage, time.perf_counter() - t0)
+        else:
+            def wrapper(*args, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    record_stage(stage, time.perf_counter() - t0)
+        return functools.wraps(fn)(wrapper)
+    return deco
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse whose serialization is timed as the `json` stage."""
+
+    def render(self, content: Any) -> bytes:
+        t0 = time.perf_counter()
+        try:
+            return super().render(content)
+        finally:
+            record_stage("json", time.perf_counter() - t0)
+
+
+def _server_timing(stages: List[Tuple[str, float]], total: float) -> str:
+    """Server-Timing value: repeated stages are summed, first-seen order, milliseconds."""
+    merged: Dict[str, List[float]] = {}
+    for name, secs in stages:
+        m = merged.setdefault(name, [0.0, 0])
+        m[0] += secs
+        m[1] += 1
+    parts = [f'{name};dur={secs * 1000:.2f}' + (f';desc="x{n}"' if n > 1 else "") for name, (secs, n) in merged.items()]
+    return ", ".join(parts + [f"total;dur={total * 1000:.2f}"])
+
+
+class RequestTimingMiddleware:
+    """
+    Plain ASGI middleware (cheaper than @app.middleware): collects the request's stages, adds a
+    Server-Timing header and observes the route's latency when the response headers go out.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stages: List[Tuple[str, float]] = []
+        token = _REQUEST_STAGES.set(stages)
+        t0 = time.perf_counter()
+
+        async def send_timed(message):
+            if message["type"] == "http.response.start":
+                total = time.perf_counter() - t0
+                route = getattr(scope.get("route"), "path", None)
+                if route is None:  # 304s from ConditionalGetMiddleware never reach the router; keep label cardinality bounded
+                    route = scope["path"] if scope["path"] in CONDITIONAL_GETS else "unmatched"
+                REQUEST_SECONDS.observe(total, scope["method"], route, str(message["status"]))
+                headers = list(message.get("headers", [])) + [(b"server-timing", _server_timing(stages, total).encode())]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            _REQUEST_STAGES.reset(token)
+
+
+# For handlers that build their JSON response themselves; timed only when metrics are on.
+APIJSONResponse = TimedJSONResponse if METRICS_ENABLED else JSONResponse
+
+if METRICS_ENABLED:
+    # Routes registered from here on serialize through TimedJSONResponse by default.
+    app.router.default_response_class = TimedJSONResponse
+    app.add_middleware(RequestTimingMiddleware)
+
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["http://localhost:5173", "http://127.0.0.1:5173"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["ETag", "Server-Timing"],
+)
 
 
 # -----------------------------------------------------------------------------
 # Generators & transforms
 # -----------------------------------------------------------------------------
+# (merchant, average amount, times per month); income has a negative average
+SAMPLE_MERCHANTS = [
+    ("STARBUCKS", 4.5, 10), ("PEET COFFEE", 5.5, 6),
+    ("SAFEWAY", 65, 14), ("TRADER JOE'S", 45, 10),
+    ("UBEREATS", 28, 8), ("Local Pizza", 18, 6),
+    ("UBER", 16, 10), ("CHEVRON", 52, 5),
+    ("NETFLIX", 15.49, 1), ("SPOTIFY", 9.99, 1),
+    ("T-MOBILE", 70, 1), ("APARTMENTS LLC RENT", 1500, 1),
+    ("AMAZON", 32, 12), ("TARGET", 28, 8),
+    ("PAYROLL", -1800, 2),
+]
+
 def generate_sample_transactions(n_days: int = 90, seed: int = 7) -> pd.DataFrame:
     """
     Create ~n_days of mock transactions.
@@ -74,19 +1087,8 @@ def generate_sample_transactions(n_days: int = 90, seed: int = 7) -> pd.DataFram
     dates = [today - timedelta(days=i) for i in range(n_days)]
     rows = []
 
-    merchants = [
-        ("STARBUCKS", 4.5, 10), ("PEET COFFEE", 5.5, 6),
-        ("SAFEWAY", 65, 14), ("TRADER JOE'S", 45, 10),
-        ("UBEREATS", 28, 8), ("Local Pizza", 18, 6),
-        ("UBER", 16, 10), ("CHEVRON", 52, 5),
-        ("NETFLIX", 15.49, 1), ("SPOTIFY", 9.99, 1),
-        ("T-MOBILE", 70, 1), ("APARTMENTS LLC RENT", 1500, 1),
-        ("AMAZON", 32, 12), ("TARGET", 28, 8),
-        ("PAYROLL", -1800, 2),  # income: negative average
-    ]
-
     for d in dates:
-        for merchant, avg_amt, freq in merchants:
+        for merchant, avg_amt, freq in SAMPLE_MERCHANTS:
             p = min(0.9, freq / 30.0)  # rough monthly->daily probability
             if rng.random() < p:
                 mu = abs(avg_amt)
@@ -104,9 +1106,96 @@ def generate_sample_transactions(n_days: int = 90, seed: int = 7) -> pd.DataFram
     return df.sort_values("date")
 
 
-def set_dataframe(df: pd.DataFrame):
-    """Validate and set the global DATAFRAME."""
-    global DATAFRAME
+# Recurring charges for generate_transactions: (merchant, price, share of users who pay it)
+BULK_SUBSCRIPTIONS = [
+    ("NETFLIX", 15.49, 0.6), ("SPOTIFY", 9.99, 0.5), ("HULU", 7.99, 0.25),
+    ("DISNEY PLUS", 13.99, 0.3), ("YOUTUBE PREMIUM", 13.99, 0.15),
+    ("T-MOBILE", 70.0, 0.7), ("COMCAST", 85.0, 0.5),
+]
+
+
+def _monthly_days(days: np.ndarray, bill_day: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(row into bill_day, index into days) for every month in `days` whose bill_day (1-28) falls inside it."""
+    months = np.unique(days.astype("datetime64[M]")).astype("datetime64[D]")
+    idx = (months - days[0]).astype(np.int64)[None, :] + (bill_day.astype(np.int64) - 1)[:, None]
+    row, col = np.nonzero((idx >= 0) & (idx < len(days)))
+    return row, idx[row, col]
+
+
+def generate_transactions(
+    n_users: int = 1,
+    n_days: int = 90,
+    seed: int = 7,
+    end: Optional[str] = None,
+    anomaly_rate: float = 0.002,
+    label_anomalies: bool = False,
+) -> pd.DataFrame:
+    """
+    Vectorized bulk generator for load tests: n_users x n_days of transactions up to `end` (default today),
+    about 3 rows per user-day. Each user gets an income level, PAYROLL on the 1st and 15th, rent on the 1st,
+    a random subset of BULK_SUBSCRIPTIONS on their own billing day and daily spend at the other
+    SAMPLE_MERCHANTS; `anomaly_rate` of that spend is blown up 6-15x. Date-sorted, `merchant` categorical,
+    plus a `user` column when n_users > 1 (and `anomaly` if label_anomalies).
+    The demo data stays on generate_sample_transactions, whose rows depend on its RNG call order.
+    """
+    rng = np.random.default_rng(seed)
+    end_day = np.datetime64(end or datetime.utcnow().date(), "D")
+    days = end_day - np.arange(n_days - 1, -1, -1)
+    level = rng.lognormal(0.0, 0.35, n_users)
+    names, users, day_idx, amounts, flags = [], [], [], [], []
+
+    def add(name, u, d, amt, flag=None):
+        names.append(name)
+        users.append(u.astype(np.int32))
+        day_idx.append(d.astype(np.int32))
+        amounts.append(amt)
+        flags.append(np.zeros(len(u), dtype=bool) if flag is None else flag)
+
+    everyone = np.arange(n_users)
+    for bill_day, label in ((1, "PAYROLL"), (15, "PAYROLL")):
+        row, d = _monthly_days(days, np.full(n_users, bill_day))
+        add(label, row, d, -np.maximum(1.0, rng.normal(1800 * level[row], 36 * level[row])))
+    rent = np.round(1500 * level, 0)
+    row, d = _monthly_days(days, np.ones(n_users, dtype=np.int64))
+    add("APARTMENTS LLC RENT", row, d, rent[row])
+    for merchant, price, share in BULK_SUBSCRIPTIONS:
+        subs = everyone[rng.random(n_users) < share]
+        row, d = _monthly_days(days, rng.integers(1, 29, len(subs)))
+        add(merchant, subs[row], d, np.full(len(row), price))
+
+    recurring = {"PAYROLL", "APARTMENTS LLC RENT"} | {m for m, _, _ in BULK_SUBSCRIPTIONS}
+    for merchant, avg_amt, freq in SAMPLE_MERCHANTS:
+        if merchant in recurring:
+            continue
+        cell = np.flatnonzero(rng.random(n_users * n_days, dtype=np.float32) < min(0.9, freq / 30.0))
+        u, d = cell // n_days, cell % n_days
+        mu = avg_amt * level[u]
+        amt = np.maximum(1.0, rng.normal(mu, np.maximum(1.0, mu * 0.15)))
+        hit = rng.random(len(amt)) < anomaly_rate
+        amt[hit] *= rng.uniform(6, 15, int(hit.sum()))
+        add(merchant, u, d, amt, hit)
+
+    code = np.repeat(np.arange(len(names), dtype=np.int32), [len(a) for a in amounts])
+    day = np.concatenate(day_idx)
+    # Radix sort on small ints: stable, so each day keeps the construction order.
+    order = np.argsort(day.astype(np.int16) if n_days < 2 ** 15 else day, kind="stable")
+    merchants = list(dict.fromkeys(names))
+    remap = np.array([merchants.index(n) for n in names], dtype=np.int32)
+    out = {
+        "date": days[day[order]].astype("datetime64[ns]"),
+        "merchant": pd.Categorical.from_codes(remap[code[order]], categories=merchants),
+        "amount": np.round(np.concatenate(amounts)[order], 2),
+    }
+    if n_users > 1:
+        out["user"] = np.concatenate(users)[order]
+    if label_anomalies:
+        out["anomaly"] = np.concatenate(flags)[order]
+    return pd.DataFrame(out)
+
+
+@timed("normalize")
+def _normalize_transactions(df: pd.DataFrame) -> pd.DataFrame:
+    """Lower-case the columns, check the required ones and coerce types (unsorted)."""
     if df is None or df.empty:
         raise ValueError("Empty dataset.")
 
@@ -121,38 +1210,240 @@ def set_dataframe(df: pd.DataFrame):
     df["date"] = pd.to_datetime(df["date"], errors="coerce")
     df["merchant"] = df["merchant"].astype(str)
     df["amount"] = pd.to_numeric(df["amount"], errors="coerce")
-    df = df.dropna(subset=["date", "merchant", "amount"]).sort_values("date")
-    DATAFRAME = df
-    _bump_version()
+    return df.dropna(subset=["date", "merchant", "amount"])
+
+
+def _compact_transactions(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Storage layout for a normalized frame: `merchant` (and any other repetitive text
+    column except `id`) dictionary-encoded as a categorical, and `amount` kept as
+    integer `cents`. Idempotent. `_expand_transactions` gives the dollar view back.
+    """
+    if "cents" in df.columns or "amount" not in df.columns:
+        return df
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if col == "amount":
+            out["cents"] = np.rint(s.to_numpy(dtype=np.float64) * 100).astype(np.int64)
+        elif col == "merchant" or (
+            col != "id" and s.dtype == object and len(s) and s.nunique(dropna=True) <= len(s) // 2
+        ):
+            out[col] = s.astype("category")
+        else:
+            out[col] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+def _expand_transactions(df: pd.DataFrame) -> pd.DataFrame:
+    """Dollar view of a compact frame (`cents` back to a float `amount` in the same position)."""
+    if "cents" not in df.columns:
+        return df
+    out = df.rename(columns={"cents": "amount"})
+    out["amount"] = df["cents"].to_numpy() / 100.0
+    return out
+
+
+def _concat_compact(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """pd.concat that keeps categorical columns categorical by unioning their categories first."""
+    frames = list(frames)
+    for col in frames[0].columns:
+        if not all(col in f.columns and isinstance(f[col].dtype, pd.CategoricalDtype) for f in frames):
+            continue
+        cats = frames[0][col].cat.categories
+        for f in frames[1:]:
+            cats = cats.append(f[col].cat.categories.difference(cats))
+        frames = [
+            f if f[col].cat.categories.equals(cats) else f.assign(**{col: f[col].cat.set_categories(cats)})
+            for f in frames
+        ]
+    return pd.concat(frames)
+
 
+def set_dataframe(df: pd.DataFrame, ds: Optional[Dataset] = None, persist: bool = True) -> DatasetSnapshot:
+    """Validate and set a tenant's frame (the default tenant if none is given)."""
+    return _install_dataframe(_normalize_transactions(df), ds or STORE.get(DEFAULT_TENANT), persist)
 
-# Initialize with mock data on startup
-set_dataframe(generate_sample_transactions())
+
+def _persist(ds: Dataset):
+    if SNAPSHOTS is not None:
+        SNAPSHOTS.schedule(ds)
+
+
+def _install_dataframe(df: pd.DataFrame, ds: Dataset, persist: bool = True) -> DatasetSnapshot:
+    """
+    Sort and compact an already-normalized frame and publish it as the tenant's next snapshot.
+    With SFC_SNAPSHOT_DIR set the new version is also snapshotted to disk in the background.
+    """
+    df = _compact_transactions(df.sort_values("date"))
+    frame_bytes, object_bytes = _frame_bytes(df), _object_bytes(df)
+    with ds.writing():
+        snap = ds.publish(df)
+        ds.frame_bytes, ds.object_bytes = frame_bytes, object_bytes
+        ds.ml_models = {}
+    if persist:
+        _persist(ds)
+    STORE.enforce_budget(keep=ds)
+    return snap
+
+
+def _sorted_merge(base: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """
+    Merge `new` into the date-sorted `base` without re-sorting base: only the new rows are
+    sorted, then binary-searched into place (after any rows with the same date).
+    """
+    if new.empty:
+        return base
+    new = new.sort_values("date", kind="stable")
+    if base.empty:
+        return new
+    pos = np.searchsorted(base["date"].to_numpy(), new["date"].to_numpy(), side="right")
+    new_at = pos + np.arange(len(new))
+    take = np.empty(len(base) + len(new), dtype=np.int64)
+    is_new = np.zeros(len(take), dtype=bool)
+    is_new[new_at] = True
+    take[~is_new] = np.arange(len(base))
+    take[is_new] = len(base) + np.arange(len(new))
+    return _concat_compact([base, new]).iloc[take]
+
+
+# Initialize the default tenant on startup: its snapshot if there is one, else mock data.
+# With SFC_LAZY_STARTUP it is built by the first request that needs it instead.
+if not LAZY_STARTUP:
+    STORE.get(DEFAULT_TENANT)
+
+# Modules imported in a background thread once the server is up, so the first request that needs
+# them doesn't pay for the import (missing optional ones are skipped). Empty disables the prewarm.
+PREWARM_MODULES = [m.strip() for m in os.getenv("SFC_PREWARM", "numpy,pandas,sklearn.ensemble,httpx").split(",") if m.strip()]
+
+
+def _prewarm():
+    t0 = time.perf_counter()
+    for name in PREWARM_MODULES:
+        try:
+            _import_timed(name, {"numpy": "np", "pandas": "pd"}.get(name))
+        except ImportError:
+            STARTUP["imports_s"].setdefault(name, None)
+    STARTUP["prewarm_s"] = round(time.perf_counter() - t0, 4)
+
+
+@app.on_event("startup")
+def _start_prewarm():
+    STARTUP["ready_s"] = round(time.perf_counter() - _IMPORT_T0, 4)
+    if PREWARM_MODULES:
+        threading.Thread(target=_prewarm, name="prewarm", daemon=True).start()
+
+
+def startup_report() -> Dict[str, Any]:
+    return {**STARTUP, "imports_s": dict(STARTUP["imports_s"])}
+
+
+@app.on_event("shutdown")
+def _flush_snapshots():
+    if SNAPSHOTS is not None and not SNAPSHOTS.flush(timeout=30):
+        log.warning("shutdown before all dataset snapshots were written")
 
 # -----------------------------------------------------------------------------
 # Feature helpers
 # -----------------------------------------------------------------------------
+_CATEGORY_MATCHER: Optional[re.Pattern] = None
+_CATEGORY_MATCHER_KEY: Optional[Tuple] = None
+_CATEGORY_MEMO: Dict[str, str] = {}
+_CATEGORY_MEMO_MAX = int(os.getenv("SFC_CATEGORY_MEMO_MAX", "200000"))
+
+
+def _category_matcher() -> re.Pattern:
+    """
+    One compiled pattern for the whole keyword table.
+    Each category is an anchored lookahead alternative tried in table order, so the
+    first category with any keyword anywhere in the merchant wins (same as the old loop).
+    Rebuilt, and the merchant memo dropped, whenever CATEGORY_KEYWORDS changes.
+    """
+    global _CATEGORY_MATCHER, _CATEGORY_MATCHER_KEY
+    key = tuple((c, tuple(keys)) for c, keys in CATEGORY_KEYWORDS.items())
+    if _CATEGORY_MATCHER is None or key != _CATEGORY_MATCHER_KEY:
+        alts = [
+            f"(?=.*?(?:{'|'.join(re.escape(k) for k in keys)}))(?P<c{i}>)"
+            for i, (_, keys) in enumerate(key) if keys
+        ]
+        _CATEGORY_MATCHER = re.compile("^(?:" + "|".join(alts or ["(?!)"]) + ")", re.S)
+        _CATEGORY_MATCHER_KEY = key
+        _CATEGORY_MEMO.clear()
+    return _CATEGORY_MATCHER
+
+
+def _classify_merchant(merchant: str, matcher: re.Pattern) -> str:
+    cat = _CATEGORY_MEMO.get(merchant)
+    if cat is None:
+        m = matcher.match(merchant.upper())
+        cat = _CATEGORY_MATCHER_KEY[int(m.lastgroup[1:])][0] if m else "Other"
+        if len(_CATEGORY_MEMO) >= _CATEGORY_MEMO_MAX:
+            _CATEGORY_MEMO.clear()
+        _CATEGORY_MEMO[merchant] = cat
+    return cat
+
+
+def categorize_merchant(merchant: str) -> str:
+    """Category for one merchant string; memoized across requests and uploads."""
+    return _classify_merchant(merchant, _category_matcher())
+
+
+def _codes(series: pd.Series) -> Tuple[np.ndarray, pd.Index]:
+    """Integer codes and their labels: the categorical's own, or a factorization of the text."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories
+    codes, uniques = pd.factorize(series.astype(str))
+    return codes, pd.Index(uniques)
+
+
+def _sorted_codes(series: pd.Series) -> Tuple[np.ndarray, List[str]]:
+    """Codes renumbered over the labels that actually occur, in sorted label order."""
+    codes, labels = _codes(series)
+    present = np.flatnonzero(np.bincount(codes, minlength=len(labels)))
+    names = np.array([str(v) for v in labels[present]], dtype=object)
+    order = np.argsort(names, kind="stable")
+    remap = np.full(len(labels), -1, dtype=np.int64)
+    remap[present[order]] = np.arange(len(present))
+    return remap[codes], list(names[order])
+
+
+@timed("categorize")
 def categorize(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Classify each distinct merchant once, then broadcast back to rows by code.
+    `category` is a categorical over the keyword table's categories plus "Other".
+    """
     out = df.copy()
-    cats = []
-    for _, row in out.iterrows():
-        merch = str(row["merchant"]).upper()
-        cat = "Other"
-        for c, keys in CATEGORY_KEYWORDS.items():
-            if any(k in merch for k in keys):
-                cat = c
-                break
-        cats.append(cat)
-    out["category"] = cats
+    codes, uniques = _codes(out["merchant"])
+    matcher = _category_matcher()
+    labels = list(dict.fromkeys([c for c in CATEGORY_KEYWORDS] + ["Other"]))
+    pos = {c: i for i, c in enumerate(labels)}
+    cat_of = np.array([pos[_classify_merchant(str(m), matcher)] for m in uniques], dtype=np.int16)
+    out["category"] = pd.Categorical.from_codes(cat_of[codes] if len(cat_of) else codes, categories=labels)
     return out
 
 
+def _month_labels(dates: pd.Series) -> pd.Categorical:
+    """YYYY-MM labels as a categorical keyed by month ordinal (months since 1970-01), chronological."""
+    ords = dates.to_numpy().astype("datetime64[M]").astype(np.int64)
+    codes, uniq = pd.factorize(ords, sort=True)
+    labels = np.datetime_as_string(uniq.astype("datetime64[M]"), unit="M")
+    return pd.Categorical.from_codes(codes, categories=labels)
+
+
+@timed("monthly_bucket")
 def monthly_bucket(df: pd.DataFrame) -> pd.DataFrame:
     out = df.copy()
-    out["year_month"] = out["date"].dt.to_period("M").astype(str)
+    out["year_month"] = _month_labels(out["date"])
     return out
 
 
+def _with_month(df: pd.DataFrame) -> pd.DataFrame:
+    """Reuse an existing year_month column (e.g. from the derived cache) instead of recomputing it."""
+    return df if "year_month" in df.columns else monthly_bucket(df)
+
+
+@timed("split_income_expense")
 def split_income_expense(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """
     Income is negative amounts OR explicit category Income.
@@ -166,87 +1457,393 @@ def split_income_expense(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
     return income, expense
 
 
+def _cell_medians(flat: np.ndarray, amounts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Median amount per flat cell id: sort by (cell, amount) and read the middle of each run."""
+    order = np.lexsort((amounts, flat))
+    cells, starts, n = np.unique(flat[order], return_index=True, return_counts=True)
+    vals = amounts[order]
+    return cells, (vals[starts + (n - 1) // 2] + vals[starts + n // 2]) / 2.0
+
+
+def _rows_in_months(df: pd.DataFrame, months: List[str]) -> pd.DataFrame:
+    """Rows of a date-sorted frame falling in the given YYYY-MM months, located by binary search."""
+    dates = df["date"].to_numpy()
+    parts = []
+    for m in months:
+        p = pd.Period(m, freq="M")
+        lo, hi = np.searchsorted(dates, [p.start_time.to_datetime64(), (p + 1).start_time.to_datetime64()])
+        parts.append(df.iloc[lo:hi])
+    return pd.concat(parts) if parts else df.iloc[:0]
+
+
+class AggregateCube:
+    """
+    Dense month x key aggregates of expense amounts (key = category or merchant).
+    `months` and `keys` are sorted labels indexing the rows/columns of `count`,
+    `total` and `median`; empty cells have count 0, total 0.0 and median NaN.
+    Built once per dataset so month/category questions cost O(keys), not O(rows).
+    """
+
+    def __init__(self, months: List[str], keys: List[str], count: np.ndarray, total: np.ndarray,
+                 median: np.ndarray, last_date: Optional[pd.Timestamp] = None):
+        self.months = months
+        self.keys = keys
+        self.count = count
+        self.total = total
+        self.median = median
+        self.last_date = last_date
+        self._month_idx = {m: i for i, m in enumerate(months)}
+        self._key_idx = {k: i for i, k in enumerate(keys)}
+
+    @classmethod
+    @timed("cube")
+    def from_frame(cls, expense_df: pd.DataFrame, key: str) -> "AggregateCube":
+        if expense_df is None or expense_df.empty:
+            empty = np.zeros((0, 0))
+            return cls([], [], empty.astype(np.int64), empty, empty)
+        dfm = _with_month(expense_df)
+        m_codes, months = _sorted_codes(dfm["year_month"])
+        k_codes, keys = _sorted_codes(dfm[key])
+        shape = (len(months), len(keys))
+        flat = m_codes.astype(np.int64) * shape[1] + k_codes
+        amounts = dfm["amount"].to_numpy(dtype=np.float64)
+        size = shape[0] * shape[1]
+        count = np.bincount(flat, minlength=size)
+        total = np.bincount(flat, weights=amounts, minlength=size)
+        median = np.full(size, np.nan)
+        cells, med = _cell_medians(flat, amounts)
+        median[cells] = med
+        return cls(
+            [str(m) for m in months], [str(k) for k in keys],
+            count.reshape(shape), total.reshape(shape), median.reshape(shape),
+            last_date=pd.Timestamp(dfm["date"].max()),
+        )
+
+    def updated(self, expense_df: pd.DataFrame, added: pd.DataFrame, removed: pd.DataFrame, key: str) -> "AggregateCube":
+        """
+        New cube with `added` rows folded in and `removed` rows taken out (both month-bucketed).
+        `expense_df` is the full date-sorted expense frame after the change; only its rows in
+        touched months are re-read, to refresh the medians of touched cells.
+        """
+        parts = [f for f in (added.assign(_sign=1), removed.assign(_sign=-1)) if not f.empty]
+        if not parts:
+            return self
+        delta = _concat_compact(parts).reset_index(drop=True)
+        months = sorted(set(self.months).union(added["year_month"]))
+        keys = sorted(set(self.keys).union(added[key].astype(str)))
+        m_pos = {m: i for i, m in enumerate(months)}
+        k_pos = {k: i for i, k in enumerate(keys)}
+        shape = (len(months), len(keys))
+        count = np.zeros(shape, dtype=np.int64)
+        total = np.zeros(shape)
+        median = np.full(shape, np.nan)
+        old = np.ix_([m_pos[m] for m in self.months], [k_pos[k] for k in self.keys])
+        count[old], total[old], median[old] = self.count, self.total, self.median
+
+        mi = delta["year_month"].astype(str).map(m_pos).to_numpy(dtype=np.int64)
+        ki = delta[key].astype(str).map(k_pos).to_numpy(dtype=np.int64)
+        sign = delta["_sign"].to_numpy()
+        np.add.at(count, (mi, ki), sign)
+        np.add.at(total, (mi, ki), sign * delta["amount"].to_numpy(dtype=np.float64))
+
+        # Refresh medians of the touched cells from the rows now living in them.
+        touched = np.unique(mi * shape[1] + ki)
+        median.flat[touched] = np.nan
+        rows = _rows_in_months(expense_df, sorted(set(delta["year_month"])))
+        rows = rows[rows[key].astype(str).isin(set(delta[key].astype(str)))]
+        if not rows.empty:
+            flat = rows["year_month"].astype(str).map(m_pos).to_numpy(dtype=np.int64) * shape[1] \
+                + rows[key].astype(str).map(k_pos).to_numpy(dtype=np.int64)
+            cells, med = _cell_medians(flat, rows["amount"].to_numpy(dtype=np.float64))
+            median.flat[cells] = med
+
+        # Drop months/keys left without rows (e.g. after an upsert replaced them).
+        keep_m, keep_k = count.sum(axis=1) > 0, count.sum(axis=0) > 0
+        sel = np.ix_(keep_m, keep_k)
+        return AggregateCube(
+            [m for m, k in zip(months, keep_m) if k], [c for c, k in zip(keys, keep_k) if k],
+            count[sel], total[sel], median[sel],
+            last_date=pd.Timestamp(expense_df["date"].iloc[-1]) if not expense_df.empty else None,
+        )
+
+    def month_index(self, month: Optional[str]) -> Optional[int]:
+        return self._month_idx.get(month)
+
+    def month_totals(self) -> np.ndarray:
+        """Total per month, aligned with `months`."""
+        return self.total.sum(axis=1)
+
+    def month_total(self, month: Optional[str]) -> float:
+        i = self.month_index(month)
+        return 0.0 if i is None else float(self.total[i].sum())
+
+    def month_count(self, month: Optional[str]) -> int:
+        i = self.month_index(month)
+        return 0 if i is None else int(self.count[i].sum())
+
+    def row(self, month: Optional[str]) -> Dict[str, float]:
+        """{key: total} for keys with activity in `month`, in key order (like groupby().sum())."""
+        i = self.month_index(month)
+        if i is None:
+            return {}
+        hit = np.flatnonzero(self.count[i])
+        return {self.keys[j]: float(self.total[i, j]) for j in hit}
+
+    def value(self, month: Optional[str], key: str) -> float:
+        i, j = self.month_index(month), self._key_idx.get(key)
+        return 0.0 if i is None or j is None else float(self.total[i, j])
+
+
+def _sorted_desc(d: Dict[str, float], n: Optional[int] = None) -> Dict[str, float]:
+    """Largest values first, ties kept in key order."""
+    items = sorted(d.items(), key=lambda kv: -kv[1])
+    return dict(items[:n] if n is not None else items)
+
+
+SUBSCRIPTION_COLUMNS = ["merchant", "charge", "months", "count", "cadence", "next_date"]
+
+# Cadence from the gaps (days) between a recurring charge's transactions:
+# (min median gap, max median gap, max median absolute deviation of the gaps).
+CADENCE_DAYS = {"weekly": (5, 9, 2), "monthly": (26, 35, 4), "annual": (350, 380, 10)}
+_CADENCE_STEP = {"weekly": {"weeks": 1}, "monthly": {"months": 1}, "annual": {"years": 1}}  # pd.DateOffset kwargs
+_CADENCE_PERIOD = {"weekly": "W", "monthly": "M", "annual": "Y"}  # numpy datetime64 unit of one period
+# A cadence also needs >= 3 matching charges, a charge in most periods of their span, and about
+# one charge per period; frequent shopping at a similar price fails the last test.
+CADENCE_MIN_CHARGES = 3
+CADENCE_MIN_COVERAGE = 0.75
+CADENCE_MAX_PER_PERIOD = 1.25
+
+
+def _same_charge(a: float, ref: float) -> bool:
+    return abs(a - ref) <= 2 or (ref > 0 and abs(a - ref) / ref <= 0.10)
+
+
+def _bucket_cells(merch: List[int], amounts: List[float]) -> List[int]:
+    """
+    Greedy bucketing of (merchant, month) median amounts, cells in merchant then month order:
+    each cell joins the first of its merchant's buckets whose running median is a similar
+    charge, else opens a new one. Returns a bucket id per cell.
+    """
+    out = [0] * len(merch)
+    n_buckets = 0
+    refs: List[float] = []
+    ids: List[int] = []
+    amts: List[List[float]] = []
+    cur = None
+    for i, (m, a) in enumerate(zip(merch, amounts)):
+        if m != cur:
+            cur, refs, ids, amts = m, [], [], []
+        for j, ref in enumerate(refs):
+            if _same_charge(a, ref):
+                vals = amts[j]
+                bisect.insort(vals, a)
+                k = len(vals)
+                refs[j] = (vals[(k - 1) // 2] + vals[k // 2]) / 2.0
+                out[i] = ids[j]
+                break
+        else:
+            refs.append(a)
+            ids.append(n_buckets)
+            amts.append([a])
+            out[i] = n_buckets
+            n_buckets += 1
+    return out
+
+
+@timed("detect_subscriptions")
 def detect_subscriptions(expense: pd.DataFrame) -> pd.DataFrame:
     """
     Heuristic: a subscription/gray charge recurs in >= 2 distinct months with similar amounts.
-    Robust to small datasets; never raises.
+    Month medians per (merchant, month) come from one sort over integer codes; only those
+    cells go through the bucketing loop, so cost grows with merchants x months, not rows.
+    Each charge also gets a cadence (weekly/monthly/annual from the median gap between its
+    transactions, if they recur steadily enough: see CADENCE_MIN_CHARGES; else irregular) and the
+    next expected date, None if that is already past. Robust to small datasets; never raises.
     """
+    empty = pd.DataFrame(columns=SUBSCRIPTION_COLUMNS)
     try:
         if expense is None or expense.empty:
-            return pd.DataFrame(columns=["merchant", "charge", "months", "count"])
+            return empty
 
-        exp = expense.copy()
-        exp["date"] = pd.to_datetime(exp["date"], errors="coerce")
+        exp = expense[["date", "merchant", "amount"]]
+        if not pd.api.types.is_datetime64_any_dtype(exp["date"]):
+            exp = exp.assign(date=pd.to_datetime(exp["date"], errors="coerce"))
         exp = exp.dropna(subset=["date", "merchant", "amount"])
         if exp.empty:
-            return pd.DataFrame(columns=["merchant", "charge", "months", "count"])
-
-        exp["year_month"] = exp["date"].dt.to_period("M").astype(str)
-
-        grouped = exp.groupby(["merchant", "year_month"])["amount"].median().reset_index()
-        if grouped.empty:
-            return pd.DataFrame(columns=["merchant", "charge", "months", "count"])
-
+            return empty
+
+        months = _month_labels(exp["date"])
+        m_codes, merchants = _codes(exp["merchant"])
+        n_months = len(months.categories)
+        amounts = exp["amount"].to_numpy(dtype=np.float64)
+        cell_of_row = m_codes.astype(np.int64) * n_months + months.codes
+        cells, cell_median = _cell_medians(cell_of_row, amounts)
+
+        # Merchants seen in a single month can't recur; drop them before the loop.
+        cell_merch, cell_month = cells // n_months, cells % n_months
+        multi = np.bincount(cell_merch, minlength=len(merchants))[cell_merch] >= 2
+        cells, cell_merch, cell_month, cell_median = cells[multi], cell_merch[multi], cell_month[multi], cell_median[multi]
+        if not len(cells):
+            return empty
+
+        bucket = np.asarray(_bucket_cells(cell_merch.tolist(), cell_median.tolist()), dtype=np.int64)
+        n_buckets = int(bucket.max()) + 1
+        size = np.bincount(bucket, minlength=n_buckets)
+        b_order = np.lexsort((cell_median, bucket))
+        starts = np.searchsorted(bucket[b_order], np.arange(n_buckets))
+        mid = cell_median[b_order]
+        charge = (mid[starts + (size - 1) // 2] + mid[starts + size // 2]) / 2.0
+        keep = np.flatnonzero(size >= 2)
+        if not len(keep):
+            return empty
+
+        # Cadence: gaps between the transactions that match their bucket's charge.
+        if len(merchants) * n_months <= 4 * len(exp):
+            cell_bucket = np.full(len(merchants) * n_months, -1, dtype=np.int64)
+            cell_bucket[cells] = bucket
+            row_bucket = cell_bucket[cell_of_row]
+        else:
+            row_bucket = np.full(len(exp), -1, dtype=np.int64)
+            pos = np.searchsorted(cells, cell_of_row)
+            hit = (pos < len(cells)) & (cells[np.minimum(pos, len(cells) - 1)] == cell_of_row)
+            row_bucket[hit] = bucket[pos[hit]]
+        ok = (row_bucket >= 0) & (size[np.maximum(row_bucket, 0)] >= 2)
+        ref = charge[np.maximum(row_bucket, 0)]
+        diff = np.abs(amounts - ref)
+        ok &= (diff <= 2) | ((ref > 0) & (diff <= 0.10 * np.where(ref > 0, ref, 1.0)))
+        days = exp["date"].to_numpy().astype("datetime64[D]").astype(np.int64)[ok]
+        rb = row_bucket[ok]
+        order = np.lexsort((days, rb))
+        rb, days = rb[order], days[order]
+        day_starts = np.searchsorted(rb, np.arange(n_buckets + 1))
+        data_end = pd.Timestamp(exp["date"].max()).normalize()
+        same = rb[1:] == rb[:-1]
+        gap_bucket, gaps = rb[1:][same], (days[1:] - days[:-1])[same].astype(np.float64)
+        gap_median = np.full(n_buckets, np.nan)
+        gap_mad = np.full(n_buckets, np.nan)
+        if len(gaps):
+            gb, gm = _cell_medians(gap_bucket, gaps)
+            gap_median[gb] = gm
+            gb, gm = _cell_medians(gap_bucket, np.abs(gaps - gap_median[gap_bucket]))
+            gap_mad[gb] = gm
+
+        month_labels = np.asarray(months.categories, dtype=object)
+        by_bucket = np.lexsort((cell_month, bucket))
         subs = []
-        for merch, g in grouped.groupby("merchant"):
-            g = g.sort_values("year_month")
-            amounts = g["amount"].astype(float).values
-            months = g["year_month"].astype(str).values
-
-            buckets = []
-            for m, a in zip(months, amounts):
-                placed = False
-                for b in buckets:
-                    ref = b["ref"]
-                    if abs(a - ref) <= 2 or (ref > 0 and abs(a - ref) / ref <= 0.10):
-                        b["months"].append(m)
-                        b["amts"].append(a)
-                        b["ref"] = float(np.median(b["amts"]))
-                        placed = True
-                        break
-                if not placed:
-                    buckets.append({"ref": float(a), "months": [m], "amts": [float(a)]})
-
-            for b in buckets:
-                uniq = sorted(set(b["months"]))
-                if len(uniq) >= 2:
-                    subs.append({
-                        "merchant": str(merch),
-                        "charge": round(float(np.median(b["amts"])), 2),
-                        "months": ", ".join(uniq),
-                        "count": len(uniq),
-                    })
-
-        if not subs:
-            return pd.DataFrame(columns=["merchant", "charge", "months", "count"])
-        return pd.DataFrame(subs).sort_values(["count", "merchant"], ascending=[False, True])
+        for b in keep:
+            in_b = by_bucket[starts[b]:starts[b] + size[b]]
+            charge_days = days[day_starts[b]:day_starts[b + 1]].astype("datetime64[D]")
+            cadence = "irregular"
+            for name, (lo, hi, spread) in CADENCE_DAYS.items():
+                if lo <= gap_median[b] <= hi and gap_mad[b] <= spread:
+                    cadence = name
+            if cadence != "irregular":
+                periods = charge_days.astype(f"datetime64[{_CADENCE_PERIOD[cadence]}]").astype(np.int64)
+                covered = len(np.unique(periods))
+                if (len(charge_days) < CADENCE_MIN_CHARGES
+                        or covered < CADENCE_MIN_COVERAGE * (periods[-1] - periods[0] + 1)
+                        or len(charge_days) > CADENCE_MAX_PER_PERIOD * covered):
+                    cadence = "irregular"
+            next_date = None
+            if cadence != "irregular":
+                due = pd.Timestamp(charge_days[-1]) + pd.DateOffset(**_CADENCE_STEP[cadence])
+                if due >= data_end:
+                    next_date = due.strftime("%Y-%m-%d")
+            subs.append({
+                "merchant": str(merchants[cell_merch[in_b][0]]),
+                "charge": round(float(charge[b]), 2),
+                "months": ", ".join(month_labels[cell_month[in_b]]),
+                "count": int(size[b]),
+                "cadence": cadence,
+                "next_date": next_date,
+            })
+        return pd.DataFrame(subs, columns=SUBSCRIPTION_COLUMNS).sort_values(
+            ["count", "merchant"], ascending=[False, True], kind="stable")
 
     except Exception as e:
         log.warning("detect_subscriptions failed: %s", e)
-        return pd.DataFrame(columns=["merchant", "charge", "months", "count"])
+        return empty
 
 
-def anomaly_detection(expense: pd.DataFrame) -> pd.DataFrame:
-    """Simple z-score per merchant (|z| >= 2.5)."""
+@timed("merchant_stats")
+def merchant_stats(expense: pd.DataFrame) -> pd.DataFrame:
+    """Per-merchant count `n`, `mean` and `m2` (sum of squared deviations) of expense amounts."""
+    if expense.empty:
+        return pd.DataFrame({"n": pd.Series(dtype=np.int64), "mean": pd.Series(dtype=float), "m2": pd.Series(dtype=float)})
+    g = expense.groupby("merchant", observed=True)["amount"]
+    n = g.count()
+    out = pd.DataFrame({"n": n, "mean": g.mean(), "m2": g.var(ddof=0) * n})
+    out.index = out.index.astype(str)
+    return out.sort_index()
+
+
+def merge_merchant_stats(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+    """Combine two merchant_stats tables (Chan et al. parallel variance update)."""
+    idx = a.index.union(b.index)
+    a, b = a.reindex(idx, fill_value=0), b.reindex(idx, fill_value=0)
+    n = a["n"] + b["n"]
+    frac = (b["n"] / n.where(n > 0, 1)).to_numpy()
+    delta = (b["mean"] - a["mean"]).to_numpy()
+    return pd.DataFrame({
+        "n": n,
+        "mean": a["mean"].to_numpy() + delta * frac,
+        "m2": a["m2"].to_numpy() + b["m2"].to_numpy() + delta ** 2 * a["n"].to_numpy() * frac,
+    }, index=idx)[n > 0]
+
+
+ANOMALY_Z = 2.5
+
+
+def _z_scores(expense: pd.DataFrame, stats: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    z-score of each row against its merchant's (n, mean, m2) and whether the merchant
+    has a usable spread. Stats are looked up once per distinct merchant and broadcast
+    to rows by code, so this is O(1) per row whatever the history size.
+    """
+    codes, uniques = _codes(expense["merchant"])
+    st = stats.reindex(uniques.astype(str))
+    mean = st["mean"].to_numpy()[codes]
+    std = np.sqrt(st["m2"].to_numpy() / st["n"].to_numpy())[codes]
+    amount = expense["amount"].to_numpy(dtype=np.float64)
+    z = np.zeros(len(expense))
+    # Constant-amount merchants can carry rounding noise instead of an exact 0 std.
+    ok = std > 1e-9 * np.maximum(1.0, np.abs(mean))
+    z[ok] = (amount[ok] - mean[ok]) / std[ok]
+    return z, ok
+
+
+@timed("anomaly_detection")
+def anomaly_detection(expense: pd.DataFrame, stats: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Simple z-score per merchant (|z| >= 2.5), optionally against precomputed merchant_stats."""
     if expense.empty:
         return pd.DataFrame(columns=["date", "merchant", "amount", "z_score"])
 
-    def zscores(x: pd.Series) -> np.ndarray:
-        m = x.mean()
-        s = x.std(ddof=0)
-        return np.zeros_like(x) if s == 0 else (x - m) / s
+    z, _ = _z_scores(expense, merchant_stats(expense) if stats is None else stats)
+    exp = expense[["date", "merchant", "amount"]].assign(z_score=z)
+    flagged = exp[np.abs(z) >= ANOMALY_Z]
+    return flagged.sort_values(["date", "z_score"], ascending=[False, False])
+
+
+def score_transactions(rows: pd.DataFrame, stats: pd.DataFrame) -> pd.DataFrame:
+    """
+    Score candidate transactions against stored merchant stats without touching history.
+    Income rows are skipped; `known` is False when the merchant has no usable spread yet.
+    """
+    _, expense = split_income_expense(categorize(rows))
+    if expense.empty:
+        return pd.DataFrame(columns=["date", "merchant", "amount", "z_score", "known", "anomaly"])
+    z, ok = _z_scores(expense, stats)
+    out = expense[["date", "merchant", "amount"]].assign(z_score=z, known=ok, anomaly=np.abs(z) >= ANOMALY_Z)
+    out["merchant"] = out["merchant"].astype(str)
+    return out
+
 
-    exp = expense.copy()
-    exp["z"] = exp.groupby("merchant")["amount"].transform(zscores)
-    flagged = exp[exp["z"].abs() >= 2.5].copy()
-    flagged.rename(columns={"z": "z_score"}, inplace=True)
-    return flagged[["date", "merchant", "amount", "z_score"]].sort_values(["date", "z_score"], ascending=[False, False])
+def _category_cube(expense_df: pd.DataFrame, cube: Optional[AggregateCube]) -> AggregateCube:
+    return cube if cube is not None else AggregateCube.from_frame(expense_df, "category")
 
 
-def coffee_insight(expense: pd.DataFrame, period: str) -> Dict[str, Any]:
-    exp = monthly_bucket(expense)
-    month_df = exp[exp["year_month"] == period]
-    coffee_spend = float(month_df.loc[month_df["category"] == "Coffee", "amount"].sum())
+def coffee_insight(expense: pd.DataFrame, period: str, cube: Optional[AggregateCube] = None) -> Dict[str, Any]:
+    coffee_spend = _category_cube(expense, cube).value(period, "Coffee")
     yearly_save = coffee_spend * 0.60 * 12.0
     msg = f"You've spent ${coffee_spend:.2f} on coffee in {period}. Brewing at home a bit more could save ~${yearly_save:,.0f}/yr."
     return {"coffee_spend": coffee_spend, "message": msg}
@@ -272,33 +1869,31 @@ def _month_span(end_ts: pd.Timestamp, n: int) -> List[str]:
     return [(end - i).strftime("%Y-%m") for i in range(n - 1, -1, -1)]
 
 
-def last_n_months_expense(expense_df: pd.DataFrame, months: int = 6) -> pd.DataFrame:
+@timed("last_n_months_expense")
+def last_n_months_expense(expense_df: pd.DataFrame, months: int = 6, cube: Optional[AggregateCube] = None) -> pd.DataFrame:
     """
     Returns a dense month series (YYYY-MM) of length `months`.
     Missing months are filled with 0. Uses the latest expense date as the anchor (or today).
     """
-    anchor = pd.Timestamp.utcnow()
-    if expense_df is not None and not expense_df.empty:
-        anchor = pd.to_datetime(expense_df["date"].max())
+    if cube is None and (expense_df is None or expense_df.empty):
+        return pd.DataFrame({"year_month": _month_span(pd.Timestamp.utcnow(), months), "total": [0.0] * months})
+    cube = _category_cube(expense_df, cube)
+    anchor = cube.last_date if cube.last_date is not None else pd.Timestamp.utcnow()
 
     month_order = _month_span(anchor, months)
-    if expense_df is None or expense_df.empty:
-        return pd.DataFrame({"year_month": month_order, "total": [0.0] * months})
-
-    dfm = expense_df.copy()
-    dfm["year_month"] = dfm["date"].dt.to_period("M").astype(str)
-    sums = dfm.groupby("year_month")["amount"].sum().to_dict()
+    sums = dict(zip(cube.months, cube.month_totals()))
     totals = [float(sums.get(m, 0.0)) for m in month_order]
     return pd.DataFrame({"year_month": month_order, "total": totals})
 
 
-def category_spend_this_and_prev(expense_df: pd.DataFrame, current_period: str) -> pd.DataFrame:
+@timed("category_spend_this_and_prev")
+def category_spend_this_and_prev(expense_df: pd.DataFrame, current_period: str,
+                                 cube: Optional[AggregateCube] = None) -> pd.DataFrame:
     """Return category totals for current and previous month, plus delta."""
-    if expense_df.empty:
+    if cube is None and expense_df.empty:
         return pd.DataFrame(columns=["category", "this_month", "prev_month", "delta"])
-    dfm = expense_df.copy()
-    dfm["year_month"] = dfm["date"].dt.to_period("M").astype(str)
-    months_sorted = sorted(dfm["year_month"].unique())
+    cube = _category_cube(expense_df, cube)
+    months_sorted = cube.months
     if current_period not in months_sorted or len(months_sorted) < 2:
         return pd.DataFrame(columns=["category", "this_month", "prev_month", "delta"])
 
@@ -307,26 +1902,27 @@ def category_spend_this_and_prev(expense_df: pd.DataFrame, current_period: str)
         return pd.DataFrame(columns=["category", "this_month", "prev_month", "delta"])
     prev_period = months_sorted[cur_idx - 1]
 
-    cur = dfm[dfm["year_month"] == current_period].groupby("category")["amount"].sum()
-    prev = dfm[dfm["year_month"] == prev_period].groupby("category")["amount"].sum()
-    cats = sorted(set(cur.index).union(prev.index))
+    cur = cube.row(current_period)
+    prev = cube.row(prev_period)
+    cats = sorted(set(cur).union(prev))
     rows = []
     for c in cats:
         t = float(cur.get(c, 0.0))
         p = float(prev.get(c, 0.0))
         rows.append({"category": c, "this_month": t, "prev_month": p, "delta": t - p})
-    return pd.DataFrame(rows).sort_values("this_month", ascending=False)
+    return pd.DataFrame(rows).sort_values("this_month", ascending=False, kind="stable")
 
 
-def suggestion_engine(expense_df: pd.DataFrame, needed_per_month: float) -> List[Dict[str, Any]]:
+@timed("suggestion_engine")
+def suggestion_engine(expense_df: pd.DataFrame, needed_per_month: float,
+                      cube: Optional[AggregateCube] = None) -> List[Dict[str, Any]]:
     """Greedily suggest small trims (10–20%) from biggest categories until the monthly gap is covered."""
-    if needed_per_month <= 0 or expense_df.empty:
+    if needed_per_month <= 0 or (cube is None and expense_df.empty):
+        return []
+    cube = _category_cube(expense_df, cube)
+    if not cube.months:
         return []
-    dfm = expense_df.copy()
-    dfm["year_month"] = dfm["date"].dt.to_period("M").astype(str)
-    cur = dfm["year_month"].max()
-    cur_exp = dfm[dfm["year_month"] == cur]
-    cat_sum = cur_exp.groupby("category")["amount"].sum().sort_values(ascending=False)
+    cat_sum = _sorted_desc(cube.row(cube.months[-1]))
 
     remaining = needed_per_month
     suggestions: List[Dict[str, Any]] = []
@@ -341,6 +1937,112 @@ def suggestion_engine(expense_df: pd.DataFrame, needed_per_month: float) -> List
     return suggestions
 
 
+# Relative "pain" per dollar cut and the most of a month's spend the optimizer may cut, per category
+CUT_COST = {
+    "Coffee": 1.0, "Dining": 1.0, "Entertainment": 1.0, "Shopping": 1.2, "Other": 1.5,
+    "Transport": 2.0, "Groceries": 2.5, "Utilities": 4.0, "Rent": 10.0,
+}
+CUT_MAX_PCT = {"Groceries": 0.2, "Transport": 0.25, "Utilities": 0.1, "Rent": 0.0}
+CUT_DEFAULT_COST = 1.5
+CUT_DEFAULT_MAX_PCT = 0.5
+
+
+def goal_forecast_batch(income_mo: float, expense_mo: np.ndarray, goal_amt: float, months: int) -> List[Dict[str, Any]]:
+    """goal_forecast for a vector of monthly expenses, with the arithmetic done on arrays."""
+    surplus = np.maximum(0.0, income_mo - np.asarray(expense_mo, dtype=np.float64))
+    gap = np.maximum(0.0, goal_amt - surplus * months)
+    on_track = gap <= 0.01
+    need = np.where(gap > 0, gap / months, 0.0) if months > 0 else np.zeros_like(gap)
+    return [
+        {
+            "on_track": ok,
+            "surplus": round(s, 2),
+            "gap": round(g, 2),
+            "need_per_month": round(n, 2),
+            "message": ("You're on track!" if ok else f"Need about ${n:,.0f}/mo to hit ${goal_amt:,.0f} in {months} months."),
+        }
+        for ok, s, g, n in zip(on_track.tolist(), surplus.tolist(), gap.tolist(), need.tolist())
+    ]
+
+
+@timed("whatif")
+def whatif_scenarios(by_cat: Dict[str, float], scenarios: List[Dict[str, float]],
+                     income_mo: float, goal_amt: float, months: int) -> List[Dict[str, Any]]:
+    """
+    Evaluate N cut scenarios at once as an N x category matrix against this month's category totals.
+    Each cut is clipped to [0, current]; cuts for unknown categories are ignored.
+    """
+    cats = list(by_cat)
+    col = {c: j for j, c in enumerate(cats)}
+    current = np.array([by_cat[c] for c in cats], dtype=np.float64)
+    want = np.zeros((len(scenarios), len(cats)))
+    for i, cuts in enumerate(scenarios):
+        for cat, v in cuts.items():
+            j = col.get(cat)
+            if j is not None:
+                want[i, j] = float(v)
+    take = np.clip(want, 0.0, current)
+    reduced = np.zeros(len(scenarios))
+    for j in range(len(cats)):  # column by column, same summation order as one scenario at a time
+        reduced += take[:, j]
+    new_expense = np.maximum(0.0, float(sum(by_cat.values())) - reduced)
+    forecasts = goal_forecast_batch(income_mo, new_expense, goal_amt, months)
+
+    rounded, positive = np.round(take, 2).tolist(), (take > 0).tolist()
+    return [
+        {
+            "new_expense": round(ne, 2),
+            "applied": {c: v for c, v, p in zip(cats, row, pos) if p},
+            "forecast": fc,
+        }
+        for ne, row, pos, fc in zip(new_expense.tolist(), rounded, positive, forecasts)
+    ]
+
+
+def _monthly_need(income_mo: float, expense_mo: float, goal_amt: float, months: int) -> float:
+    """Monthly cut that makes (income - expense + cut) * months reach the goal."""
+    return max(0.0, goal_amt / months - (income_mo - expense_mo))
+
+
+@timed("optimal_cuts")
+def optimal_cuts(by_cat: Dict[str, float], needed: float, fixed: Optional[Dict[str, float]] = None,
+                 weights: Optional[Dict[str, float]] = None, max_pct: Optional[Dict[str, float]] = None,
+                 limits: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """
+    Cheapest set of category cuts (sum of weight * dollars) that covers `needed` per month, on top of
+    the user's `fixed` cuts, with each category capped at `limits[cat]` dollars or `max_pct[cat]` of its
+    spend. With linear costs and per-category caps this is a fractional knapsack: filling categories in
+    cost order (ties: biggest first) is optimal, and it is a sort plus a cumsum over cents.
+    """
+    weights, max_pct, limits, fixed = weights or {}, max_pct or {}, limits or {}, fixed or {}
+    cats = list(by_cat)
+    current = np.array([by_cat[c] for c in cats], dtype=np.float64)
+    cost = np.array([float(weights.get(c, CUT_COST.get(c, CUT_DEFAULT_COST))) for c in cats])
+    pct = np.array([float(max_pct.get(c, CUT_MAX_PCT.get(c, CUT_DEFAULT_MAX_PCT))) for c in cats])
+    cap = np.where([c in limits for c in cats], [float(limits.get(c, 0.0)) for c in cats], current * pct)
+    held = np.clip([float(fixed.get(c, 0.0)) for c in cats], 0.0, current)
+    room = np.clip(np.minimum(cap, current) - held, 0.0, None)
+
+    room_c = np.floor(room * 100 + 1e-6).astype(np.int64)
+    need_c = int(np.ceil(max(0.0, needed - held.sum()) * 100 - 1e-6))
+    order = np.lexsort((-current, cost))
+    before = np.cumsum(room_c[order]) - room_c[order]
+    add_c = np.zeros(len(cats), dtype=np.int64)
+    add_c[order] = np.clip(need_c - before, 0, room_c[order])
+
+    added = add_c / 100.0
+    total = held + added
+    shortfall = max(0, need_c - int(add_c.sum())) / 100.0
+    return {
+        "cuts": {c: round(float(v), 2) for c, v in zip(cats, total) if v > 0},
+        "added": {c: round(float(v), 2) for c, v in zip(cats, added) if v > 0},
+        "total_cut": round(float(total.sum()), 2),
+        "cost": round(float((cost * added).sum()), 2),
+        "feasible": shortfall == 0,
+        "shortfall": shortfall,
+    }
+
+
 def privacy_name(merchant: str) -> str:
     h = hashlib.sha1(merchant.encode()).hexdigest()[:6].upper()
     return f"Merchant-{h}"
@@ -352,31 +2054,207 @@ def maybe_privacy_map_dict(d: Dict[str, float], privacy: bool) -> Dict[str, floa
     return {privacy_name(k): v for k, v in d.items()}
 
 
-def _compose_context(income_monthly: float, goal_amount: float, months_to_goal: int, privacy: bool):
+# -----------------------------------------------------------------------------
+# Derived frames (built once per dataset version, shared by every endpoint)
+# -----------------------------------------------------------------------------
+
+def _split_bucketed(cat_df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    income_df, expense_df = split_income_expense(cat_df)
+    if expense_df.empty:
+        return income_df, expense_df.assign(year_month=pd.Series(dtype=object))
+    return income_df, monthly_bucket(expense_df)
+
+
+def _derived_dict(cat_df, income_df, expense_m, cat_cube, merch_cube, stats, anomalies, subs) -> Dict[str, Any]:
+    months = cat_cube.months
+    return {
+        "df": cat_df,
+        "income": income_df,
+        "expense": expense_m,
+        "cat_cube": cat_cube,
+        "merch_cube": merch_cube,
+        "months": months,
+        "current": months[-1] if months else datetime.utcnow().strftime("%Y-%m"),
+        "merchant_stats": stats,
+        "anomalies": anomalies,
+        "subscriptions": subs,
+    }
+
+
+@timed("derived")
+def _build_derived(df: pd.DataFrame) -> Dict[str, Any]:
+    cat_df = categorize(_expand_transactions(df))
+    income_df, expense_m = _split_bucketed(cat_df)
+    stats = merchant_stats(expense_m)
+    return _derived_dict(
+        cat_df, income_df, expense_m,
+        AggregateCube.from_frame(expense_m, "category"),
+        AggregateCube.from_frame(expense_m, "merchant"),
+        stats, anomaly_detection(expense_m, stats), detect_subscriptions(expense_m),
+    )
+
+
+def _splice_by_merchant(old: pd.DataFrame, fresh: pd.DataFrame, merchants: set, by: List[str], ascending: List[bool]) -> pd.DataFrame:
+    """Replace the rows of `merchants` in `old` with `fresh` and restore the sort order."""
+    parts = [p for p in (old[~old["merchant"].isin(merchants)], fresh) if not p.empty]
+    if not parts:
+        return old.iloc[:0]
+    return _concat_compact(parts).sort_values(by, ascending=ascending, kind="stable")
+
+
+@timed("derived_append")
+def _append_derived(prev: Dict[str, Any], batch: pd.DataFrame, replaced: pd.Index) -> Dict[str, Any]:
+    """
+    Fold a batch of new (already indexed) rows into a derived dict instead of rebuilding it.
+    Only the batch is categorized; cubes, merchant stats, anomalies and subscriptions are
+    refreshed just for the months/merchants the batch (or replaced rows) touch.
+    """
+    def merge(frame: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+        gone = frame.index.intersection(replaced)
+        return _sorted_merge(frame.drop(index=gone) if len(gone) else frame, new)
+
+    cat_new = categorize(batch)
+    inc_new, exp_new = _split_bucketed(cat_new)
+    removed = prev["expense"].loc[prev["expense"].index.intersection(replaced)]
+    cat_df = merge(prev["df"], cat_new)
+    income_df = merge(prev["income"], inc_new)
+    expense_m = merge(prev["expense"], exp_new)
+
+    touched = set(exp_new["merchant"]) | set(removed["merchant"])
+    stats = merge_merchant_stats(prev["merchant_stats"], merchant_stats(exp_new))
+    touched_rows = expense_m[expense_m["merchant"].isin(touched)]
+    if not removed.empty:
+        redo = set(removed["merchant"])
+        stats = pd.concat([stats[~stats.index.isin(redo)], merchant_stats(touched_rows[touched_rows["merchant"].isin(redo)])])
+    anomalies = _splice_by_merchant(prev["anomalies"], anomaly_detection(touched_rows, stats), touched,
+                                    ["date", "z_score"], [False, False])
+    subs = _splice_by_merchant(prev["subscriptions"], detect_subscriptions(touched_rows), touched,
+                               ["count", "merchant"], [False, True])
+    return _derived_dict(
+        cat_df, income_df, expense_m,
+        prev["cat_cube"].updated(expense_m, exp_new, removed, "category"),
+        prev["merch_cube"].updated(expense_m, exp_new, removed, "merchant"),
+        stats, anomalies, subs,
+    )
+
+
+def _appended_bytes(base: pd.DataFrame, removed: pd.DataFrame, added: pd.DataFrame,
+                    merged: pd.DataFrame) -> Tuple[int, int]:
+    """
+    Change in (_frame_bytes, _object_bytes) from `base` to `merged` (base minus `removed` rows plus
+    `added` rows) in O(batch + categories): the per-row parts come from the two slices, the index
+    and categorical dictionaries are measured again on `merged`.
+    """
+    def index(df):  # nbytes: memory_usage() also counts the lookup table, there once .loc has run
+        return int(df.index.nbytes)
+
+    def fixed(df):  # index + categorical dictionaries
+        return index(df) + sum(int(df[c].cat.categories.memory_usage(deep=True))
+                               for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype))
+
+    frame = (_frame_bytes(added) - fixed(added)) - (_frame_bytes(removed) - fixed(removed)) + fixed(merged) - fixed(base)
+    plain = (_object_bytes(added) - index(added)) - (_object_bytes(removed) - index(removed)) + index(merged) - index(base)
+    return frame, plain
+
+
+def _derived_bytes(d: Dict[str, Any]) -> int:
+    # Categorical columns count their dictionaries; object columns (ids, notes) point at the source
+    # frame's strings, which frame_bytes already counts, so they count shallowly.
+    frames = 0
+    for f in (d["df"], d["income"], d["expense"]):
+        frames += int(f.index.nbytes)
+        for col in f.columns:
+            s = f[col]
+            frames += int(s.memory_usage(index=False, deep=isinstance(s.dtype, pd.CategoricalDtype)))
+    cubes = sum(c.count.nbytes + c.total.nbytes + c.median.nbytes for c in (d["cat_cube"], d["merch_cube"]))
+    return frames + cubes
+
+
+def _derived(ds: Dataset, snap: Optional[DatasetSnapshot] = None) -> Dict[str, Any]:
+    """
+    Categorized frame, income/expense split, month-bucketed expenses, the
+    month x category / month x merchant cubes and the merchant stats, anomalies
+    and subscriptions for one snapshot (the tenant's current one by default).
+    Built once per snapshot (append_dataframe publishes it pre-built); callers must not mutate.
+    """
+    snap = snap or ds.snapshot
+    if snap.derived is not None:
+        return snap.derived
+    with snap.lock:
+        if snap.derived is None:
+            df = snap.df if snap.df is not None else pd.DataFrame(columns=["date", "merchant", "amount"])
+            if SHARED is not None and snap.version == ds.shared_version:
+                built = SHARED.derived(ds.tenant, snap.version, lambda: _build_derived(df))
+            else:
+                built = _build_derived(df)
+            built["version"] = snap.version
+            snap.derived = built
+            if ds.owner.snapshot is snap:
+                ds.owner.derived_bytes = _derived_bytes(built)
+    STORE.enforce_budget(keep=ds.owner)
+    return snap.derived
+
+
+def append_dataframe(batch: pd.DataFrame, ds: Dataset) -> Tuple[Dict[str, int], DatasetSnapshot]:
+    """
+    Merge normalized rows into the tenant's frame with a sorted merge instead of a full
+    re-sort. Batch rows whose `id` matches an existing row replace it (upsert). If the
+    current snapshot's derived cache is built, the new one is derived from it incrementally.
+    Publishes one new snapshot per batch; returns the counts and that snapshot.
+    """
+    with ds.writing():
+        prev = ds.snapshot
+        base = prev.df
+        if base is None or base.empty:
+            snap = set_dataframe(batch, ds)
+            return {"appended": snap.records, "replaced": 0}, snap
+
+        replaced = base.index[:0]
+        if "id" in batch.columns:
+            batch = batch[batch["id"].isna() | ~batch["id"].duplicated(keep="last")]
+            if "id" in base.columns:
+                ids = set(batch.loc[batch["id"].notna(), "id"].astype(str))
+                replaced = base.index[base["id"].notna() & base["id"].astype(str).isin(ids)]
+
+        start = int(base.index.max()) + 1
+        batch = batch.set_axis(pd.RangeIndex(start, start + len(batch)))
+        stored = _compact_transactions(batch)
+        merged = _sorted_merge(base.drop(index=replaced) if len(replaced) else base, stored)
+        derived = None
+        if prev.derived is not None:
+            derived = _append_derived(prev.derived, _expand_transactions(stored), replaced)
+        snap = ds.publish(merged, derived=derived)
+        frame, plain = _appended_bytes(base, base.loc[replaced], stored, merged)
+        ds.frame_bytes += frame
+        ds.object_bytes += plain
+    _persist(ds)
+    STORE.enforce_budget(keep=ds)
+    return {"appended": int(max(0, len(batch) - len(replaced))), "replaced": int(len(replaced))}, snap
+
+
+@timed("context")
+def _compose_context(ds: Dataset, income_monthly: float, goal_amount: float, months_to_goal: int, privacy: bool):
     """Build a compact context object from existing pipelines."""
-    if DATAFRAME is None or DATAFRAME.empty:
+    snap = ds.snapshot
+    if snap.empty:
         return {
             "period": None, "expense_total": 0.0, "by_category": {}, "top_merchants": {},
             "coffee_msg": "", "forecast": goal_forecast(income_monthly, 0.0, goal_amount, months_to_goal),
             "suggestions": [], "delta_categories": [], "anomaly_count": 0
         }
-    df = categorize(DATAFRAME)
-    _, expense_df = split_income_expense(df)
-    dfm = monthly_bucket(expense_df)
-    months = sorted(dfm["year_month"].unique())
-    cur = months[-1] if months else datetime.utcnow().strftime("%Y-%m")
-    month_expense = dfm[dfm["year_month"] == cur]
-    total_expense = float(month_expense["amount"].sum())
-    by_cat = month_expense.groupby("category")["amount"].sum().sort_values(ascending=False).to_dict()
-    top_merch = month_expense.groupby("merchant")["amount"].sum().sort_values(ascending=False).head(10).to_dict()
+    d = _derived(ds, snap)
+    expense_df, cur, cube = d["expense"], d["current"], d["cat_cube"]
+    by_cat = _sorted_desc(cube.row(cur))
+    total_expense = float(sum(by_cat.values()))
+    top_merch = _sorted_desc(d["merch_cube"].row(cur), 10)
     if privacy:
         top_merch = {privacy_name(k): v for k, v in top_merch.items()}
-    coffee = coffee_insight(expense_df, cur)
-    cmp = category_spend_this_and_prev(expense_df, cur)
+    coffee = coffee_insight(expense_df, cur, cube=cube)
+    cmp = category_spend_this_and_prev(expense_df, cur, cube=cube)
     fc = goal_forecast(income_monthly, total_expense, goal_amount, months_to_goal)
     need = float(fc.get("need_per_month", 0.0)) if not fc.get("on_track", False) else 0.0
-    sugg = suggestion_engine(expense_df, need)
-    anoms = anomaly_detection(expense_df)
+    sugg = suggestion_engine(expense_df, need, cube=cube)
+    anoms = d["anomalies"]
     return {
         "period": cur, "expense_total": round(total_expense, 2),
         "by_category": {k: float(v) for k, v in by_cat.items()},
@@ -389,57 +2267,505 @@ def _compose_context(income_monthly: float, goal_amount: float, months_to_goal:
     }
 
 
-def _rule_based_coach(ctx: dict) -> List[str]:
-    out = []
-    if ctx["forecast"]["on_track"]:
-        out.append("🎯 Great pace—your plan looks on track. Keep habits steady and avoid new recurring spend.")
-    else:
-        need = ctx["forecast"]["need_per_month"]
-        out.append(f"🧭 To hit your goal, trim about ${need:,.0f}/mo. The What-If panel shows exactly where to take it from.")
-    if "coffee" in ctx["coffee_msg"].lower():
-        out.append(f"☕ {ctx['coffee_msg']}")
-    if ctx["suggestions"]:
-        s = ctx["suggestions"][0]
-        out.append(f"✂️ Try cutting **{s['category']}** by ${s['suggested_cut']:,.0f}/mo (currently ${s['current']:,.0f}).")
-    if ctx["anomaly_count"] > 0:
-        out.append(f"🚨 Spotted {ctx['anomaly_count']} unusual charges recently—give Anomalies a quick review.")
-    return out[:4]
+def _rule_based_coach(ctx: dict) -> List[str]:
+    out = []
+    if ctx["forecast"]["on_track"]:
+        out.append("🎯 Great pace—your plan looks on track. Keep habits steady and avoid new recurring spend.")
+    else:
+        need = ctx["forecast"]["need_per_month"]
+        out.append(f"🧭 To hit your goal, trim about ${need:,.0f}/mo. The What-If panel shows exactly where to take it from.")
+    if "coffee" in ctx["coffee_msg"].lower():
+        out.append(f"☕ {ctx['coffee_msg']}")
+    if ctx["suggestions"]:
+        s = ctx["suggestions"][0]
+        out.append(f"✂️ Try cutting **{s['category']}** by ${s['suggested_cut']:,.0f}/mo (currently ${s['current']:,.0f}).")
+    if ctx["anomaly_count"] > 0:
+        out.append(f"🚨 Spotted {ctx['anomaly_count']} unusual charges recently—give Anomalies a quick review.")
+    return out[:4]
+
+
+# -----------------------------------------------------------------------------
+# Monte Carlo goal forecast (future months sampled from the account's own history)
+# -----------------------------------------------------------------------------
+MC_HISTORY_MONTHS = 12
+MC_MIN_COVERAGE = 0.25    # months with less data than this (share of days) are left out of the history
+MC_POOL = 4096            # pre-summed monthly draws that the paths sample from
+MC_QUANTILES = (0.1, 0.5, 0.9)
+MC_CACHE_SIZE = 64
+MC_MIN_RECURRING_SHARE = 0.5  # a detected charge must match this share of its merchant's rows to be scheduled
+
+
+def _month_ordinal(ts: pd.Timestamp) -> int:
+    return ts.year * 12 + ts.month - 1
+
+
+def _ordinal_label(o: int) -> str:
+    return f"{o // 12:04d}-{o % 12 + 1:02d}"
+
+
+def _mc_model(d: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Non-recurring spend per (history month, category), scaled up for partially covered months, plus
+    the detected weekly/monthly/annual charges that match at least CADENCE_MIN_CHARGES rows and
+    MC_MIN_RECURRING_SHARE of their merchant's rows. Rows matching those charges are taken out of
+    the history so they aren't counted twice. None when there is no expense history.
+    """
+    cube, expense = d["cat_cube"], d["expense"]
+    if not cube.months or expense.empty:
+        return None
+    subs = d["subscriptions"]
+    subs = subs[subs["cadence"].isin(list(_CADENCE_STEP)) & subs["next_date"].notna()]
+
+    total = cube.total.astype(np.float64)
+    if len(subs):
+        rows = expense.loc[expense["merchant"].isin(subs["merchant"]), ["merchant", "amount", "category", "year_month"]]
+        rows = rows.astype({"merchant": str})
+        m = rows.rename_axis("row").reset_index().merge(subs[["merchant", "charge"]], on="merchant")
+        diff = (m["amount"] - m["charge"]).abs()
+        m = m[(diff <= 2) | ((m["charge"] > 0) & (diff <= 0.10 * m["charge"]))]
+        matched = m.groupby(["merchant", "charge"]).size()
+        merchant_rows = rows["merchant"].value_counts().reindex(matched.index.get_level_values("merchant")).to_numpy()
+        trusted = matched.index[(matched >= CADENCE_MIN_CHARGES) & (matched >= MC_MIN_RECURRING_SHARE * merchant_rows)]
+        subs = subs[pd.MultiIndex.from_frame(subs[["merchant", "charge"]]).isin(trusted)]
+        m = m[pd.MultiIndex.from_frame(m[["merchant", "charge"]]).isin(trusted)].drop_duplicates("row")
+        recurring = m.groupby(["year_month", "category"], observed=True)["amount"].sum().unstack(fill_value=0.0)
+        total = total - recurring.reindex(index=cube.months, columns=cube.keys, fill_value=0.0).to_numpy()
+    total = np.maximum(total, 0.0)
+
+    first, last = expense["date"].min().normalize(), expense["date"].max().normalize()
+    ords = np.array([_month_ordinal(pd.Timestamp(f"{m}-01")) for m in cube.months])
+    lo, hi = _month_ordinal(first), _month_ordinal(last)
+    dense = np.arange(max(lo, hi - MC_HISTORY_MONTHS + 1), hi + 1)
+    hist = np.zeros((len(dense), total.shape[1]))
+    at = np.searchsorted(dense, ords)
+    inside = (ords >= dense[0])
+    hist[at[inside]] = total[inside]
+
+    month = (dense - 1970 * 12).astype("datetime64[M]")
+    starts, ends = month.astype("datetime64[D]"), (month + 1).astype("datetime64[D]")
+    first_day, end_day = first.to_datetime64().astype("datetime64[D]"), last.to_datetime64().astype("datetime64[D]") + 1
+    days = (np.minimum(ends, end_day) - np.maximum(starts, first_day)).astype(np.int64)
+    coverage = days / (ends - starts).astype(np.int64)
+    keep = coverage >= MC_MIN_COVERAGE
+    if not keep.any():
+        keep = coverage == coverage.max()
+    return {
+        "history": hist[keep] / coverage[keep][:, None],
+        "categories": list(cube.keys),
+        "current": _month_ordinal(pd.Timestamp(f"{d['current']}-01")),
+        "subs": subs[["charge", "cadence", "next_date"]].to_dict(orient="records"),
+    }
+
+
+def _recurring_schedule(subs: List[Dict[str, Any]], first_ord: int, months: int) -> np.ndarray:
+    """Dollars of detected recurring charges landing in each of `months` months from `first_ord`."""
+    out = np.zeros(months)
+    month_starts = (np.arange(first_ord, first_ord + months + 1) - 1970 * 12).astype("datetime64[M]").astype("datetime64[D]")
+    for s in subs:
+        nxt = np.datetime64(s["next_date"], "D")
+        if s["cadence"] == "weekly":
+            behind = (month_starts[0] - nxt).astype(np.int64)
+            if behind > 0:
+                nxt += -(-behind // 7) * 7
+            hits = np.arange(nxt, month_starts[-1], np.timedelta64(7, "D"))
+            out += np.diff(np.searchsorted(hits, month_starts)) * s["charge"]
+        else:
+            step = 1 if s["cadence"] == "monthly" else 12
+            o = int(nxt.astype("datetime64[M]").astype(np.int64)) + 1970 * 12
+            if o < first_ord:
+                o += -((o - first_ord) // step) * step
+            out[np.arange(o - first_ord, months, step)] += s["charge"]
+    return out
+
+
+@timed("monte_carlo")
+def monte_carlo_forecast(model: Dict[str, Any], income_mo: float, goal_amt: float, months: int,
+                         paths: int, rng: np.random.Generator) -> Dict[str, Any]:
+    """
+    Each path draws every future month's non-recurring spend per category from that category's
+    history (independently), adds the scheduled recurring charges, and saves max(0, income - spend)
+    like goal_forecast. Category draws are pre-summed into a pool of MC_POOL monthly totals, so a
+    whole run is one (months x paths) gather, cumsum and sort.
+    """
+    hist = model["history"]
+    h, k = hist.shape
+    pool = hist[rng.integers(0, h, size=(MC_POOL, k), dtype=np.uint8), np.arange(k)].sum(axis=1)
+    recurring = _recurring_schedule(model["subs"], model["current"] + 1, months)
+
+    # months x paths, so each month's paths are contiguous for the sort below; float32 halves the
+    # memory traffic and sort time, and is far finer than the spread of the bands
+    saved = pool.astype(np.float32)[rng.integers(0, MC_POOL, size=(months, paths), dtype=np.int32)]
+    np.subtract((income_mo - recurring[:, None]).astype(np.float32), saved, out=saved)
+    np.maximum(saved, 0.0, out=saved)
+    np.cumsum(saved, axis=0, out=saved)
+    p_on_track = float(np.mean(saved[-1] >= goal_amt - 0.01))
+    expected = float(saved[-1].mean(dtype=np.float64))
+    saved.sort(axis=1)  # a full sort is cheaper than a multi-kth partition here
+    pos = np.asarray(MC_QUANTILES) * (paths - 1)
+    lo = np.floor(pos).astype(np.intp)
+    hi = np.minimum(lo + 1, paths - 1)
+    bands = (saved[:, lo] + (saved[:, hi] - saved[:, lo]) * (pos - lo)).T  # same as np.quantile(..., axis=1)
+    spend_q = np.quantile(pool, MC_QUANTILES) + recurring.mean()
+    labels = [_ordinal_label(model["current"] + 1 + t) for t in range(months)]
+    r2 = lambda a: [round(float(x), 2) for x in a]
+    return {
+        "paths": paths,
+        "history_months": h,
+        "p_on_track": round(p_on_track, 4),
+        "expected_saved": round(expected, 2),
+        "recurring_monthly": round(float(recurring.mean()), 2),
+        "monthly_spend": dict(zip(("p10", "p50", "p90"), r2(spend_q))),
+        "bands": {"months": labels, **dict(zip(("p10", "p50", "p90"), map(r2, bands)))},
+    }
+
+
+def _forecast_mc(ds: Dataset, d: Dict[str, Any], income_mo: float, goal_amt: float, months: int,
+                 paths: int, seed: Optional[int]) -> Optional[Dict[str, Any]]:
+    """
+    Monte Carlo run on the version's cached model (kept on the store's Dataset, so pinned views
+    share it); seeded runs are deterministic and cached too.
+    """
+    ds = ds.owner
+    cache = ds.forecast_cache
+    if cache["version"] != d["version"]:
+        with ds.lock:
+            if ds.forecast_cache["version"] != d["version"]:
+                ds.forecast_cache = {"version": d["version"], "model": _mc_model(d), "runs": OrderedDict()}
+            cache = ds.forecast_cache
+    model = cache["model"]
+    if model is None:
+        return None
+    if seed is None:
+        return {**monte_carlo_forecast(model, income_mo, goal_amt, months, paths, np.random.default_rng()), "seed": None}
+
+    key = (income_mo, goal_amt, months, paths, seed)
+    runs = cache["runs"]
+    with ds.lock:
+        if key in runs:
+            runs.move_to_end(key)
+            return runs[key]
+    out = {**monte_carlo_forecast(model, income_mo, goal_amt, months, paths, np.random.default_rng(seed)), "seed": seed}
+    with ds.lock:
+        runs[key] = out
+        while len(runs) > MC_CACHE_SIZE:
+            runs.popitem(last=False)
+    return out
+
+
+# -----------------------------------------------------------------------------
+# LLM client (one pooled async client per process, responses cached by context)
+# -----------------------------------------------------------------------------
+LLM_BACKEND = os.getenv("SFC_LLM_BACKEND", "openai")
+LLM_BASE_URL = os.getenv("SFC_LLM_BASE_URL") or os.getenv("OPENAI_BASE_URL") or None
+LLM_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+LLM_TIMEOUT = float(os.getenv("SFC_LLM_TIMEOUT", "15"))          # per attempt (read/write/pool)
+LLM_CONNECT_TIMEOUT = float(os.getenv("SFC_LLM_CONNECT_TIMEOUT", "5"))
+LLM_DEADLINE = float(os.getenv("SFC_LLM_DEADLINE", "30"))        # whole call, retries included
+LLM_RETRIES = int(os.getenv("SFC_LLM_RETRIES", "2"))
+LLM_MAX_CONNECTIONS = int(os.getenv("SFC_LLM_MAX_CONNECTIONS", "20"))
+LLM_CACHE_SIZE = int(os.getenv("SFC_LLM_CACHE_SIZE", "512"))
+LLM_CACHE_TTL = float(os.getenv("SFC_LLM_CACHE_TTL", "3600"))
+_LLM_RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def _llm_backoff(attempt: int, retry_after: Optional[str]) -> float:
+    try:
+        delay = float(retry_after) if retry_after else 0.5 * 2 ** attempt
+    except ValueError:
+        delay = 0.5 * 2 ** attempt
+    return min(delay, 8.0)
+
+
+class OpenAIBackend:
+    """
+    Chat completions over one long-lived httpx.AsyncClient (keep-alive pool).
+    Works with any OpenAI-compatible server, so SFC_LLM_BASE_URL can point at a local stub.
+    """
+
+    name = "openai"
+
+    def __init__(self):
+        import httpx  # in requirements.txt; without it available() is False and the coach stays rule-based
+        self._httpx = httpx
+        headers = {"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}"} if os.getenv("OPENAI_API_KEY") else {}
+        self.client = httpx.AsyncClient(
+            base_url=(LLM_BASE_URL or "https://api.openai.com/v1").rstrip("/"),
+            headers=headers,
+            timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS),
+        )
+
+    @staticmethod
+    def available() -> bool:
+        try:
+            import httpx  # noqa: F401
+        except ImportError:
+            return False
+        # The public endpoint needs a key; a custom base URL (local stub/proxy) may not
+        return bool(os.getenv("OPENAI_API_KEY") or LLM_BASE_URL)
+
+    @staticmethod
+    def _body(system_prompt: str, user_prompt: str, stream: bool = False) -> dict:
+        return {
+            "model": LLM_MODEL,
+            "temperature": 0.6,
+            "stream": stream,
+            "messages": [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
+        }
+
+    async def complete(self, system_prompt: str, user_prompt: str) -> str:
+        body = self._body(system_prompt, user_prompt)
+        httpx = self._httpx
+        for attempt in range(LLM_RETRIES + 1):
+            retry_after = None
+            try:
+                resp = await self.client.post("/chat/completions", json=body)
+                if resp.status_code not in _LLM_RETRY_STATUS or attempt == LLM_RETRIES:
+                    resp.raise_for_status()
+                    return (resp.json()["choices"][0]["message"]["content"] or "").strip()
+                retry_after = resp.headers.get("retry-after")
+            except (httpx.TimeoutException, httpx.TransportError):
+                if attempt == LLM_RETRIES:
+                    raise
+            await asyncio.sleep(_llm_backoff(attempt, retry_after))
+        raise RuntimeError("unreachable")
+
+    async def stream(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        """Content deltas as the server sends them; retried only until the first one arrives."""
+        body = self._body(system_prompt, user_prompt, stream=True)
+        httpx = self._httpx
+        started = False
+        for attempt in range(LLM_RETRIES + 1):
+            retry_after = None
+            try:
+                async with self.client.stream("POST", "/chat/completions", json=body) as resp:
+                    if resp.status_code not in _LLM_RETRY_STATUS or attempt == LLM_RETRIES:
+                        resp.raise_for_status()
+                        async for line in resp.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[5:].strip()
+                            if data == "[DONE]":
+                                return
+                            delta = (json.loads(data)["choices"][0].get("delta") or {}).get("content")
+                            if delta:
+                                started = True
+                                yield delta
+                        return
+                    retry_after = resp.headers.get("retry-after")
+            except (httpx.TimeoutException, httpx.TransportError):
+                if started or attempt == LLM_RETRIES:
+                    raise
+            await asyncio.sleep(_llm_backoff(attempt, retry_after))
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+class EchoBackend:
+    """No network: returns a fixed reply. For load tests and benchmarks of everything around the LLM."""
+
+    name = "echo"
+
+    @staticmethod
+    def available() -> bool:
+        return True
+
+    async def complete(self, system_prompt: str, user_prompt: str) -> str:
+        return f"[echo] {len(system_prompt)}+{len(user_prompt)} chars"
+
+    async def stream(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        for word in (await self.complete(system_prompt, user_prompt)).split(" "):
+            yield word + " "
+
+    async def aclose(self):
+        pass
+
+
+LLM_BACKENDS: Dict[str, Any] = {"openai": OpenAIBackend, "echo": EchoBackend}
+
+_llm: Dict[str, Any] = {"backend": None, "loop": None}
+_LLM_CACHE: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+_LLM_INFLIGHT: Dict[str, asyncio.Future] = {}
+_LLM_STATS = {"hits": 0, "misses": 0, "errors": 0}
+
+
+def _llm_enabled() -> bool:
+    cls = LLM_BACKENDS.get(LLM_BACKEND)
+    return cls is not None and cls.available()
+
+
+@contextlib.asynccontextmanager
+async def _llm_backend():
+    """
+    The process-wide backend, created on first use on the loop the app started on and closed at
+    shutdown. A call on any other loop (a TestClient run without its lifespan, say) gets its own
+    backend, closed after the call, so no connection pool outlives the loop it was opened on.
+    """
+    if _llm["loop"] is asyncio.get_running_loop():
+        if _llm["backend"] is None:
+            _llm["backend"] = LLM_BACKENDS[LLM_BACKEND]()
+        yield _llm["backend"]
+        return
+    backend = LLM_BACKENDS[LLM_BACKEND]()
+    try:
+        yield backend
+    finally:
+        await backend.aclose()
+
+
+def _llm_cache_key(system_prompt: str, ctx: dict, question: str = "") -> str:
+    """System prompt + a hash of the `_compose_context` output (+ the question, for /ask)."""
+    ctx_hash = hashlib.sha1(json.dumps(ctx, sort_keys=True, default=str).encode()).hexdigest()
+    raw = "\0".join([LLM_BACKEND, LLM_MODEL, system_prompt, ctx_hash, question])
+    return hashlib.sha1(raw.encode()).hexdigest()
 
 
-def _try_llm(system_prompt: str, user_prompt: str) -> Optional[str]:
+def _llm_cache_get(key: str) -> Optional[str]:
+    hit = _LLM_CACHE.get(key)
+    if hit is None:
+        return None
+    if time.monotonic() - hit[0] > LLM_CACHE_TTL:
+        del _LLM_CACHE[key]
+        return None
+    _LLM_CACHE.move_to_end(key)
+    return hit[1]
+
+
+def _llm_cache_put(key: str, text: str):
+    _LLM_CACHE[key] = (time.monotonic(), text)
+    _LLM_CACHE.move_to_end(key)
+    while len(_LLM_CACHE) > LLM_CACHE_SIZE:
+        _LLM_CACHE.popitem(last=False)
+
+
+def llm_report() -> dict:
+    return {
+        "backend": LLM_BACKEND if _llm_enabled() else None,
+        "cache_entries": len(_LLM_CACHE),
+        "inflight": len(_LLM_INFLIGHT),
+        **_LLM_STATS,
+    }
+
+
+@timed("llm")
+async def _try_llm(system_prompt: str, user_prompt: str, cache_key: Optional[str] = None) -> Optional[str]:
     """
-    Optional LLM call. Requires:
-      pip install "openai>=1.0.0"
-      export OPENAI_API_KEY=sk-...
-    If package/model/key not present, returns None.
+    Optional LLM call; None when no backend is configured or the call fails (callers fall back to rules).
+    With `cache_key`, answers are served from the LRU cache and concurrent identical calls share one request.
     """
-    key = os.getenv("OPENAI_API_KEY")
-    if not key:
+    if not _llm_enabled():
         return None
-    try:
+    if cache_key is not None:
+        cached = _llm_cache_get(cache_key)
+        if cached is not None:
+            _LLM_STATS["hits"] += 1
+            return cached
+        pending = _LLM_INFLIGHT.get(cache_key)
+        if pending is not None:
+            _LLM_STATS["hits"] += 1
+            return await asyncio.shield(pending)
+    _LLM_STATS["misses"] += 1
+
+    async def call() -> Optional[str]:
         try:
-            from openai import OpenAI
-            client = OpenAI(api_key=key)
-            model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-            resp = client.chat.completions.create(
-                model=model,
-                temperature=0.6,
-                messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
-            )
-            return (resp.choices[0].message.content or "").strip()
-        except ImportError:
-            import openai  # type: ignore
-            openai.api_key = key
-            model = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
-            resp = openai.ChatCompletion.create(
-                model=model,
-                temperature=0.6,
-                messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
-            )
-            return (resp["choices"][0]["message"]["content"] or "").strip()
-    except Exception as e:
-        log.warning("LLM call failed; falling back to rules: %s", e)
-        return None
+            async with _llm_backend() as backend:
+                text = await asyncio.wait_for(backend.complete(system_prompt, user_prompt), LLM_DEADLINE)
+        except Exception as e:
+            _LLM_STATS["errors"] += 1
+            log.warning("LLM call failed; falling back to rules: %s: %s", type(e).__name__, e)
+            return None
+        if text and cache_key is not None:
+            _llm_cache_put(cache_key, text)
+        return text or None
+
+    if cache_key is None:
+        return await call()
+    task = asyncio.ensure_future(call())
+    _LLM_INFLIGHT[cache_key] = task
+    task.add_done_callback(lambda _t: _LLM_INFLIGHT.pop(cache_key, None))
+    return await asyncio.shield(task)
+
+
+async def _stream_llm(system_prompt: str, user_prompt: str, cache_key: str) -> AsyncIterator[str]:
+    """
+    LLM tokens as they arrive (a cached reply comes as one piece); raises on failure or past LLM_DEADLINE.
+    Backends without `stream` yield their whole completion at once.
+    """
+    cached = _llm_cache_get(cache_key)
+    if cached is not None:
+        _LLM_STATS["hits"] += 1
+        yield cached
+        return
+    _LLM_STATS["misses"] += 1
+    async with _llm_backend() as backend:
+        if hasattr(backend, "stream"):
+            tokens = backend.stream(system_prompt, user_prompt)
+        else:
+            async def whole():
+                yield await backend.complete(system_prompt, user_prompt)
+            tokens = whole()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + LLM_DEADLINE
+        parts = []
+        try:
+            while True:
+                try:
+                    token = await asyncio.wait_for(tokens.__anext__(), max(0.0, deadline - loop.time()))
+                except StopAsyncIteration:
+                    break
+                parts.append(token)
+                yield token
+        finally:
+            await tokens.aclose()
+            if METRICS_ENABLED:
+                record_stage("llm_stream", loop.time() - started)  # after the headers went out: histogram only
+    text = "".join(parts).strip()
+    if text:
+        _llm_cache_put(cache_key, text)
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def _sse_llm_events(first: str, system_prompt: str, user_prompt: str, cache_key: str, done):
+    """
+    `first` right away, then one `token` event per LLM delta, then `done` built by done(llm_text, error).
+    llm_text is None when there is no backend or the stream failed (clients drop any partial tokens).
+    """
+    yield first
+    text, error = None, None
+    if _llm_enabled():
+        parts = []
+        try:
+            async for token in _stream_llm(system_prompt, user_prompt, cache_key):
+                parts.append(token)
+                yield _sse("token", {"text": token})
+            text = "".join(parts).strip() or None
+        except Exception as e:
+            _LLM_STATS["errors"] += 1
+            log.warning("LLM stream failed; falling back to rules: %s: %s", type(e).__name__, e)
+            error = type(e).__name__
+    yield _sse("done", done(text, error))
+
+
+def _sse_response(events) -> StreamingResponse:
+    return StreamingResponse(events, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.on_event("startup")
+async def _serve_llm():
+    _llm["loop"] = asyncio.get_running_loop()
+
+
+@app.on_event("shutdown")
+async def _close_llm():
+    backend, _llm["backend"], _llm["loop"] = _llm["backend"], None, None
+    if backend is not None:
+        await backend.aclose()
 
 
 # -----------------------------------------------------------------------------
@@ -463,133 +2789,561 @@ def _luhn_ok(num: str) -> bool:
     return (total % 10) == 0
 
 
+PII_BLOCK_ROWS = 65536
+PII_BLOCK_BYTES = 32 * 1024 * 1024
+
+_LUHN_DOUBLE = (0, 2, 4, 6, 8, 1, 3, 5, 7, 9)
+
+
+def _luhn_ok_batch(digits: np.ndarray) -> np.ndarray:
+    """Luhn check over an (n, L) array of digit values, one card number per row."""
+    doubled = np.zeros(digits.shape[1], dtype=bool)
+    doubled[-2::-2] = True  # every second digit from the right
+    d = digits.astype(np.int64)
+    d[:, doubled] = np.asarray(_LUHN_DOUBLE, dtype=np.int64)[d[:, doubled]]
+    return d.sum(axis=1) % 10 == 0
+
+
+def _pii_hits_py(values: np.ndarray) -> np.ndarray:
+    """Reference per-value check (used for blocks too wide to vectorize)."""
+    hits = np.zeros(len(values), dtype=bool)
+    for i, v in enumerate(values):
+        s = v.strip()
+        if not s:
+            continue
+        if RE_SSN.search(s):
+            hits[i] = True
+            continue
+        digits = re.sub(r"\D", "", s)
+        hits[i] = 13 <= len(digits) <= 16 and _luhn_ok(digits)
+    return hits
+
+
+def _pii_hits(values: np.ndarray) -> np.ndarray:
+    """
+    Boolean hit mask for a block of strings. Values are laid out as a fixed-width
+    uint8 matrix so digit counting and the Luhn check run as array ops; the SSN regex
+    only runs on the few values with a dash and at least 9 digits.
+    """
+    try:
+        raw = values.astype("S")
+    except UnicodeEncodeError:
+        raw = np.char.encode(values.astype(str), "utf-8")
+    width = raw.dtype.itemsize
+    if len(raw) == 0 or width == 0:
+        return np.zeros(len(raw), dtype=bool)
+    if len(raw) * width > PII_BLOCK_BYTES:
+        return _pii_hits_py(values)
+
+    u = raw.view(np.uint8).reshape(len(raw), width)
+    is_digit = (u - 48) < 10  # uint8 wraparound makes this a 0-9 range test
+    n_digits = is_digit.sum(axis=1)
+    hits = np.zeros(len(raw), dtype=bool)
+
+    maybe_ssn = np.flatnonzero((n_digits >= 9) & (u == 45).any(axis=1))
+    for i in maybe_ssn:
+        if RE_SSN.search(values[i]):
+            hits[i] = True
+
+    for length in range(13, 17):
+        rows = np.flatnonzero((n_digits == length) & ~hits)
+        if len(rows):
+            sub = u[rows]
+            digits = (sub[is_digit[rows]] - 48).reshape(len(rows), length)
+            hits[rows[_luhn_ok_batch(digits)]] = True
+    return hits
+
+
+@timed("pii_scan")
+def scan_pii(df: pd.DataFrame, stop_on_first: bool = False) -> Dict[str, Dict[str, Any]]:
+    """
+    Column-wise SSN/CCN scan over every row (skipping 'date' and 'amount').
+    Returns {column: {"hits": n, "first_row": index label}} for flagged columns.
+    With stop_on_first, a column stops being scanned after the first block with a hit,
+    so `hits` then only counts that far.
+    """
+    found: Dict[str, Dict[str, Any]] = {}
+    for col in df.columns:
+        if str(col).lower() in ("date", "amount"):
+            continue
+        series = df[col].astype(str)
+        for start in range(0, len(series), PII_BLOCK_ROWS):
+            block = series.iloc[start:start + PII_BLOCK_ROWS]
+            # Statement columns repeat heavily: check each distinct value once.
+            codes, uniques = pd.factorize(block)
+            uniq_hits = _pii_hits(np.asarray(uniques, dtype=object))
+            if uniq_hits.any():
+                hits = uniq_hits[codes]
+                entry = found.setdefault(col, {"hits": 0, "first_row": block.index[int(np.argmax(hits))]})
+                entry["hits"] += int(hits.sum())
+                if stop_on_first:
+                    break
+    return found
+
+
 def detect_pii(df: pd.DataFrame) -> List[str]:
     """
-    Scan non-required columns row-wise for SSN/CCN-like values.
+    Scan non-required columns for SSN/CCN-like values across the whole frame.
     Skips 'date' and 'amount' to avoid false positives.
     Uses Luhn to reduce CCN false positives.
     """
-    required = {"date", "merchant", "amount"}
-    flagged = set()
-    N = min(len(df), 2000)
+    return sorted(scan_pii(df, stop_on_first=True), key=str)
 
-    for col in df.columns:
-        col_l = str(col).lower()
-        if col_l in ("date", "amount"):
-            continue
-        series = df[col].astype(str).head(N)
-        for v in series:
-            s = v.strip()
-            if not s:
-                continue
-            if RE_SSN.search(s):
-                flagged.add(col)
-                break
-            digits = re.sub(r"\D", "", s)
-            if 13 <= len(digits) <= 16 and _luhn_ok(digits):
-                flagged.add(col)
-                break
-    return sorted(flagged)
+
+def _check_pii(df: pd.DataFrame, action: str):
+    """Raise a 400 if `df` looks like it holds PII."""
+    # Optional bypass: export SFC_SKIP_PII=1 if you need to disable scanning temporarily
+    if os.getenv("SFC_SKIP_PII") == "1":
+        return
+    found = scan_pii(df, stop_on_first=True)
+    if found:
+        bad_cols = sorted(found, key=str)
+        first_row = min(int(v["first_row"]) if isinstance(v["first_row"], (int, np.integer)) else 0 for v in found.values())
+        raise HTTPException(
+            status_code=400,
+            detail=f"{action} blocked: possible PII detected in columns {bad_cols} (first at row {first_row}). Remove sensitive data for this demo.",
+        )
 
 
 # -----------------------------------------------------------------------------
 # API endpoints
 # -----------------------------------------------------------------------------
+UPLOAD_CHUNK_ROWS = int(os.getenv("SFC_UPLOAD_CHUNK_ROWS", "50000"))
+# CSV parsing gets its own small pool so a few big uploads can't take every threadpool
+# worker from the read endpoints; "process" also takes the parse off this interpreter's GIL.
+UPLOAD_WORKERS = int(os.getenv("SFC_UPLOAD_WORKERS", "2"))
+UPLOAD_EXECUTOR = os.getenv("SFC_UPLOAD_EXECUTOR", "thread")  # "thread" or "process"
+_UPLOAD_POOL = None
+_UPLOAD_POOL_LOCK = threading.Lock()
+
+
+def _upload_pool():
+    global _UPLOAD_POOL
+    with _UPLOAD_POOL_LOCK:
+        if _UPLOAD_POOL is None:
+            pool = ProcessPoolExecutor if UPLOAD_EXECUTOR == "process" else ThreadPoolExecutor
+            _UPLOAD_POOL = pool(max_workers=max(1, UPLOAD_WORKERS))
+        return _UPLOAD_POOL
+
+
+def _upload_task(fn, *args):
+    # HTTPException doesn't survive pickling, so its (400) detail crosses the pool as a ValueError
+    try:
+        return fn(*args)
+    except HTTPException as e:
+        raise ValueError(e.detail) from None
+
+
+def _spool_upload(fh) -> str:
+    """Copy an upload to a named temp file (a process worker can't share the spooled one); caller removes it."""
+    fh.seek(0)
+    with tempfile.NamedTemporaryFile(prefix="sfc-upload-", suffix=".csv", delete=False) as out:
+        shutil.copyfileobj(fh, out, 1 << 20)
+    return out.name
+
+
+@contextlib.asynccontextmanager
+async def _upload_source(file: UploadFile):
+    """What the parse pool reads: the upload's spooled file in thread mode, a temp file path in process mode."""
+    if UPLOAD_EXECUTOR != "process":
+        yield file.file
+        return
+    path = await run_in_threadpool(_spool_upload, file.file)
+    try:
+        yield path
+    finally:
+        with contextlib.suppress(OSError):
+            os.unlink(path)
+
+
+async def _in_upload_pool(fn, *args):
+    if UPLOAD_EXECUTOR == "process":
+        future = _upload_pool().submit(_upload_task, fn, *args)
+    else:  # carry the request context over, so parse time shows up in Server-Timing
+        future = _upload_pool().submit(contextvars.copy_context().run, _upload_task, fn, *args)
+    return await asyncio.wrap_future(future)
+
+
 @app.get("/api/health")
-def health():
-    global DATAFRAME, DATA_VERSION, LAST_UPDATED
+def health(ds: Dataset = Depends(get_dataset)):
+    snap = ds.snapshot
     return {
         "status": "ok",
-        "records": 0 if DATAFRAME is None else int(len(DATAFRAME)),
-        "version": int(DATA_VERSION),
-        "last_updated": LAST_UPDATED,
+        "records": snap.records,
+        "version": int(snap.version),
+        "last_updated": snap.last_updated,
+        "memory": STORE.memory_report(),
+        "llm": llm_report(),
+        "conditional_gets": conditional_report(),
+        "startup": startup_report(),
+        "shared": shared_report(),
     }
 
 
+@app.get("/api/metrics")
+def metrics():
+    """Prometheus text format: request latency per route, time per pipeline stage, cache counters."""
+    if not METRICS_ENABLED:
+        return Response("# metrics disabled (SFC_METRICS=0)\n", media_type="text/plain; version=0.0.4")
+    lines = REQUEST_SECONDS.render() + STAGE_SECONDS.render()
+    counters = [
+        ("sfc_conditional_get_total", "Conditional GETs answered 304 (hit) or in full (miss).", "result",
+         {"hit": _CONDITIONAL_STATS["hits"], "miss": _CONDITIONAL_STATS["misses"]}),
+        ("sfc_llm_cache_total", "LLM reply cache lookups and backend errors.", "result",
+         {"hit": _LLM_STATS["hits"], "miss": _LLM_STATS["misses"], "error": _LLM_STATS["errors"]}),
+    ]
+    for name, help_text, label, values in counters:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        lines += [f'{name}{{{label}="{k}"}} {v}' for k, v in values.items()]
+    return Response("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/ready")
+def ready():
+    """Readiness probe that needs no dataset (or numpy/pandas), so a fresh SFC_LAZY_STARTUP worker answers at once."""
+    return {"status": "ok", "startup": startup_report()}
+
+
 @app.post("/api/upload")
-async def upload_csv(file: UploadFile = File(...)):
+async def upload_csv(
+    file: UploadFile = File(...),
+    stream: bool = Query(False),
+    chunk_rows: int = Query(UPLOAD_CHUNK_ROWS, ge=100),
+    ds: Dataset = Depends(get_dataset),
+):
     if not file.filename.lower().endswith(".csv"):
         raise HTTPException(status_code=400, detail="Please upload a .csv file.")
+    if stream:
+        return await _upload_csv_stream(file, chunk_rows, ds)
+    try:
+        async with _upload_source(file) as src:
+            df, raw_rows = await _in_upload_pool(_parse_upload, src)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    snap = await run_in_threadpool(_install_dataframe, df, ds)
+    return {"ok": True, "rows": raw_rows, "version": snap.version}
+
+
+@timed("upload_parse")
+def _parse_upload(src) -> Tuple[pd.DataFrame, int]:
+    """
+    Parse, PII-check, normalize and compact a whole CSV (bytes, an open file or a path).
+    Returns (frame, raw row count).
+    """
     try:
-        raw = await file.read()
-        df = pd.read_csv(io.BytesIO(raw))
+        df = pd.read_csv(io.BytesIO(src) if isinstance(src, bytes) else src)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to parse CSV: {e}")
 
-    # Optional bypass: export SFC_SKIP_PII=1 if you need to disable scanning temporarily
-    if os.getenv("SFC_SKIP_PII") != "1":
-        bad_cols = detect_pii(df)
-        if bad_cols:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Upload blocked: possible PII detected in columns {bad_cols}. Remove sensitive data for this demo.",
-            )
+    _check_pii(df, "Upload")
+
+    try:
+        return _compact_transactions(_normalize_transactions(df)), int(len(df))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _read_csv_chunks(fh, chunk_rows: int) -> Tuple[pd.DataFrame, int]:
+    """
+    Parse a CSV (an open file, a path or bytes) `chunk_rows` rows at a time. Each chunk is PII-checked
+    (raising on the first hit), normalized and compacted before the next one is read,
+    so only the compact rows are kept. Returns (frame, raw row count).
+    """
+    parts = []
+    raw_rows = 0
+    if isinstance(fh, bytes):
+        fh = io.BytesIO(fh)
+    for chunk in pd.read_csv(fh, chunksize=chunk_rows):
+        raw_rows += len(chunk)
+        _check_pii(chunk, "Upload")
+        parts.append(_compact_transactions(_normalize_transactions(chunk)))
+    if not parts:
+        raise ValueError("Empty dataset.")
+    return _concat_compact(parts).reset_index(drop=True), raw_rows
+
 
-    set_dataframe(df)
-    return {"ok": True, "rows": int(len(df)), "version": DATA_VERSION}
+async def _upload_csv_stream(file: UploadFile, chunk_rows: int, ds: Dataset):
+    """Chunked ingestion of the spooled upload, run off the event loop."""
+    t0 = time.perf_counter()
+    try:
+        async with _upload_source(file) as src:
+            df, raw_rows = await _in_upload_pool(_read_csv_chunks, src, chunk_rows)
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Failed to parse CSV: {e}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    snap = await run_in_threadpool(_install_dataframe, df, ds)
+    elapsed = time.perf_counter() - t0
+    return {
+        "ok": True,
+        "rows": int(raw_rows),
+        "version": snap.version,
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "rows_per_sec": int(raw_rows / elapsed) if elapsed > 0 else None,
+    }
+
+
+@app.post("/api/append")
+def append_transactions(
+    rows: List[Dict[str, Any]] = Body(..., example=[{"date": "2025-09-30", "merchant": "STARBUCKS", "amount": 5.25}]),
+    ds: Dataset = Depends(get_dataset),
+):
+    """
+    Merge a small batch of new transactions (e.g. from a bank feed) into the current dataset.
+    Rows carrying an `id` that already exists replace the stored row. New expense rows that
+    stand out against their merchant's updated stats come back under `flagged`.
+    """
+    if not rows:
+        snap = ds.snapshot
+        return {"ok": True, "appended": 0, "replaced": 0, "rows": snap.records, "version": snap.version}
+    try:
+        batch = _normalize_transactions(pd.DataFrame(rows))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if batch.empty:
+        raise HTTPException(status_code=400, detail="No valid rows (need date, merchant, amount).")
+
+    _check_pii(batch, "Append")
+
+    counts, snap = append_dataframe(batch, ds)
+    scored = score_transactions(batch, _derived(ds, snap)["merchant_stats"])
+    return {
+        "ok": True, **counts, "rows": snap.records, "version": snap.version,
+        "flagged": _scored_records(scored[scored["anomaly"]]),
+    }
 
 
 @app.post("/api/reset")
-def reset_to_sample():
-    set_dataframe(generate_sample_transactions())
-    return {"ok": True, "rows": int(len(DATAFRAME)), "version": DATA_VERSION}
+def reset_to_sample(ds: Dataset = Depends(get_dataset)):
+    snap = set_dataframe(generate_sample_transactions(), ds)
+    return {"ok": True, "rows": snap.records, "version": snap.version}
 
 
 @app.post("/api/clear")
-def clear_data():
-    """Clear uploaded data from memory (demo privacy control)."""
-    global DATAFRAME
-    DATAFRAME = pd.DataFrame(columns=["date", "merchant", "amount"])
-    _bump_version()
-    return {"ok": True, "rows": 0, "version": DATA_VERSION}
+def clear_data(ds: Dataset = Depends(get_dataset)):
+    """Clear this session's data from memory and disk (snapshot and spilled copies) (demo privacy control)."""
+    with ds.writing():
+        snap = ds.publish(pd.DataFrame(columns=["date", "merchant", "amount"]))
+        ds.frame_bytes = ds.object_bytes = 0
+    STORE.forget(ds.tenant, snap.version)
+    return {"ok": True, "rows": 0, "version": snap.version}
+
+
+TX_PAGE_MAX = 50000
+TX_BLOCK_ROWS = 5000
+
+
+def _encode_cursor(date: np.datetime64, label: Any) -> str:
+    raw = f"{int(date.astype('datetime64[ns]').astype(np.int64))}:{int(label)}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _cursor_start(df: pd.DataFrame, cursor: str) -> int:
+    """
+    Position just after the row a cursor points at. Cursors hold (date, row label), so they
+    survive appends; if that row has since been replaced, resume after its date instead.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        date_ns, label = (int(x) for x in raw.split(":"))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    date = np.datetime64(date_ns, "ns")
+    if label in df.index:
+        pos = df.index.get_loc(label)
+        if isinstance(pos, (int, np.integer)) and df["date"].iat[pos] == date:
+            return int(pos) + 1
+    return int(np.searchsorted(df["date"].to_numpy(), date, side="right"))
+
+
+def _tx_filter(df: pd.DataFrame, start: Optional[str], end: Optional[str], merchant: Optional[str],
+               category: Optional[str], min_amount: Optional[float], max_amount: Optional[float]):
+    """
+    Turn the filters into a [lo, hi) date window (binary search on the sorted dates) and a
+    row-mask function. Merchant and category filters are decided once per distinct merchant
+    and applied to rows by code; amounts compare as cents.
+    """
+    dates = df["date"].to_numpy()
+    lo, hi = 0, len(df)
+    try:
+        if start:
+            lo = int(np.searchsorted(dates, pd.Timestamp(start).to_datetime64(), side="left"))
+        if end:
+            end_ts = pd.Timestamp(end)
+            if end_ts == end_ts.normalize():
+                end_ts += pd.Timedelta(days=1)  # a bare date includes the whole day
+                hi = int(np.searchsorted(dates, end_ts.to_datetime64(), side="left"))
+            else:
+                hi = int(np.searchsorted(dates, end_ts.to_datetime64(), side="right"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start/end must be dates (YYYY-MM-DD).")
+
+    codes = allowed = None
+    if merchant or category:
+        codes, uniques = _codes(df["merchant"])
+        names = [str(m) for m in uniques]
+        allowed = np.ones(len(names), dtype=bool)
+        if merchant:
+            needle = merchant.upper()
+            allowed &= np.array([needle in n.upper() for n in names], dtype=bool)
+        if category:
+            want = category.strip().lower()
+            allowed &= np.array([categorize_merchant(n).lower() == want for n in names], dtype=bool)
+    cents = df["cents"].to_numpy() if "cents" in df.columns else np.rint(df["amount"].to_numpy(dtype=np.float64) * 100)
+    lo_c = None if min_amount is None else round(min_amount * 100)
+    hi_c = None if max_amount is None else round(max_amount * 100)
+
+    if allowed is None and lo_c is None and hi_c is None:
+        return lo, hi, None
+
+    def mask(a: int, b: int) -> np.ndarray:
+        m = np.ones(b - a, dtype=bool)
+        if allowed is not None:
+            m &= allowed[codes[a:b]]
+        if lo_c is not None:
+            m &= cents[a:b] >= lo_c
+        if hi_c is not None:
+            m &= cents[a:b] <= hi_c
+        return m
+
+    return lo, hi, mask
+
+
+def _tx_positions(lo: int, hi: int, mask, limit: Optional[int] = None):
+    """Yield arrays of matching row positions in frame order, a block at a time."""
+    left = limit
+    step = max(TX_BLOCK_ROWS, limit or 0)
+    for a in range(lo, hi, step):
+        b = min(hi, a + step)
+        pos = np.arange(a, b) if mask is None else a + np.flatnonzero(mask(a, b))
+        if left is not None:
+            pos = pos[:left]
+            left -= len(pos)
+        if len(pos):
+            yield pos
+        if left is not None and left <= 0:
+            return
+
+
+def _tx_records(df: pd.DataFrame, pos: np.ndarray, merchant_names: Optional[np.ndarray]) -> List[Dict[str, Any]]:
+    """JSON-ready dicts for rows at `pos` (dollar amounts, ISO dates, NaN as null)."""
+    sub = df.iloc[pos]
+    cols: Dict[str, list] = {}
+    for col in sub.columns:
+        s = sub[col]
+        if col == "date":
+            cols["date"] = np.datetime_as_string(s.to_numpy(), unit="s").tolist()
+        elif col == "cents":
+            cols["amount"] = (s.to_numpy() / 100.0).tolist()
+        elif col == "merchant" and merchant_names is not None:
+            cols["merchant"] = merchant_names[s.cat.codes.to_numpy()].tolist()
+        else:
+            vals = s.astype(object)
+            cols[col] = vals.where(s.notna(), None).tolist()
+    names = list(cols)
+    return [dict(zip(names, vals)) for vals in zip(*cols.values())]
+
+
+def _privacy_names(df: pd.DataFrame, privacy: bool) -> Optional[np.ndarray]:
+    """Masked merchant names per category code, hashed once per distinct merchant."""
+    if not privacy:
+        return None
+    return np.array([privacy_name(str(m)) for m in df["merchant"].cat.categories], dtype=object)
 
 
 @app.get("/api/transactions")
-def get_transactions(privacy: bool = Query(False)):
-    if DATAFRAME is None:
-        return []
-    rows = DATAFRAME.copy()
-    if privacy:
-        rows["merchant"] = rows["merchant"].apply(privacy_name)
-    return rows.to_dict(orient="records")
+def get_transactions(
+    privacy: bool = Query(False),
+    limit: Optional[int] = Query(None, ge=1, le=TX_PAGE_MAX),
+    cursor: Optional[str] = Query(None),
+    start: Optional[str] = Query(None),
+    end: Optional[str] = Query(None),
+    merchant: Optional[str] = Query(None),
+    category: Optional[str] = Query(None),
+    min_amount: Optional[float] = Query(None),
+    max_amount: Optional[float] = Query(None),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    ds: Dataset = Depends(get_dataset),
+):
+    """
+    Transactions in date order, filtered by date range, merchant (substring), category and amount.
+    With `limit` or `cursor`: one page plus `next_cursor`. Otherwise every match, streamed as a JSON
+    array, or one object per line with format=ndjson; rows are rendered a block at a time.
+    """
+    df = ds.df
+    if df is None or df.empty:
+        if format == "ndjson":
+            return StreamingResponse(iter(()), media_type="application/x-ndjson")
+        return {"rows": [], "next_cursor": None, "count": 0} if (limit or cursor) else []
+    if not isinstance(df["merchant"].dtype, pd.CategoricalDtype):
+        df = _compact_transactions(df)
+
+    lo, hi, mask = _tx_filter(df, start, end, merchant, category, min_amount, max_amount)
+    if cursor:
+        lo = max(lo, _cursor_start(df, cursor))
+    names = _privacy_names(df, privacy)
+
+    if format == "json" and (limit or cursor):
+        limit = limit or 100
+        pos = np.concatenate(list(_tx_positions(lo, hi, mask, limit)) or [np.empty(0, dtype=np.int64)])
+        next_cursor = None
+        if len(pos) == limit and pos[-1] + 1 < hi:
+            last = int(pos[-1])
+            next_cursor = _encode_cursor(df["date"].to_numpy()[last], df.index[last])
+        return {"rows": _tx_records(df, pos, names), "next_cursor": next_cursor, "count": int(len(pos))}
+
+    def body():
+        sep = "\n" if format == "ndjson" else ","
+        first = True
+        if format == "json":
+            yield "["
+        for pos in _tx_positions(lo, hi, mask, limit):
+            chunk = sep.join(
+                json.dumps(rec, ensure_ascii=False, separators=(",", ":"), default=str)
+                for rec in _tx_records(df, pos, names)
+            )
+            if format == "ndjson":
+                yield chunk + "\n"
+            else:
+                yield chunk if first else "," + chunk
+            first = False
+        if format == "json":
+            yield "]"
+
+    media = "application/x-ndjson" if format == "ndjson" else "application/json"
+    return StreamingResponse(body(), media_type=media)
 
 
 @app.get("/api/summary")
-def get_summary(privacy: bool = Query(False)):
-    if DATAFRAME is None or DATAFRAME.empty:
+def get_summary(privacy: bool = Query(False), ds: Dataset = Depends(get_dataset)):
+    snap = ds.snapshot
+    if snap.empty:
         return {"period": None, "total_expense_month": 0, "by_category": {}, "top_merchants": {}, "coffee": {}, "privacy": privacy}
 
-    df = categorize(DATAFRAME)
-    _, expense_df = split_income_expense(df)
-    df_m = monthly_bucket(expense_df)
-    months = sorted(df_m["year_month"].unique())
-    current = months[-1] if months else datetime.utcnow().strftime("%Y-%m")
+    d = _derived(ds, snap)
+    expense_df, current, cube = d["expense"], d["current"], d["cat_cube"]
 
-    month_expense = df_m[df_m["year_month"] == current]
-    total_expense = float(month_expense["amount"].sum())
-
-    cat = month_expense.groupby("category")["amount"].sum().sort_values(ascending=False)
-    top_merch = month_expense.groupby("merchant")["amount"].sum().sort_values(ascending=False).head(10)
+    cat = _sorted_desc(cube.row(current))
+    total_expense = float(sum(cat.values()))
+    top_merch = _sorted_desc(d["merch_cube"].row(current), 10)
 
     return {
         "period": current,
         "total_expense_month": round(total_expense, 2),
-        "by_category": cat.to_dict(),
-        "top_merchants": maybe_privacy_map_dict(top_merch.to_dict(), privacy),
-        "coffee": coffee_insight(expense_df, current),
+        "by_category": cat,
+        "top_merchants": maybe_privacy_map_dict(top_merch, privacy),
+        "coffee": coffee_insight(expense_df, current, cube=cube),
         "privacy": privacy,
     }
 
 
 @app.get("/api/subscriptions")
-def get_subscriptions(privacy: bool = Query(False)):
+def get_subscriptions(privacy: bool = Query(False), ds: Dataset = Depends(get_dataset)):
     try:
-        if DATAFRAME is None or DATAFRAME.empty:
+        snap = ds.snapshot
+        if snap.empty:
             return []
-        df = categorize(DATAFRAME)
-        _, expense_df = split_income_expense(df)
-
-        subs = detect_subscriptions(expense_df)
+        subs = _derived(ds, snap)["subscriptions"]
         if subs is None or subs.empty:
             return []
 
@@ -605,12 +3359,11 @@ def get_subscriptions(privacy: bool = Query(False)):
 
 
 @app.get("/api/anomalies")
-def get_anomalies(privacy: bool = Query(False)):
-    if DATAFRAME is None or DATAFRAME.empty:
+def get_anomalies(privacy: bool = Query(False), ds: Dataset = Depends(get_dataset)):
+    snap = ds.snapshot
+    if snap.empty:
         return []
-    df = categorize(DATAFRAME)
-    _, expense_df = split_income_expense(df)
-    flagged = anomaly_detection(expense_df).copy()
+    flagged = _derived(ds, snap)["anomalies"].copy()
     if not flagged.empty:
         flagged["date"] = flagged["date"].dt.strftime("%Y-%m-%d")
     out = flagged.to_dict(orient="records")
@@ -620,46 +3373,162 @@ def get_anomalies(privacy: bool = Query(False)):
     return out
 
 
+def _scored_records(scored: pd.DataFrame) -> List[Dict[str, Any]]:
+    out = scored.assign(date=scored["date"].dt.strftime("%Y-%m-%d")) if not scored.empty else scored
+    return [
+        {"date": r["date"], "merchant": r["merchant"], "amount": float(r["amount"]),
+         "z_score": round(float(r["z_score"]), 3), "known": bool(r["known"]), "anomaly": bool(r["anomaly"])}
+        for r in out.to_dict(orient="records")
+    ]
+
+
+@app.post("/api/anomalies/score")
+def score_anomalies(
+    rows: List[Dict[str, Any]] = Body(..., example=[{"date": "2025-09-30", "merchant": "TARGET", "amount": 450.0}]),
+    ds: Dataset = Depends(get_dataset),
+):
+    """
+    Score candidate transactions against the stored per-merchant stats (nothing is saved).
+    Each row costs one lookup, so this stays fast however much history is loaded.
+    """
+    if not rows:
+        return []
+    try:
+        batch = _normalize_transactions(pd.DataFrame(rows))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    snap = ds.snapshot
+    if batch.empty or snap.empty:
+        return []
+    return _scored_records(score_transactions(batch, _derived(ds, snap)["merchant_stats"]))
+
+
+ML_MIN_ROWS = 8
+ML_WORKERS = int(os.getenv("SFC_ML_WORKERS", str(min(8, os.cpu_count() or 1))))
+ML_EXECUTOR = os.getenv("SFC_ML_EXECUTOR", "thread")  # "thread" or "process"
+_ML_POOL = None
+_ML_POOL_LOCK = threading.Lock()
+
+
+def _ml_pool():
+    global _ML_POOL
+    with _ML_POOL_LOCK:
+        if _ML_POOL is None:
+            pool = ProcessPoolExecutor if ML_EXECUTOR == "process" else ThreadPoolExecutor
+            _ML_POOL = pool(max_workers=max(1, ML_WORKERS))
+        return _ML_POOL
+
+
+def _fit_isolation_forest(amounts: np.ndarray) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Fit one merchant's model (top-level so a process pool can run it). Returns (outlier mask, scores)."""
+    from sklearn.ensemble import IsolationForest  # type: ignore
+    X = amounts.reshape(-1, 1)
+    try:
+        iso = IsolationForest(random_state=0, contamination="auto")
+        y = iso.fit_predict(X)
+        return y == -1, iso.decision_function(X)
+    except Exception:
+        return None
+
+
+def _ml_merchant_groups(expense_df: pd.DataFrame):
+    """(merchant, row positions in date order, amounts) for merchants with enough rows to fit."""
+    codes, labels = _codes(expense_df["merchant"])
+    order = np.argsort(codes, kind="stable")
+    counts = np.bincount(codes, minlength=len(labels))
+    ends = np.cumsum(counts)
+    amounts = expense_df["amount"].to_numpy(dtype=np.float64)
+    for k in np.flatnonzero(counts >= ML_MIN_ROWS):
+        pos = order[ends[k] - counts[k]:ends[k]]
+        yield str(labels[k]), pos, amounts[pos]
+
+
+def _ml_collect(ds: Dataset, merchant: str, fp: str, fut: Future):
+    """Done-callback: keep a finished fit even if the request that started it has returned."""
+    if ds.ml_pending.get(merchant, (None,))[0] == fp:
+        ds.ml_pending.pop(merchant, None)
+    try:
+        ds.ml_models[merchant] = (fp, fut.result())
+    except Exception as e:
+        log.warning("IsolationForest fit failed for a merchant: %s", e)
+        ds.ml_models[merchant] = (fp, None)
+
+
 @app.get("/api/anomalies_ml")
-def get_anomalies_ml():
+def get_anomalies_ml(
+    budget_ms: Optional[int] = Query(None, ge=1),
+    ds: Dataset = Depends(get_dataset),
+):
     """
     Optional ML-based anomalies using IsolationForest.
     Returns {} if scikit-learn not installed or not enough data.
+    Per-merchant results are cached by a fingerprint of the merchant's amounts, so only new or
+    changed merchants are refit, in parallel on the ML pool. With `budget_ms`, returns the merchants
+    finished by then; the rest keep fitting and show up on the next call.
     """
     try:
-        from sklearn.ensemble import IsolationForest  # type: ignore
+        import sklearn.ensemble  # type: ignore  # noqa: F401
     except Exception:
         return {"available": False, "reason": "scikit-learn not installed"}
 
-    if DATAFRAME is None or DATAFRAME.empty:
-        return {"available": True, "anomalies": []}
+    snap = ds.snapshot
+    if snap.empty:
+        return {"available": True, "anomalies": [], "complete": True, "pending": 0}
 
-    df = categorize(DATAFRAME)
-    _, expense_df = split_income_expense(df)
+    expense_df = _derived(ds, snap)["expense"]
     if expense_df.empty:
-        return {"available": True, "anomalies": []}
-
-    # Simple per-merchant model
-    rows = []
-    for merch, g in expense_df.groupby("merchant"):
-        X = g[["amount"]].values
-        if len(X) < 8:
+        return {"available": True, "anomalies": [], "complete": True, "pending": 0}
+
+    t0 = time.perf_counter()
+    groups = {}
+    waiting = []
+    for merch, pos, amounts in _ml_merchant_groups(expense_df):
+        fp = hashlib.sha1(amounts.tobytes()).hexdigest()
+        groups[merch] = (fp, pos)
+        cached = ds.ml_models.get(merch)
+        if cached is not None and cached[0] == fp:
             continue
-        try:
-            iso = IsolationForest(random_state=0, contamination="auto")
-            y = iso.fit_predict(X)
-            scores = iso.decision_function(X)
-            mask = y == -1
-            out = g.loc[mask].copy()
-            out["score"] = scores[mask]
-            if not out.empty:
-                out["date"] = out["date"].dt.strftime("%Y-%m-%d")
-                for _, r in out.iterrows():
-                    rows.append({"date": r["date"], "merchant": merch, "amount": float(r["amount"]), "score": float(r["score"])})
-        except Exception:
+        pending = ds.ml_pending.get(merch)
+        if pending is None or pending[0] != fp:
+            fut = _ml_pool().submit(_fit_isolation_forest, amounts)
+            pending = (fp, fut)
+            ds.ml_pending[merch] = pending
+            fut.add_done_callback(lambda f, m=merch, p=fp: _ml_collect(ds, m, p, f))
+        waiting.append(pending[1])
+    for gone in set(ds.ml_models) - set(groups):
+        ds.ml_models.pop(gone, None)
+
+    if waiting:
+        timeout = None if budget_ms is None else max(0.0, budget_ms / 1000.0 - (time.perf_counter() - t0))
+        wait(waiting, timeout=timeout)
+
+    dates = expense_df["date"].dt.strftime("%Y-%m-%d").to_numpy() if groups else None
+    amount = expense_df["amount"].to_numpy(dtype=np.float64)
+    rows, pending = [], 0
+    for merch, (fp, pos) in groups.items():
+        cached = ds.ml_models.get(merch)
+        if cached is None or cached[0] != fp:
+            fut = ds.ml_pending.get(merch, (None, None))[1]
+            if fut is None or not fut.done():
+                pending += 1
+                continue
+            _ml_collect(ds, merch, fp, fut)
+            cached = ds.ml_models[merch]
+        if cached[1] is None:
             continue
+        mask, scores = cached[1]
+        hit = pos[mask]
+        rows.extend(
+            {"date": d, "merchant": merch, "amount": float(a), "score": float(sc)}
+            for d, a, sc in zip(dates[hit], amount[hit], scores[mask])
+        )
 
-    return {"available": True, "anomalies": sorted(rows, key=lambda r: r["score"])[:100]}
+    return {
+        "available": True,
+        "anomalies": sorted(rows, key=lambda r: r["score"])[:100],
+        "complete": pending == 0,
+        "pending": pending,
+    }
 
 
 @app.get("/api/forecast")
@@ -667,39 +3536,45 @@ def get_forecast(
     income_monthly: float = Query(1800),
     goal_amount: float = Query(3000),
     months_to_goal: int = Query(10),
+    mode: str = Query("flat", pattern="^(flat|monte_carlo)$"),
+    paths: int = Query(10000, ge=100, le=100000),
+    seed: Optional[int] = Query(None, ge=0),
+    ds: Dataset = Depends(get_dataset),
 ):
-    if DATAFRAME is None or DATAFRAME.empty:
-        return goal_forecast(income_monthly, 0.0, goal_amount, months_to_goal)
-
-    df = categorize(DATAFRAME)
-    _, expense_df = split_income_expense(df)
-    df_m = monthly_bucket(expense_df)
-    months = sorted(df_m["year_month"].unique())
-    current = months[-1] if months else datetime.utcnow().strftime("%Y-%m")
-    month_expense = df_m[df_m["year_month"] == current]
-    total_expense = float(month_expense["amount"].sum())
-    return goal_forecast(income_monthly, total_expense, goal_amount, months_to_goal)
+    """
+    `flat` projects this month's surplus forward. `monte_carlo` also returns P(on track) and savings
+    percentile bands from `paths` sampled futures; pass `seed` for a deterministic (cached) answer.
+    """
+    snap = ds.snapshot
+    if snap.empty:
+        out = goal_forecast(income_monthly, 0.0, goal_amount, months_to_goal)
+        return {**out, "monte_carlo": None} if mode == "monte_carlo" else out
+
+    d = _derived(ds, snap)
+    total_expense = d["cat_cube"].month_total(d["current"])
+    out = goal_forecast(income_monthly, total_expense, goal_amount, months_to_goal)
+    if mode == "monte_carlo":
+        mc = None
+        if months_to_goal >= 1:
+            mc = _forecast_mc(ds, d, income_monthly, goal_amount, min(months_to_goal, 120), paths, seed)
+        out = {**out, "monte_carlo": mc}
+    return out
 
 
 @app.get("/api/trends")
-def get_trends(months: int = Query(6, ge=2, le=24)):
-    if DATAFRAME is None:
+def get_trends(months: int = Query(6, ge=2, le=24), ds: Dataset = Depends(get_dataset)):
+    snap = ds.snapshot
+    if snap.df is None:
         return {"months": [], "totals": [], "by_category": {}}
-    df = categorize(DATAFRAME)
-    _, expense_df = split_income_expense(df)
+    d = _derived(ds, snap)
+    cube = d["cat_cube"]
 
-    totals = last_n_months_expense(expense_df, months=months)  # dense months
+    totals = last_n_months_expense(d["expense"], months=months, cube=cube)  # dense months
     month_order = list(totals["year_month"])
-    by_cat_long = (
-        expense_df.assign(year_month=expense_df["date"].dt.to_period("M").astype(str))
-        .groupby(["year_month", "category"])["amount"]
-        .sum()
-        .reset_index()
-    )
+    rows = [cube.month_index(m) for m in month_order]
     out = {}
-    for cat, g in by_cat_long.groupby("category"):
-        m2v = {row["year_month"]: float(row["amount"]) for _, row in g.iterrows()}
-        out[cat] = [m2v.get(m, 0.0) for m in month_order]
+    for j, cat in enumerate(cube.keys):
+        out[cat] = [0.0 if i is None else float(cube.total[i, j]) for i in rows]
 
     return {"months": month_order, "totals": [float(x) for x in totals["total"]], "by_category": out}
 
@@ -709,28 +3584,27 @@ def compare_and_suggest(
     income_monthly: float = Query(1800),
     goal_amount: float = Query(3000),
     months_to_goal: int = Query(10),
+    ds: Dataset = Depends(get_dataset),
 ):
-    if DATAFRAME is None or DATAFRAME.empty:
+    snap = ds.snapshot
+    if snap.empty:
         return {"period": None, "delta_overall": 0.0, "categories": [], "suggestions": []}
 
-    df = categorize(DATAFRAME)
-    _, expense_df = split_income_expense(df)
-    dfm = expense_df.assign(year_month=expense_df["date"].dt.to_period("M").astype(str))
-    months_sorted = sorted(dfm["year_month"].unique())
+    d = _derived(ds, snap)
+    expense_df, months_sorted, cube = d["expense"], d["months"], d["cat_cube"]
     cur = months_sorted[-1]
-    cur_total = float(dfm.loc[dfm["year_month"] == cur, "amount"].sum())
+    cur_total = cube.month_total(cur)
 
     prev_total = 0.0
     if len(months_sorted) >= 2:
-        prev = months_sorted[-2]
-        prev_total = float(dfm.loc[dfm["year_month"] == prev, "amount"].sum())
+        prev_total = cube.month_total(months_sorted[-2])
 
-    cat_delta = category_spend_this_and_prev(expense_df, cur)
+    cat_delta = category_spend_this_and_prev(expense_df, cur, cube=cube)
     cat_rows = cat_delta.to_dict(orient="records")
 
     forecast = goal_forecast(income_monthly, cur_total, goal_amount, months_to_goal)
     needed = float(forecast.get("need_per_month", 0.0)) if not forecast.get("on_track", False) else 0.0
-    suggestions = suggestion_engine(expense_df, needed)
+    suggestions = suggestion_engine(expense_df, needed, cube=cube)
 
     return {
         "period": cur,
@@ -745,34 +3619,31 @@ def compare_and_suggest(
 
 
 @app.get("/api/score")
-def get_score(income_monthly: float = Query(1800)):
-    if DATAFRAME is None or DATAFRAME.empty:
+def get_score(income_monthly: float = Query(1800), ds: Dataset = Depends(get_dataset)):
+    snap = ds.snapshot
+    if snap.empty:
         return {"score": 50, "signals": [], "explain": "No data — neutral score."}
 
-    df = categorize(DATAFRAME)
-    _, expense_df = split_income_expense(df)
-
-    dfm = expense_df.assign(year_month=expense_df["date"].dt.to_period("M").astype(str))
-    months_sorted = sorted(dfm["year_month"].unique())
+    d = _derived(ds, snap)
+    expense_df, months_sorted, cube = d["expense"], d["months"], d["cat_cube"]
     cur = months_sorted[-1]
-    cur_total = float(dfm.loc[dfm["year_month"] == cur, "amount"].sum())
+    cur_total = cube.month_total(cur)
     savings_rate = 0.0 if income_monthly <= 0 else max(0.0, min(1.0, (income_monthly - cur_total) / income_monthly))
 
-    totals = dfm.groupby("year_month")["amount"].sum().reset_index().sort_values("year_month")
-    last6 = totals.tail(6)["amount"]
+    last6 = cube.month_totals()[-6:]
     vol = 0.0
     if len(last6) >= 2 and last6.mean() > 1e-6:
-        vol = float(last6.std(ddof=0) / last6.mean())
+        vol = float(last6.std() / last6.mean())
 
-    subs = detect_subscriptions(expense_df)
+    subs = d["subscriptions"]
     subs_in_cur = 0.0
     if not subs.empty:
         subs_in_cur = float(subs.loc[subs["months"].str.contains(cur, na=False), "charge"].sum())
     recurring_ratio = 0.0 if cur_total <= 0 else min(1.0, subs_in_cur / cur_total)
 
-    anoms = anomaly_detection(expense_df)
+    anoms = d["anomalies"]
     anoms_cur = 0
-    tx_cur = len(dfm[dfm["year_month"] == cur])
+    tx_cur = cube.month_count(cur)
     if not anoms.empty:
         anoms_cur = int((anoms.assign(year_month=anoms["date"].dt.to_period("M").astype(str))["year_month"] == cur).sum())
     anomaly_rate = 0.0 if tx_cur == 0 else anoms_cur / tx_cur
@@ -800,97 +3671,273 @@ def what_if(
     income_monthly: float = Query(1800),
     goal_amount: float = Query(3000),
     months_to_goal: int = Query(10),
+    ds: Dataset = Depends(get_dataset),
 ):
-    if DATAFRAME is None or DATAFRAME.empty:
+    snap = ds.snapshot
+    if snap.empty:
         return {"forecast": goal_forecast(income_monthly, 0.0, goal_amount, months_to_goal), "applied": {}}
 
-    df = categorize(DATAFRAME)
-    _, expense_df = split_income_expense(df)
-    dfm = expense_df.assign(year_month=expense_df["date"].dt.to_period("M").astype(str))
-    cur = dfm["year_month"].max()
-    cur_exp = dfm[dfm["year_month"] == cur]
+    d = _derived(ds, snap)
+    cur = d["current"]
+    by_cat = d["cat_cube"].row(cur)
+    res = whatif_scenarios(by_cat, [cuts], income_monthly, goal_amount, months_to_goal)[0]
+    return {"period": cur, "current_expense": round(float(sum(by_cat.values())), 2), **res}
+
+
+WHATIF_MAX_SCENARIOS = int(os.getenv("SFC_WHATIF_MAX_SCENARIOS", "10000"))
+
 
-    by_cat = cur_exp.groupby("category")["amount"].sum().to_dict()
+def _cut_dict(value: Any, name: str) -> Dict[str, float]:
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        raise HTTPException(status_code=400, detail=f"`{name}` must be an object of category -> number.")
+    try:
+        return {str(k): float(v) for k, v in value.items()}
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"`{name}` values must be numbers.")
 
-    applied = {}
-    reduced_total = 0.0
-    for cat, cur_amt in by_cat.items():
-        want_cut = float(cuts.get(cat, 0.0))
-        take = max(0.0, min(want_cut, cur_amt))
-        if take > 0:
-            applied[cat] = round(take, 2)
-            reduced_total += take
 
+@app.post("/api/whatif/batch")
+def what_if_batch(
+    body: Dict[str, Any] = Body(..., example={
+        "scenarios": [{"Dining": 60}, {"Dining": 60, "Coffee": 20}],
+        "optimize": {"fixed": {"Coffee": 20}, "max_pct": {"Shopping": 0.3}},
+    }),
+    income_monthly: float = Query(1800),
+    goal_amount: float = Query(3000),
+    months_to_goal: int = Query(10, ge=1),
+    ds: Dataset = Depends(get_dataset),
+):
+    """
+    Evaluate many `scenarios` (cut dicts, as for /whatif) in one call. With `optimize` (true or an
+    object with `fixed`, `weights`, `max_pct`, `limits`), also return the cheapest cuts that close the gap.
+    """
+    scenarios = body.get("scenarios") or []
+    if not isinstance(scenarios, list):
+        raise HTTPException(status_code=400, detail="`scenarios` must be a list of cut objects.")
+    if len(scenarios) > WHATIF_MAX_SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"At most {WHATIF_MAX_SCENARIOS} scenarios per request.")
+    scenarios = [_cut_dict(sc, "scenarios[]") for sc in scenarios]
+    opt = body.get("optimize")
+    if opt is True:
+        opt = {}
+    elif opt is not None and not isinstance(opt, dict):
+        raise HTTPException(status_code=400, detail="`optimize` must be true or an object.")
+
+    snap = ds.snapshot
+    if snap.empty:
+        by_cat, cur = {}, None
+    else:
+        d = _derived(ds, snap)
+        cur = d["current"]
+        by_cat = d["cat_cube"].row(cur)
     cur_total = float(sum(by_cat.values()))
-    new_expense = max(0.0, cur_total - reduced_total)
-    forecast = goal_forecast(income_monthly, new_expense, goal_amount, months_to_goal)
-    return {"period": cur, "current_expense": round(cur_total, 2), "new_expense": round(new_expense, 2), "applied": applied, "forecast": forecast}
+    out = {
+        "period": cur,
+        "current_expense": round(cur_total, 2),
+        "categories": {k: round(float(v), 2) for k, v in _sorted_desc(by_cat).items()},
+        "results": whatif_scenarios(by_cat, scenarios, income_monthly, goal_amount, months_to_goal),
+    }
+    if opt is not None:
+        plan = optimal_cuts(
+            by_cat, _monthly_need(income_monthly, cur_total, goal_amount, months_to_goal),
+            fixed=_cut_dict(opt.get("fixed"), "fixed"), weights=_cut_dict(opt.get("weights"), "weights"),
+            max_pct=_cut_dict(opt.get("max_pct"), "max_pct"), limits=_cut_dict(opt.get("limits"), "limits"),
+        )
+        plan["forecast"] = goal_forecast(income_monthly, max(0.0, cur_total - plan["total_cut"]), goal_amount, months_to_goal)
+        out["optimal"] = plan
+    return APIJSONResponse(out)  # plain floats/str/bool already; skips per-value encoding of large batches
+
+
+COACH_SYSTEM = (
+    "You are a kind, specific financial coach. "
+    "Reply in one short paragraph followed by 3 concise bullets. "
+    "Use numbers from the JSON and keep it actionable."
+)
+ASK_SYSTEM = ("You answer questions about the user's spending using the JSON provided. "
+              "If data isn’t available, say so briefly. Be specific and concise.")
+
+
+def _coach_user_prompt(ctx: dict) -> str:
+    return f"User Finance Snapshot (JSON):\n{ctx}\nCreate a brief coaching note."
+
+
+def _ask_user_prompt(question: str, ctx: dict) -> str:
+    return f"Question: {question}\nData:\n{ctx}"
+
+
+def _safe_coach_context() -> dict:
+    return {
+        "period": None, "expense_total": 0.0, "by_category": {}, "top_merchants": {},
+        "coffee_msg": "", "forecast": {"on_track": False, "surplus": 0, "gap": 0, "need_per_month": 0, "message": "No data"},
+        "suggestions": [], "delta_categories": [], "anomaly_count": 0
+    }
+
+
+def _rule_based_answer(question: str, ctx: dict) -> str:
+    q = question.lower()
+    if "coffee" in q:
+        return ctx["coffee_msg"]
+    if "subscription" in q or "recurring" in q:
+        top = next(iter(ctx["top_merchants"]), None)
+        return f"Recurring charges are listed on the Subscriptions card. Your top merchant this month is {top or 'n/a'}."
+    if "total" in q or "spend" in q:
+        return f"You’ve spent ${ctx['expense_total']:,.0f} in {ctx['period']}."
+    if "goal" in q or "track" in q:
+        return ctx["forecast"]["message"]
+    if "anomal" in q or "outlier" in q:
+        return f"{ctx['anomaly_count']} unusual transactions flagged—check the Anomalies table."
+    return "I couldn’t find that in the demo data. Try asking about coffee, total spend, subscriptions, anomalies, or your goal."
 
 
 @app.get("/api/coach")
-def api_coach(
+async def api_coach(
     income_monthly: float = Query(1800),
     goal_amount: float = Query(3000),
     months_to_goal: int = Query(10),
     privacy: bool = Query(False),
+    ds: Dataset = Depends(get_dataset),
 ):
     try:
-        ctx = _compose_context(income_monthly, goal_amount, months_to_goal, privacy)
+        ctx = await run_in_threadpool(_compose_context, ds, income_monthly, goal_amount, months_to_goal, privacy)
         llm_text = None
-        if os.getenv("OPENAI_API_KEY"):
-            system = (
-                "You are a kind, specific financial coach. "
-                "Reply in one short paragraph followed by 3 concise bullets. "
-                "Use numbers from the JSON and keep it actionable."
-            )
-            user = f"User Finance Snapshot (JSON):\n{ctx}\nCreate a brief coaching note."
-            llm_text = _try_llm(system, user)
+        if _llm_enabled():
+            llm_text = await _try_llm(COACH_SYSTEM, _coach_user_prompt(ctx), _llm_cache_key(COACH_SYSTEM, ctx))
 
         nudges = [] if llm_text else _rule_based_coach(ctx)
         return {"llm_note": llm_text, "nudges": nudges, "context": ctx}
 
     except Exception as e:
         log.exception("coach endpoint failed")
-        safe_ctx = {
-            "period": None, "expense_total": 0.0, "by_category": {}, "top_merchants": {},
-            "coffee_msg": "", "forecast": {"on_track": False, "surplus": 0, "gap": 0, "need_per_month": 0, "message": "No data"},
-            "suggestions": [], "delta_categories": [], "anomaly_count": 0
-        }
+        safe_ctx = _safe_coach_context()
         fallback = _rule_based_coach(safe_ctx)
-        return JSONResponse(status_code=200, content={"llm_note": None, "nudges": fallback, "context": safe_ctx, "error": str(e)})
+        return APIJSONResponse(status_code=200, content={"llm_note": None, "nudges": fallback, "context": safe_ctx, "error": str(e)})
+
+
+@app.get("/api/coach/stream")
+async def api_coach_stream(
+    income_monthly: float = Query(1800),
+    goal_amount: float = Query(3000),
+    months_to_goal: int = Query(10),
+    privacy: bool = Query(False),
+    ds: Dataset = Depends(get_dataset),
+):
+    """
+    SSE: `nudges` (rule-based, sent immediately), then `token` events while the LLM writes,
+    then `done` with the full `llm_note` (null if there is no LLM or it failed; keep the nudges).
+    """
+    try:
+        ctx = await run_in_threadpool(_compose_context, ds, income_monthly, goal_amount, months_to_goal, privacy)
+    except Exception as e:
+        log.exception("coach stream failed")
+        ctx = _safe_coach_context()
+        first = _sse("nudges", {"nudges": _rule_based_coach(ctx), "context": ctx, "error": str(e)})
+        return _sse_response(iter([first, _sse("done", {"llm_note": None})]))
+
+    def done(text, error):
+        return {"llm_note": text, **({"error": error} if error else {})}
+
+    first = _sse("nudges", {"nudges": _rule_based_coach(ctx), "context": ctx})
+    return _sse_response(_sse_llm_events(first, COACH_SYSTEM, _coach_user_prompt(ctx),
+                                         _llm_cache_key(COACH_SYSTEM, ctx), done))
 
 
 @app.post("/api/ask")
-def api_ask(
+async def api_ask(
     payload: Dict[str, str] = Body(...),
     privacy: bool = Query(False),
     income_monthly: float = Query(1800),
     goal_amount: float = Query(3000),
     months_to_goal: int = Query(10),
+    ds: Dataset = Depends(get_dataset),
 ):
     question = (payload.get("question") or "").strip()
-    ctx = _compose_context(income_monthly, goal_amount, months_to_goal, privacy)
+    ctx = await run_in_threadpool(_compose_context, ds, income_monthly, goal_amount, months_to_goal, privacy)
 
-    system = ("You answer questions about the user's spending using the JSON provided. "
-              "If data isn’t available, say so briefly. Be specific and concise.")
-    user = f"Question: {question}\nData:\n{ctx}"
-    llm = _try_llm(system, user)
+    llm = await _try_llm(ASK_SYSTEM, _ask_user_prompt(question, ctx), _llm_cache_key(ASK_SYSTEM, ctx, question))
     if llm:
         return {"answer": llm, "source": "llm"}
+    return {"answer": _rule_based_answer(question, ctx), "source": "rule"}
 
-    q = question.lower()
-    if "coffee" in q:
-        return {"answer": ctx["coffee_msg"], "source": "rule"}
-    if "subscription" in q or "recurring" in q:
-        top = next(iter(ctx["top_merchants"]), None)
-        return {"answer": f"Recurring charges are listed on the Subscriptions card. Your top merchant this month is {top or 'n/a'}.", "source": "rule"}
-    if "total" in q or "spend" in q:
-        return {"answer": f"You’ve spent ${ctx['expense_total']:,.0f} in {ctx['period']}.", "source": "rule"}
-    if "goal" in q or "track" in q:
-        return {"answer": ctx["forecast"]["message"], "source": "rule"}
-    if "anomal" in q or "outlier" in q:
-        return {"answer": f"{ctx['anomaly_count']} unusual transactions flagged—check the Anomalies table.", "source": "rule"}
-    return {"answer": "I couldn’t find that in the demo data. Try asking about coffee, total spend, subscriptions, anomalies, or your goal.", "source": "rule"}
+
+@app.post("/api/ask/stream")
+async def api_ask_stream(
+    payload: Dict[str, str] = Body(...),
+    privacy: bool = Query(False),
+    income_monthly: float = Query(1800),
+    goal_amount: float = Query(3000),
+    months_to_goal: int = Query(10),
+    ds: Dataset = Depends(get_dataset),
+):
+    """
+    SSE: `answer` (the rule-based answer, sent immediately), then `token` events from the LLM,
+    then `done` with the final `{answer, source}` ("llm", or "rule" when falling back).
+    """
+    question = (payload.get("question") or "").strip()
+    ctx = await run_in_threadpool(_compose_context, ds, income_monthly, goal_amount, months_to_goal, privacy)
+    rule = _rule_based_answer(question, ctx)
+
+    def done(text, error):
+        out = {"answer": text, "source": "llm"} if text else {"answer": rule, "source": "rule"}
+        return {**out, **({"error": error} if error else {})}
+
+    return _sse_response(_sse_llm_events(_sse("answer", {"answer": rule, "source": "rule"}), ASK_SYSTEM,
+                                         _ask_user_prompt(question, ctx), _llm_cache_key(ASK_SYSTEM, ctx, question), done))
+
+
+DASHBOARD_FIELDS = ("summary", "trends", "subscriptions", "anomalies", "score", "compare", "forecast", "coach")
+
+
+def _dashboard_payloads(ds: Dataset, snap: DatasetSnapshot, want: List[str], privacy: bool, income_monthly: float,
+                        goal_amount: float, months_to_goal: int, trend_months: int, mode: str, seed: Optional[int]) -> Dict[str, Any]:
+    """The sync cards, built off one warm derived cache of `snap` (the handlers are called directly)."""
+    if not snap.empty:
+        _derived(ds, snap)
+    ds = ds.pinned(snap)
+    build = {
+        "summary": lambda: get_summary(privacy=privacy, ds=ds),
+        "trends": lambda: get_trends(months=trend_months, ds=ds),
+        "subscriptions": lambda: get_subscriptions(privacy=privacy, ds=ds),
+        "anomalies": lambda: get_anomalies(privacy=privacy, ds=ds),
+        "score": lambda: get_score(income_monthly=income_monthly, ds=ds),
+        "compare": lambda: compare_and_suggest(income_monthly=income_monthly, goal_amount=goal_amount,
+                                               months_to_goal=months_to_goal, ds=ds),
+        "forecast": lambda: get_forecast(income_monthly=income_monthly, goal_amount=goal_amount,
+                                         months_to_goal=months_to_goal, mode=mode, paths=10000, seed=seed, ds=ds),
+    }
+    return {f: build[f]() for f in want if f in build}
+
+
+@app.get("/api/dashboard")
+async def get_dashboard(
+    fields: Optional[str] = Query(None, description="Comma-separated cards to include (default: all)"),
+    privacy: bool = Query(False),
+    income_monthly: float = Query(1800),
+    goal_amount: float = Query(3000),
+    months_to_goal: int = Query(10),
+    trend_months: int = Query(6, ge=2, le=24),
+    mode: str = Query("flat", pattern="^(flat|monte_carlo)$"),
+    seed: Optional[int] = Query(None, ge=0),
+    ds: Dataset = Depends(get_dataset),
+):
+    """
+    Every dashboard card in one request, each in the same shape as its own endpoint
+    (/summary, /trends, /subscriptions, /anomalies, /score, /compare, /forecast, /coach).
+    """
+    want = list(DASHBOARD_FIELDS) if not fields else [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = sorted(set(want) - set(DASHBOARD_FIELDS))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}. Choose from {', '.join(DASHBOARD_FIELDS)}.")
+
+    snap = ds.snapshot  # every card (and the coach) reads this one version
+    out = await run_in_threadpool(_dashboard_payloads, ds, snap, want, privacy, income_monthly, goal_amount,
+                                  months_to_goal, trend_months, mode, seed)
+    if "coach" in want:
+        coach = await api_coach(income_monthly=income_monthly, goal_amount=goal_amount,
+                                months_to_goal=months_to_goal, privacy=privacy, ds=ds.pinned(snap))
+        out["coach"] = json.loads(coach.body) if isinstance(coach, JSONResponse) else coach
+    return {"version": int(snap.version), **{f: out[f] for f in want}}
 
 
 @app.get("/api/cancel_draft")
@@ -908,3 +3955,6 @@ def cancel_draft(merchant: str = Query(...), charge: float = Query(0.0)):
         f"Thank you,\nA Customer"
     )
     return {"merchant": masked, "raw_merchant": merchant, "charge": round(charge, 2), "email": body}
+
+
+STARTUP["import_s"] = round(time.perf_counter() - _IMPORT_T0, 4)
@@ -0,0 +1,248 @@
+"""
+Benchmark suite: the analytics helpers and every /api route (in-process TestClient) at several data scales.
+
+    python bench.py run                                   # 1k, 100k, 1M rows -> bench-results.json
+    python bench.py run --rows 1000 100000 --repeat 5 --out before.json
+    python bench.py run --only detect_subscriptions "GET /api/summary"
+    python bench.py compare before.json after.json        # exit 1 if anything got >10% (and >1 ms) slower
+    python bench.py compare before.json after.json --threshold 0.25 --min-delta-ms 5
+
+Data comes from app.generate_transactions (seeded, one year, sampled down to exactly `rows`), so runs are
+reproducible. Each case reports the median and best of `repeat` timed runs after one warm-up call; endpoint
+timings are warm (the session's derived cache is built once and timed as `_build_derived`). Mutating routes
+(upload, append, reset, clear) run against a scratch session. The LLM uses the `echo` backend, no network.
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import logging
+import math
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+import app as server
+
+DEFAULT_ROWS = [1_000, 100_000, 1_000_000]
+
+
+def bench_frame(rows: int, seed: int = 7) -> pd.DataFrame:
+    """Exactly `rows` transactions spread over one year, as uploaded (date, merchant, amount)."""
+    users = max(1, math.ceil(rows / (365 * 3.0)))
+    df = server.generate_transactions(n_users=users, n_days=365, seed=seed, end="2025-06-30")
+    keep = np.sort(np.random.default_rng(seed).choice(len(df), size=min(rows, len(df)), replace=False))
+    return df.iloc[keep].drop(columns="user", errors="ignore").reset_index(drop=True)
+
+
+def _time(fn, repeat: int) -> dict:
+    fn()  # warm-up (imports, caches, first-call paths)
+    runs = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t)
+    return {"median_s": statistics.median(runs), "best_s": min(runs), "runs": len(runs)}
+
+
+def helper_cases(df: pd.DataFrame):
+    """(name, callable) for the analytics helpers, on the frame as the server stores it."""
+    frame = server._expand_transactions(server._compact_transactions(server._normalize_transactions(df.copy())))
+    cat = server.categorize(frame)
+    income, expense = server.split_income_expense(cat)
+    expense_m = server.monthly_bucket(expense)
+    stats = server.merchant_stats(expense_m)
+    cube = server.AggregateCube.from_frame(expense_m, "category")
+    current = cube.months[-1]
+    memo = df.assign(memo=[f"order {i:07d} ref {i * 7919 % 100000}" for i in range(len(df))])
+    return [
+        ("categorize", lambda: server.categorize(frame)),
+        ("split_income_expense", lambda: server.split_income_expense(cat)),
+        ("monthly_bucket", lambda: server.monthly_bucket(expense)),
+        ("detect_subscriptions", lambda: server.detect_subscriptions(expense_m)),
+        ("anomaly_detection", lambda: server.anomaly_detection(expense_m)),
+        ("anomaly_detection[stats]", lambda: server.anomaly_detection(expense_m, stats)),
+        ("last_n_months_expense", lambda: server.last_n_months_expense(expense_m, 6)),
+        ("last_n_months_expense[cube]", lambda: server.last_n_months_expense(expense_m, 6, cube=cube)),
+        ("category_spend_this_and_prev", lambda: server.category_spend_this_and_prev(expense_m, current)),
+        ("category_spend_this_and_prev[cube]", lambda: server.category_spend_this_and_prev(expense_m, current, cube=cube)),
+        ("suggestion_engine", lambda: server.suggestion_engine(expense_m, 400.0)),
+        ("suggestion_engine[cube]", lambda: server.suggestion_engine(expense_m, 400.0, cube=cube)),
+        ("detect_pii", lambda: server.detect_pii(memo)),
+        ("_build_derived", lambda: server._build_derived(server._compact_transactions(frame))),
+    ]
+
+
+def endpoint_cases(client: TestClient, df: pd.DataFrame, tenant: str):
+    """(name, callable) for every /api route; mutating routes use a scratch session."""
+    h = {"X-Session-ID": tenant}
+    scratch = {"X-Session-ID": f"{tenant}-scratch"}
+    q = "income_monthly=4000&goal_amount=6000&months_to_goal=8"
+    csv = df.to_csv(index=False, date_format="%Y-%m-%d").encode()
+    top = df["merchant"].value_counts().index[0]
+    rows = df.tail(100).assign(date=lambda x: x["date"].dt.strftime("%Y-%m-%d")).to_dict("records")
+    cuts = {"Dining": 60, "Shopping": 40}
+    scenarios = [{"Dining": 5 * i, "Coffee": i % 20, "Shopping": 3 * i} for i in range(100)]
+    ask = {"question": "How much did I spend on coffee?"}
+
+    def get(path):
+        return lambda: client.get(path, headers=h)
+
+    def post(path, **kw):
+        return lambda: client.post(path, headers=h, **kw)
+
+    def upload(path, body, **kw):
+        return lambda: client.post(path, headers=scratch, files={"file": ("bench.csv", io.BytesIO(body), "text/csv")}, **kw)
+
+    return [
+        ("GET /api/health", get("/api/health")),
+        ("GET /api/ready", get("/api/ready")),
+        ("GET /api/transactions", get("/api/transactions")),
+        ("GET /api/transactions?limit", get("/api/transactions?limit=100")),
+        ("GET /api/summary", get("/api/summary")),
+        ("GET /api/summary?privacy", get("/api/summary?privacy=true")),
+        ("GET /api/subscriptions", get("/api/subscriptions")),
+        ("GET /api/anomalies", get("/api/anomalies")),
+        ("POST /api/anomalies/score", post("/api/anomalies/score", json=rows[:10])),
+        ("GET /api/anomalies_ml", get("/api/anomalies_ml")),
+        ("GET /api/forecast", get(f"/api/forecast?{q}")),
+        ("GET /api/forecast?monte_carlo", get(f"/api/forecast?{q}&mode=monte_carlo&seed=1")),
+        ("GET /api/trends", get("/api/trends")),
+        ("GET /api/compare", get("/api/compare")),
+        ("GET /api/score", get(f"/api/score?{q}")),
+        ("POST /api/whatif", post(f"/api/whatif?{q}", json=cuts)),
+        ("POST /api/whatif/batch", post(f"/api/whatif/batch?{q}", json={"scenarios": scenarios, "optimize": {}})),
+        ("GET /api/coach", get(f"/api/coach?{q}")),
+        ("GET /api/coach/stream", get(f"/api/coach/stream?{q}")),
+        ("POST /api/ask", post(f"/api/ask?{q}", json=ask)),
+        ("POST /api/ask/stream", post(f"/api/ask/stream?{q}", json=ask)),
+        ("GET /api/dashboard", get(f"/api/dashboard?{q}")),
+        ("GET /api/cancel_draft", get(f"/api/cancel_draft?merchant={top}&charge=15.49")),
+        ("POST /api/upload", upload("/api/upload", csv)),
+        ("POST /api/append", lambda: client.post("/api/append", headers=scratch, json=rows)),
+        ("POST /api/reset", lambda: client.post("/api/reset", headers=scratch)),
+        ("POST /api/clear", lambda: client.post("/api/clear", headers=scratch)),
+    ]
+
+
+def _checked(fn):
+    """Fail loudly on a non-2xx response instead of timing an error page."""
+    def run():
+        r = fn()
+        if getattr(r, "status_code", 200) >= 400:
+            raise RuntimeError(f"HTTP {r.status_code}: {r.text[:200]}")
+        return r
+    return run
+
+
+def _git_rev() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run(args) -> None:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    server.LLM_BACKEND = "echo"
+    client = TestClient(server.app)
+    only = set(args.only or [])
+    results = []
+    for rows in args.rows:
+        t0 = time.perf_counter()
+        df = bench_frame(rows, args.seed)
+        tenant = f"bench-{rows}"
+        server.set_dataframe(df.copy(), server.STORE.get(tenant), persist=False)
+        print(f"\n{len(df):,} rows (generated and loaded in {time.perf_counter() - t0:.2f}s)")
+        groups = [("helper", helper_cases(df))]
+        if not args.helpers_only:
+            groups.append(("endpoint", endpoint_cases(client, df, tenant)))
+        for group, cases in groups:
+            for name, fn in cases:
+                if only and name not in only:
+                    continue
+                try:
+                    r = _time(_checked(fn) if group == "endpoint" else fn, args.repeat)
+                except Exception as e:
+                    r = {"error": f"{type(e).__name__}: {e}"}
+                results.append({"group": group, "name": name, "rows": len(df), **r})
+                shown = f"{r['median_s'] * 1000:10.2f} ms" if "median_s" in r else f"  ERROR {r['error']}"
+                print(f"  {group:<9} {name:<38} {shown}")
+        client.post("/api/clear", headers={"X-Session-ID": tenant})  # free this scale's data before the next
+
+    out = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "git": _git_rev(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": f"{platform.system()} {platform.machine()}",
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as fh:
+        json.dump(out, fh, indent=1)
+    print(f"\nwrote {len(results)} results to {args.out}")
+
+
+def compare(args) -> int:
+    with open(args.base) as fh:
+        base = json.load(fh)
+    with open(args.new) as fh:
+        new = json.load(fh)
+    key = lambda r: (r["group"], r["name"], r["rows"])
+    before = {key(r): r for r in base["results"] if "median_s" in r}
+    regressions = 0
+    print(f"{'case':<50} {'rows':>9} {'base_ms':>10} {'new_ms':>10} {'change':>8}")
+    for r in new["results"]:
+        b = before.get(key(r))
+        if b is None or "median_s" not in r:
+            continue
+        old_ms, new_ms = b["median_s"] * 1000, r["median_s"] * 1000
+        change = new_ms / old_ms - 1 if old_ms else 0.0
+        flag = ""
+        if change > args.threshold and new_ms - old_ms > args.min_delta_ms:
+            flag, regressions = "  REGRESSION", regressions + 1
+        elif change < -args.threshold and old_ms - new_ms > args.min_delta_ms:
+            flag = "  faster"
+        print(f"{r['group'] + ' ' + r['name']:<50} {r['rows']:>9,} {old_ms:>10.2f} {new_ms:>10.2f} {change:>+7.0%}{flag}")
+    print(f"\n{regressions} regression(s) beyond {args.threshold:.0%} and {args.min_delta_ms} ms "
+          f"({base['meta'].get('git')} -> {new['meta'].get('git')})")
+    return 1 if regressions else 0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run", help="run the suite and write JSON results")
+    r.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS)
+    r.add_argument("--repeat", type=int, default=3)
+    r.add_argument("--seed", type=int, default=7)
+    r.add_argument("--only", nargs="*", help="case names to run (e.g. detect_pii \"GET /api/summary\")")
+    r.add_argument("--helpers-only", action="store_true")
+    r.add_argument("--out", default="bench-results.json")
+    c = sub.add_parser("compare", help="compare two result files; exit 1 on regressions")
+    c.add_argument("base")
+    c.add_argument("new")
+    c.add_argument("--threshold", type=float, default=0.10, help="relative slowdown to flag (default 0.10)")
+    c.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore changes smaller than this (noise floor)")
+    args = ap.parse_args()
+    if args.cmd == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == "__main__":
+    main()
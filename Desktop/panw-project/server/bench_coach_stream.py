@@ -0,0 +1,118 @@
+"""
+Time-to-first-byte of /api/coach and /api/ask against their SSE variants, with a fake streaming LLM.
+
+    python bench_coach_stream.py                          # 600 ms to first token, 60 tokens at 25 ms
+    python bench_coach_stream.py --first-token-ms 1000 --tokens 120 --repeat 5
+
+The fake backend is registered in LLM_BACKENDS, so the app runs its real code path (prompt, cache
+key, SSE framing) under uvicorn on a local port. The reply cache is disabled so every call streams.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import socket
+import statistics
+import threading
+import time
+
+import httpx
+import uvicorn
+
+import app as server
+
+
+class FakeStreamingBackend:
+    name = "fake"
+    first_token_s = 0.6
+    tokens = 60
+    token_s = 0.025
+
+    @staticmethod
+    def available() -> bool:
+        return True
+
+    async def stream(self, system_prompt: str, user_prompt: str):
+        await asyncio.sleep(self.first_token_s)
+        for i in range(self.tokens):
+            if i:
+                await asyncio.sleep(self.token_s)
+            yield f"tok{i} "
+
+    async def complete(self, system_prompt: str, user_prompt: str) -> str:
+        return "".join([t async for t in self.stream(system_prompt, user_prompt)]).strip()
+
+    async def aclose(self):
+        pass
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve(port: int) -> uvicorn.Server:
+    srv = uvicorn.Server(uvicorn.Config(server.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=srv.run, daemon=True).start()
+    while not srv.started:
+        time.sleep(0.05)
+    return srv
+
+
+def _timed(client: httpx.Client, method: str, url: str, **kw) -> tuple:
+    """(time to first body byte, time to first LLM token event or None, total) in ms."""
+    t0 = time.perf_counter()
+    first = token = None
+    with client.stream(method, url, **kw) as resp:
+        resp.raise_for_status()
+        for chunk in resp.iter_raw():
+            now = time.perf_counter()
+            first = first or now
+            if token is None and b"event: token" in chunk:
+                token = now
+    end = time.perf_counter()
+    ms = lambda t: None if t is None else (t - t0) * 1000
+    return ms(first), ms(token), ms(end)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--first-token-ms", type=float, default=600)
+    ap.add_argument("--tokens", type=int, default=60)
+    ap.add_argument("--token-ms", type=float, default=25)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    FakeStreamingBackend.first_token_s = args.first_token_ms / 1000
+    FakeStreamingBackend.tokens = args.tokens
+    FakeStreamingBackend.token_s = args.token_ms / 1000
+    server.LLM_BACKENDS["fake"] = FakeStreamingBackend
+    server.LLM_BACKEND = "fake"
+    server.LLM_CACHE_SIZE = 0
+
+    port = _free_port()
+    srv = _serve(port)
+    q = "income_monthly=1800&goal_amount=3000&months_to_goal=10"
+    ask = {"json": {"question": "How much did I spend on coffee?"}}
+    cases = [
+        ("GET /coach", "GET", f"/coach?{q}", {}),
+        ("GET /coach/stream", "GET", f"/coach/stream?{q}", {}),
+        ("POST /ask", "POST", f"/ask?{q}", ask),
+        ("POST /ask/stream", "POST", f"/ask/stream?{q}", ask),
+    ]
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}/api", timeout=60) as client:
+            client.get("/health")  # warm the derived caches
+            print(f"{'endpoint':<18} {'ttfb_ms':>9} {'first_token_ms':>15} {'total_ms':>9}")
+            for label, method, url, kw in cases:
+                runs = [_timed(client, method, url, **kw) for _ in range(args.repeat)]
+                med = [statistics.median(r[i] for r in runs) if runs[0][i] is not None else None for i in range(3)]
+                tok = "-" if med[1] is None else f"{med[1]:.0f}"
+                print(f"{label:<18} {med[0]:>9.0f} {tok:>15} {med[2]:>9.0f}")
+    finally:
+        srv.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
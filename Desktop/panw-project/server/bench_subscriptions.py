@@ -0,0 +1,123 @@
+"""
+Benchmark detect_subscriptions against the per-merchant reference implementation.
+
+    python bench_subscriptions.py                 # 10k, 100k, 1M rows
+    python bench_subscriptions.py --rows 50000 --merchants 2000 --repeat 3
+
+Both run on the same synthetic expense frame; the merchant/charge/months/count
+output must match before timings are reported.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from app import _month_labels, _same_charge, detect_subscriptions, monthly_bucket
+
+
+def synthetic_expenses(n_rows: int, n_merchants: int, years: int = 3, seed: int = 11) -> pd.DataFrame:
+    """Mix of noisy shopping merchants and fixed-price monthly/weekly/annual charges."""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2022-01-01")
+    days = years * 365
+    n_fixed = max(1, n_merchants // 10)
+
+    # Recurring charges: one row per period per merchant, a few cents of jitter.
+    rec = []
+    for i in range(n_fixed):
+        kind = i % 3
+        step = {0: pd.DateOffset(months=1), 1: pd.DateOffset(weeks=1), 2: pd.DateOffset(years=1)}[kind]
+        price = float(rng.choice([4.99, 9.99, 15.49, 49.0, 120.0]))
+        d = start + pd.Timedelta(days=int(rng.integers(0, 28)))
+        while d < start + pd.Timedelta(days=days):
+            rec.append((d, f"SUB {i}", round(price + rng.normal(0, 0.05), 2)))
+            d = d + step
+    rec = pd.DataFrame(rec, columns=["date", "merchant", "amount"])
+
+    n_noise = max(0, n_rows - len(rec))
+    scale = rng.gamma(2.0, 20.0, size=n_merchants)
+    merch = rng.integers(0, n_merchants, size=n_noise)
+    noise = pd.DataFrame({
+        "date": start + pd.to_timedelta(rng.integers(0, days, size=n_noise), unit="D"),
+        "merchant": pd.Categorical.from_codes(merch, categories=[f"SHOP {i}" for i in range(n_merchants)]),
+        "amount": np.round(np.abs(rng.normal(scale[merch], scale[merch] * 0.3)) + 1, 2),
+    })
+    noise["merchant"] = noise["merchant"].astype(object)
+    df = pd.concat([noise, rec], ignore_index=True).sort_values("date", kind="stable")
+    df["merchant"] = df["merchant"].astype("category")
+    return monthly_bucket(df.reset_index(drop=True))
+
+
+def reference_subscriptions(expense: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-merchant reference implementation of the monthly bucketing in detect_subscriptions
+    (merchant/charge/months/count only): place each month's median charge in the first bucket
+    within _same_charge of its running median.
+    """
+    exp = expense.dropna(subset=["date", "merchant", "amount"]).copy()
+    exp["year_month"] = _month_labels(exp["date"])
+    grouped = exp.groupby(["merchant", "year_month"], observed=True)["amount"].median().reset_index()
+
+    subs = []
+    for merch, g in grouped.groupby("merchant", observed=True):
+        g = g.sort_values("year_month")
+        buckets = []
+        for m, a in zip(g["year_month"].astype(str), g["amount"].astype(float)):
+            for b in buckets:
+                if _same_charge(a, b["ref"]):
+                    b["months"].append(m)
+                    b["amts"].append(a)
+                    b["ref"] = float(np.median(b["amts"]))
+                    break
+            else:
+                buckets.append({"ref": a, "months": [m], "amts": [a]})
+
+        for b in buckets:
+            uniq = sorted(set(b["months"]))
+            if len(uniq) >= 2:
+                subs.append({
+                    "merchant": str(merch),
+                    "charge": round(float(np.median(b["amts"])), 2),
+                    "months": ", ".join(uniq),
+                    "count": len(uniq),
+                })
+    return pd.DataFrame(subs, columns=["merchant", "charge", "months", "count"])
+
+
+def _best(fn, df, repeat: int) -> tuple:
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn(df)
+        best = min(best, time.perf_counter() - t)
+    return best, out
+
+
+def _key(df: pd.DataFrame) -> list:
+    cols = ["merchant", "charge", "months", "count"]
+    return sorted(map(tuple, df[cols].astype({"count": int}).to_numpy().tolist()))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, nargs="*", default=[10_000, 100_000, 1_000_000])
+    ap.add_argument("--merchants", type=int, default=1000)
+    ap.add_argument("--repeat", type=int, default=1)
+    args = ap.parse_args()
+
+    print(f"{'rows':>10} {'reference_s':>12} {'vectorized_s':>13} {'speedup':>8} {'subs':>6}  cadences")
+    for n in args.rows:
+        df = synthetic_expenses(n, args.merchants)
+        t_ref, ref = _best(reference_subscriptions, df, args.repeat)
+        t_new, new = _best(detect_subscriptions, df, args.repeat)
+        if _key(ref) != _key(new):
+            raise SystemExit(f"output mismatch at {n} rows")
+        cadences = new["cadence"].value_counts().to_dict()
+        print(f"{len(df):>10} {t_ref:>12.3f} {t_new:>13.3f} {t_ref / t_new:>7.1f}x {len(new):>6}  {cadences}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+import os
+
+import pytest
+
+DEMO_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "data",
+                        "Sample_Transactions_Dataset.csv")
+
+
+@pytest.fixture
+def demo_csv() -> str:
+    """Path of the demo CSV shipped at the repo root (skips the test if this checkout lacks it)."""
+    if not os.path.exists(DEMO_CSV):
+        pytest.skip("demo CSV not in this checkout")
+    return DEMO_CSV
@@ -0,0 +1,137 @@
+"""
+Check SFC_SHARED_DIR mode on one Linux box: start `uvicorn --workers N` on a scratch shared directory,
+upload through one worker and confirm every worker serves the new version, with identical results.
+
+    python shared_check.py                        # 4 workers, 200k rows
+    python shared_check.py --workers 8 --rows 1000000 --dir /dev/shm/sfc-check
+
+Each request opens a new connection so the kernel spreads them over the workers; /api/health reports
+which worker (pid) answered. Also prints each worker's proportional memory (Pss), where pages of the
+memory-mapped dataset are split between the processes mapping them. Exits 1 if any check fails.
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from app import generate_transactions
+
+SESSION = {"X-Session-ID": "shared-check"}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(base: str, path: str) -> dict:
+    # a fresh connection per request, so consecutive requests can land on different workers
+    with httpx.Client(base_url=base, headers=SESSION, timeout=60) as c:
+        r = c.get(path)
+        r.raise_for_status()
+        return r.json()
+
+
+def _pss_mb(pid: int):
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as fh:
+            for line in fh:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+
+
+def _poll(base: str, pids: set, version: int, deadline: float) -> dict:
+    """Hit the workers until each of `pids` has answered at `version`; returns pid -> (seconds, summary)."""
+    seen, t0 = {}, time.perf_counter()
+    while set(seen) < pids and time.perf_counter() < deadline:
+        h = _get(base, "/api/health")
+        pid = h["shared"]["pid"]
+        if pid not in seen and h["version"] == version:
+            seen[pid] = (time.perf_counter() - t0, _get(base, "/api/summary"))
+    return seen
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--rows", type=int, default=200_000, help="approximate rows to upload")
+    ap.add_argument("--dir", default=None, help="shared directory (default: a scratch dir under /dev/shm)")
+    ap.add_argument("--timeout", type=float, default=60.0)
+    args = ap.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    root = args.dir or tempfile.mkdtemp(prefix="sfc-shared-", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = {**os.environ, "SFC_SHARED_DIR": root}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--workers", str(args.workers),
+         "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+    )
+    failures = 0
+    try:
+        deadline = time.perf_counter() + args.timeout
+        while True:
+            try:
+                _get(base, "/api/ready")
+                break
+            except httpx.HTTPError:
+                if time.perf_counter() > deadline or server.poll() is not None:
+                    print("server did not start")
+                    return 1
+                time.sleep(0.2)
+
+        pids = set()
+        while len(pids) < args.workers and time.perf_counter() < deadline:
+            pids.add(_get(base, "/api/health")["shared"]["pid"])
+        print(f"{len(pids)} workers answering on {base}, shared dir {root}")
+
+        users = max(1, args.rows // (90 * 3))
+        df = generate_transactions(n_users=users, n_days=90, seed=11).drop(columns="user", errors="ignore")
+        body = df.to_csv(index=False, date_format="%Y-%m-%d").encode()
+        t = time.perf_counter()
+        with httpx.Client(base_url=base, headers=SESSION, timeout=300) as c:
+            up = c.post("/api/upload", files={"file": ("check.csv", io.BytesIO(body), "text/csv")}).json()
+        print(f"uploaded {up['rows']:,} rows as version {up['version']} in {time.perf_counter() - t:.2f}s")
+
+        for step, version in (("upload", up["version"]), ("append", None)):
+            if step == "append":
+                with httpx.Client(base_url=base, headers=SESSION, timeout=60) as c:
+                    version = c.post("/api/append", json=[{"date": "2030-01-15", "merchant": "CHECK", "amount": -12.5}]).json()["version"]
+            seen = _poll(base, pids, version, time.perf_counter() + args.timeout)
+            totals = {round(s["total_expense_month"], 2) for _, s in seen.values()}
+            ok = set(seen) == pids and len(totals) == 1
+            failures += not ok
+            slowest = max((sec for sec, _ in seen.values()), default=0.0)
+            print(f"{step}: {len(seen)}/{len(pids)} workers at version {version} "
+                  f"(last after {slowest * 1000:.0f} ms), summaries {'match' if len(totals) == 1 else 'DIFFER'}"
+                  f"{'' if ok else '  FAIL'}")
+
+        for pid in sorted(pids):
+            pss = _pss_mb(pid)
+            print(f"  worker {pid}: Pss {pss:.1f} MB" if pss is not None else f"  worker {pid}: Pss n/a")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        if args.dir is None:
+            shutil.rmtree(root, ignore_errors=True)
+    print("OK" if not failures else f"{failures} check(s) failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+"""The Monte Carlo model is built once per dataset version, whichever endpoint asks for it."""
+import pytest
+from fastapi.testclient import TestClient
+
+import app as server
+
+PARAMS = {"mode": "monte_carlo", "seed": 5, "paths": 500, "months_to_goal": 6}
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    calls = []
+    build = server._mc_model
+
+    def counting(d):
+        calls.append(d["version"])
+        return build(d)
+
+    monkeypatch.setattr(server, "_mc_model", counting)
+    return calls
+
+
+def test_seeded_dashboard_requests_build_model_once(builds):
+    client = TestClient(server.app, headers={"X-Session-ID": "test-forecast-cache"})
+    dash = {k: v for k, v in PARAMS.items() if k != "paths"}
+    first = client.get("/api/dashboard", params={**dash, "fields": "forecast"})
+    second = client.get("/api/dashboard", params={**dash, "fields": "forecast"})
+    assert first.status_code == second.status_code == 200
+    assert first.json()["forecast"]["monte_carlo"] == second.json()["forecast"]["monte_carlo"]
+    assert first.json()["forecast"]["monte_carlo"] is not None
+
+    direct = client.get("/api/forecast", params=PARAMS)
+    assert direct.status_code == 200
+    assert direct.json()["monte_carlo"] is not None
+    assert len(builds) == 1
@@ -0,0 +1,54 @@
+"""The LLM backend's connection pool is closed on the loop that opened it."""
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as server
+
+
+class FakeBackend:
+    name = "fake"
+    created = []
+
+    def __init__(self):
+        self.closed = False
+        FakeBackend.created.append(self)
+
+    @staticmethod
+    def available() -> bool:
+        return True
+
+    async def complete(self, system_prompt: str, user_prompt: str) -> str:
+        return "ok"
+
+    async def aclose(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def fake_backend(monkeypatch):
+    FakeBackend.created = []
+    monkeypatch.setitem(server.LLM_BACKENDS, "fake", FakeBackend)
+    monkeypatch.setattr(server, "LLM_BACKEND", "fake")
+
+
+async def _complete() -> str:
+    async with server._llm_backend() as backend:
+        return await backend.complete("system", "user")
+
+
+def test_calls_outside_the_app_loop_close_their_backend():
+    assert asyncio.run(_complete()) == "ok"
+    assert asyncio.run(_complete()) == "ok"
+    assert len(FakeBackend.created) == 2
+    assert all(b.closed for b in FakeBackend.created)
+
+
+def test_app_loop_shares_one_backend_until_shutdown():
+    with TestClient(server.app) as client:
+        assert client.portal.call(_complete) == "ok"
+        assert client.portal.call(_complete) == "ok"
+        assert len(FakeBackend.created) == 1
+        assert not FakeBackend.created[0].closed
+    assert FakeBackend.created[0].closed
@@ -0,0 +1,33 @@
+"""SFC_SNAPSHOT_DIR: /api/clear deletes the on-disk copy, even with a write already queued."""
+import pytest
+from fastapi.testclient import TestClient
+
+import app as server
+
+
+@pytest.fixture
+def snapshots(tmp_path, monkeypatch):
+    writer = server.SnapshotWriter(str(tmp_path))
+    monkeypatch.setattr(server, "SNAPSHOTS", writer)
+    return writer
+
+
+def test_upload_then_clear_leaves_nothing_on_disk(snapshots, demo_csv):
+    client = TestClient(server.app, headers={"X-Session-ID": "test-snapshot-clear"})
+    with open(demo_csv, "rb") as fh:
+        assert client.post("/api/upload", files={"file": ("demo.csv", fh, "text/csv")}).status_code == 200
+    assert client.post("/api/clear").status_code == 200
+    assert snapshots.flush(timeout=30)
+    assert server.read_snapshot(snapshots.root, "test-snapshot-clear") is None
+
+
+def test_write_of_cleared_version_is_dropped(snapshots):
+    ds = server.STORE.get("test-snapshot-floor")
+    snapshots.remove(ds.tenant, ds.version)  # as /api/clear does, racing a write of this version
+    snapshots.schedule(ds)
+    assert snapshots.flush(timeout=30)
+    assert server.read_snapshot(snapshots.root, ds.tenant) is None
+
+    snap = server.set_dataframe(server.generate_sample_transactions(n_days=30), ds)  # newer: written again
+    assert snapshots.flush(timeout=30)
+    assert server.read_snapshot(snapshots.root, ds.tenant)[1] == snap.version
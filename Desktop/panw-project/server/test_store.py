@@ -0,0 +1,50 @@
+"""DatasetStore: writes to a Dataset evicted mid-request are kept; memory accounting."""
+import pandas as pd
+import pytest
+
+import app as server
+
+
+@pytest.fixture
+def upload(demo_csv) -> pd.DataFrame:
+    return pd.read_csv(demo_csv)
+
+
+def test_write_after_eviction_is_kept(upload):
+    store = server.DatasetStore(budget_bytes=1)
+    alice = store.get("alice")
+    store.get("bob")  # over budget: evicts alice while the "request" still holds her
+    assert "alice" not in store._entries
+
+    snap = server.set_dataframe(upload, alice)
+    again = store.get("alice")
+    assert again is alice
+    assert again.version == snap.version
+    assert again.records == len(upload)
+
+
+def test_write_after_eviction_and_reload_is_kept(upload, tmp_path):
+    store = server.DatasetStore(budget_bytes=1, spill_dir=str(tmp_path))
+    alice = store.get("alice")
+    store.get("bob")
+    reloaded = store.get("alice")  # another request brings her back from the spill
+    assert reloaded is not alice
+
+    snap = server.set_dataframe(upload, alice)
+    again = store.get("alice")
+    assert again is alice
+    assert again.version == snap.version
+    assert again.version > reloaded.version
+    assert again.records == len(upload)
+
+
+def test_memory_report_counts_derived_frames():
+    store = server.DatasetStore(budget_bytes=1 << 30)
+    ds = store.get("carol")
+    d = server._derived(ds)
+    tenant = store.memory_report()["tenants"][0]
+    assert tenant["derived_bytes"] == ds.derived_bytes > 0
+    assert tenant["resident_bytes"] == tenant["frame_bytes"] + tenant["derived_bytes"]
+    categorical = sum(int(f[c].memory_usage(index=False, deep=True)) for f in (d["df"], d["income"], d["expense"])
+                      for c in f.columns if f[c].dtype == "category")
+    assert ds.derived_bytes > categorical
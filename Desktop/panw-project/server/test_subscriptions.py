@@ -0,0 +1,114 @@
+"""Cadence rules in detect_subscriptions: steady charges get a cadence, frequent shopping doesn't."""
+import numpy as np
+import pandas as pd
+
+import app as server
+
+DEMO_IRREGULAR = ("Amazon", "Blue Bottle", "Peet's Coffee", "Starbucks", "Uber")
+
+
+def reference_subscriptions(expense: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-merchant reference for the monthly bucketing in detect_subscriptions (merchant/charge/
+    months/count only): each month's median charge joins the first bucket within _same_charge
+    of that bucket's running median.
+    """
+    exp = expense.dropna(subset=["date", "merchant", "amount"]).copy()
+    exp["year_month"] = server._month_labels(exp["date"])
+    grouped = exp.groupby(["merchant", "year_month"], observed=True)["amount"].median().reset_index()
+    subs = []
+    for merch, g in grouped.groupby("merchant", observed=True):
+        g = g.sort_values("year_month")
+        buckets = []
+        for m, a in zip(g["year_month"].astype(str), g["amount"].astype(float)):
+            for b in buckets:
+                if server._same_charge(a, b["ref"]):
+                    b["months"].append(m)
+                    b["amts"].append(a)
+                    b["ref"] = float(np.median(b["amts"]))
+                    break
+            else:
+                buckets.append({"ref": a, "months": [m], "amts": [a]})
+        for b in buckets:
+            uniq = sorted(set(b["months"]))
+            if len(uniq) >= 2:
+                subs.append({"merchant": str(merch), "charge": round(float(np.median(b["amts"])), 2),
+                             "months": ", ".join(uniq), "count": len(uniq)})
+    return pd.DataFrame(subs, columns=["merchant", "charge", "months", "count"])
+
+
+def _mixed_expenses(n_rows: int = 5_000, n_merchants: int = 200, seed: int = 11) -> pd.DataFrame:
+    """Noisy shopping merchants plus a few fixed-price monthly charges, two years."""
+    rng = np.random.default_rng(seed)
+    start, days = pd.Timestamp("2022-01-01"), 730
+    merch = rng.integers(0, n_merchants, size=n_rows)
+    scale = rng.gamma(2.0, 20.0, size=n_merchants)
+    noise = pd.DataFrame({
+        "date": start + pd.to_timedelta(rng.integers(0, days, size=n_rows), unit="D"),
+        "merchant": [f"SHOP {i}" for i in merch],
+        "amount": np.round(np.abs(rng.normal(scale[merch], scale[merch] * 0.3)) + 1, 2),
+    })
+    subs = pd.concat([_charges("2022-01-05", 24, pd.DateOffset(months=1), merchant=f"SUB {i}", amount=5.0 + 7 * i)
+                      for i in range(10)])
+    df = pd.concat([noise, subs], ignore_index=True).sort_values("date", kind="stable")
+    return server.monthly_bucket(df.reset_index(drop=True))
+
+
+def _subscriptions(df: pd.DataFrame) -> pd.DataFrame:
+    return server._build_derived(server._parse_upload(df.to_csv(index=False).encode())[0])["subscriptions"]
+
+
+def _charges(start: str, periods: int, freq: str, merchant: str = "HULU", amount: float = 17.99) -> pd.DataFrame:
+    return pd.DataFrame({"date": pd.date_range(start, periods=periods, freq=freq), "merchant": merchant, "amount": amount})
+
+
+def _row(subs: pd.DataFrame, merchant: str) -> pd.Series:
+    return subs.set_index("merchant").loc[merchant]
+
+
+def test_demo_csv_shopping_stays_irregular(demo_csv):
+    with open(demo_csv, "rb") as fh:
+        df, _ = server._parse_upload(fh.read())
+    subs = server._build_derived(df)["subscriptions"].set_index("merchant")["cadence"]
+    for merchant in DEMO_IRREGULAR:
+        if merchant in subs.index:
+            assert subs[merchant] == "irregular", merchant
+
+
+def test_sample_shopping_stays_irregular():
+    subs = server._build_derived(server.generate_sample_transactions(n_days=90, seed=7))["subscriptions"]
+    cadence = subs.set_index("merchant")["cadence"]
+    for merchant in ("AMAZON", "PEET COFFEE", "UBEREATS"):
+        assert cadence[merchant] == "irregular", merchant
+
+
+def test_monthly_charge_gets_cadence_and_next_date():
+    row = _row(_subscriptions(_charges("2024-01-15", 6, pd.DateOffset(months=1))), "HULU")
+    assert row["cadence"] == "monthly"
+    assert row["next_date"] == "2024-07-15"
+
+
+def test_two_charges_are_not_enough():
+    row = _row(_subscriptions(_charges("2024-01-15", 2, pd.DateOffset(months=1))), "HULU")
+    assert row["cadence"] == "irregular"
+    assert row["next_date"] is None
+
+
+def test_several_charges_per_period_are_irregular():
+    # every 5 days: a steady "weekly" gap and every week covered, but ~1.4 charges a week
+    assert _row(_subscriptions(_charges("2024-01-01", 15, "5D")), "HULU")["cadence"] == "irregular"
+    assert _row(_subscriptions(_charges("2024-01-01", 15, "7D")), "HULU")["cadence"] == "weekly"
+
+
+def test_lapsed_charge_has_no_next_date():
+    df = pd.concat([_charges("2024-01-15", 4, pd.DateOffset(months=1)), _charges("2024-12-01", 1, "D", merchant="OTHER")])
+    row = _row(_subscriptions(df), "HULU")
+    assert row["cadence"] == "monthly"
+    assert row["next_date"] is None
+
+
+def test_matches_reference_bucketing():
+    df = _mixed_expenses()
+    cols = ["merchant", "charge", "months", "count"]
+    key = lambda s: sorted(map(tuple, s[cols].astype({"count": int}).to_numpy().tolist()))
+    assert key(server.detect_subscriptions(df)) == key(reference_subscriptions(df))